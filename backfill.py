@@ -0,0 +1,142 @@
+#!/usr/bin/python
+
+''' Parses and ingests a range of days across a pool of processes, for
+bringing in the history, or reindexing it all after a change to the solr
+schema. Each day is a unit of work: a worker parses it and hands the
+documents to the ingest, as parse_and_ingest.py does. Each day finished is
+checkpointed to BACKFILL_STATE (see settings.py), so a backfill that is
+stopped or crashes picks up where it left off when it is run again, and a
+day that failed is tried again then. Progress is reported as each day
+finishes, with the documents per second and the time left.
+
+Usage:
+
+./backfill.py 2010/06/01 - 2010/12/31              backfill the days in the range
+./backfill.py --processes=N 2010/06/01 - 2010/12/31   with N workers
+./backfill.py --all 2010/06/01 - 2010/12/31        parse and ingest every granule,
+                                                   not just those that changed
+./backfill.py --reset 2010/06/01 - 2010/12/31      forget the days done and start over
+
+Without --all, granules already brought in and unchanged since are skipped
+(see manifest.py); a reindex after a schema change needs --all, or a new
+INGEST_VERSION in solr/ingest.py.
+
+A backfill holds the update lock (see updatelock.py) while it runs, and won't
+start while the daily update or a poll has it.
+'''
+
+import datetime, multiprocessing, os, sys, time
+from settings import *
+from parser.parser import day_paths
+from parse_and_ingest import parse_and_ingest_days
+from updatelock import take_lock
+try:
+    import json
+except:
+    import simplejson as json
+
+
+def load_state(path=BACKFILL_STATE):
+    ''' the days done, by day (yyyy/mm/dd), as {'documents': n, 'seconds': s}. '''
+    if not os.path.exists(path):
+        return {'done': {}}
+    return json.loads(open(path).read())
+
+def save_state(state, path=BACKFILL_STATE):
+    fh = open(path + '.tmp', 'w')
+    fh.write(json.dumps(state, indent=1, sort_keys=True))
+    fh.close()
+    os.rename(path + '.tmp', path)
+
+def day_name(path):
+    return '/'.join(os.path.normpath(path).split(os.sep)[-3:])
+
+def backfill_day(args):
+    ''' parse and ingest one day, in a worker. returns the day and a summary
+    of it, or the error that stopped it. '''
+    path, everything = args
+    started = time.time()
+    try:
+        summary = parse_and_ingest_days([path, ], 1, everything=everything)
+    except Exception, e:
+        return day_name(path), {'error': '%s' % (e or e.__class__.__name__)}
+    return day_name(path), {
+        'documents': len(summary['parsed']),
+        'flagged': len(summary['flagged']),
+        'failed': len(summary['failed']),
+        'unchanged': summary.get('unchanged', 0),
+        'seconds': time.time() - started,
+    }
+
+def eta(seconds):
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+def backfill(start, end, processes=PARSER_PROCESSES, everything=False, reset=False):
+    ''' backfill the days from start to end (yyyy/mm/dd), inclusive, leaving
+    out those checkpointed as done. returns the state. '''
+    state = load_state()
+    if reset:
+        state = {'done': {}}
+        save_state(state)
+    paths = [path for path in day_paths(start, end) if day_name(path) not in state['done']]
+    total = len(paths)
+    print '%d days to backfill, %d already done' % (total, len(day_paths(start, end)) - total)
+    if not total:
+        return state
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(min(processes, total))
+    started = time.time()
+    finished = documents = 0
+    try:
+        for day, outcome in pool.imap_unordered(backfill_day, [(path, everything) for path in paths]):
+            finished += 1
+            elapsed = time.time() - started
+            if 'error' in outcome:
+                print '[%d/%d] %s failed, will be retried: %s' % (finished, total, day, outcome['error'])
+                continue
+            state['done'][day] = outcome
+            save_state(state)
+            documents += outcome['documents']
+            print '[%d/%d] %s: %d documents, %d unchanged, %d failed; %.1f documents/s, %s left' % (
+                finished, total, day, outcome['documents'], outcome['unchanged'],
+                outcome['failed'] + outcome['flagged'], elapsed and documents / elapsed or 0.0,
+                eta(elapsed / finished * (total - finished)))
+    except:
+        # don't wait for the days still queued; they'll be done on resuming.
+        pool.terminate()
+        raise
+    pool.close()
+    pool.join()
+    print 'backfilled %d documents in %s' % (documents, eta(time.time() - started))
+    return state
+
+
+if __name__ == '__main__':
+
+    processes = PARSER_PROCESSES
+    everything = reset = False
+    for arg in sys.argv[1:]:
+        if arg.startswith('--processes='):
+            processes = int(arg.split('=', 1)[1])
+        elif arg == '--all':
+            everything = True
+        elif arg == '--reset':
+            reset = True
+        else:
+            continue
+        sys.argv.remove(arg)
+
+    try:
+        start, dash, end = sys.argv[1:]
+        datetime.datetime.strptime(start, '%Y/%m/%d')
+        datetime.datetime.strptime(end, '%Y/%m/%d')
+    except ValueError:
+        print __doc__
+        sys.exit()
+    lock = take_lock()
+    if lock is None:
+        print 'another update is running (%s is locked); try again once it is done' % UPDATE_LOCK
+        sys.exit(1)
+    backfill(start, end, processes, everything, reset)
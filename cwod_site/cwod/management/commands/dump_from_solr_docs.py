@@ -1,14 +1,13 @@
 from collections import defaultdict
 import csv
-import glob
-import os
-import re
 import sys
 
 from dateutil.parser import parse as dateparse
 
 from django.core.management.base import BaseCommand, CommandError
 
+from solrstore import as_record, day_solrdocs, solrdoc_days
+
 
 class Command(BaseCommand):
 
@@ -29,24 +28,21 @@ class Command(BaseCommand):
                           'speaker_district', 'speaker_bioguide', 'speaker_party', ]
 
 
-        subdirs = [x.strip() for x in os.popen('find %s -type d | sort' % start) if len(x.strip().strip('/').split('/')) >= 3]
-        for subdir in subdirs:
-            xmlfiles = glob.glob('%s/*.xml' % subdir)
-            for xmlfile in xmlfiles:
-                doc = open(xmlfile, 'r').read()
+        # each day is read once, front to back, from its files or its bundle.
+        for day in solrdoc_days(start):
+            for path, solrdoc in day_solrdocs(day):
+                record = as_record(solrdoc)
 
                 ngrams = defaultdict(int)
 
-                for ngram in re.findall(r'name="%s">(.*?)<' % field, doc):
-                    ngrams[ngram] += 1
+                for ngram in record.get(field, []):
+                    ngrams[ngram.encode('utf-8')] += 1
 
-                congress = re.search(r'name="congress">(.*?)<', doc).groups()[0]
-                date = re.search(r'name="date">(.*?)<', doc).groups()[0]
                 row = {}
                 for fieldname in xml_fieldnames:
-                    m = re.search(r'name="%s">(.*?)<' % fieldname, doc)
-                    if m:
-                        row[fieldname] = m.groups()[0].decode('windows-1252').encode('utf-8')  #encode('utf-8', 'ignore')
+                    values = record.get(fieldname)
+                    if values:
+                        row[fieldname] = unicode(values[0]).encode('utf-8')
                     else:
                         row[fieldname] = ''
 
@@ -19,6 +19,8 @@ from django.template.defaultfilters import slugify
 
 from dateutil.parser import parse as dateparse 
 
+from solrclient import congress_solrs
+
 
 class Command(BaseCommand):
 
@@ -26,35 +28,26 @@ class Command(BaseCommand):
         fields = ['slug', 'page_id', 'document_title',
                   'congress','session', 'date', ]
 
-        for congress, (server, port) in settings.SOLR_SERVERS.items():
+        for congress, solr in congress_solrs():
             for session in [1, 2, ]:
                 if congress == '111':
                     continue
 
-                url = 'http://%s:%s/solr/select?%s' % (server,
-                                                       port,
-                                                       urllib.urlencode({'q': '(congress:%s AND session:%s)' % (congress, session),
-                                                                         'rows': 0,
-                                                                         'facet': 'true',
-                                                                         'facet.field': 'page_id',
-                                                                         'facet.method': 'enum',
-                                                                         'facet.limit': -1,
-                                                                         'facet.mincount': 1,
-                                                                         'wt': 'json', })
-                                                       )
-                page_ids = json.loads(urllib2.urlopen(url).read())['facet_counts']['facet_fields']['page_id'][::2]
+                result = solr.select({'q': '(congress:%s AND session:%s)' % (congress, session),
+                                      'rows': 0,
+                                      'facet': 'true',
+                                      'facet.field': 'page_id',
+                                      'facet.method': 'enum',
+                                      'facet.limit': -1,
+                                      'facet.mincount': 1, })
+                page_ids = result['facet_counts']['facet_fields']['page_id'][::2]
                 for page_id in page_ids:
                     if CRDoc.objects.filter(page_id=page_id, session=session, congress=congress).count():
                         continue
-                    url = 'http://%s:%s/solr/select?%s' % (server,
-                                                           port,
-                                                           urllib.urlencode({'q': '(page_id:%s AND congress:%s AND session:%s)' % (page_id, congress, session),
-                                                                             'rows': 1,
-                                                                             'wt': 'json', 
-                                                                             'fl': ','.join(fields),
-                                                                             })
-                            )
-                    result = json.loads(urllib2.urlopen(url).read())
+                    result = solr.select({'q': '(page_id:%s AND congress:%s AND session:%s)' % (page_id, congress, session),
+                                          'rows': 1,
+                                          'fl': ','.join(fields),
+                                          })
 
                     try:
                         data = result['response']['docs'][0]
@@ -75,15 +68,9 @@ class Command(BaseCommand):
                     print doc
 
                     # Get speakers and bills
-                    url = 'http://%s:%s/solr/select?%s' % (server,
-                                                           port,
-                                                           urllib.urlencode({'q': '(page_id:%s AND congress:%s AND session:%s)' % (page_id, congress, data['session']),
-                                                                             'rows': result['response']['numFound'],
-                                                                             'wt': 'json',
-                                                                             'fl': 'speaker_bioguide,bill', })
-                                                           )
-                    print url
-                    result = json.loads(urllib2.urlopen(url).read())
+                    result = solr.select({'q': '(page_id:%s AND congress:%s AND session:%s)' % (page_id, congress, data['session']),
+                                          'rows': result['response']['numFound'],
+                                          'fl': 'speaker_bioguide,bill', })
 
                     # speakers
                     bioguide_ids = set([x.get('speaker_bioguide') 
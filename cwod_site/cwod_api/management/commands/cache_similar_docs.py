@@ -1,7 +1,4 @@
 from operator import itemgetter
-import json
-import urllib2
-import urllib
 import datetime
 import re
 import sys
@@ -11,11 +8,12 @@ from cwod_api.models import *
 from bioguide.models import *
 
 from django.core.management.base import BaseCommand
-from django.conf import settings
 from django.db import IntegrityError
 
 from dateutil.parser import parse as dateparse 
 
+from solrclient import solr_for
+
 
 class Command(BaseCommand):
 
@@ -24,25 +22,18 @@ class Command(BaseCommand):
             if crdoc.similar_documents.count():
                 continue
             print crdoc, crdoc.date, crdoc.page_id
-            server, port = settings.SOLR_SERVERS[str(crdoc.congress)]
-            url = 'http://%s:%s/solr/select?%s' % (
-                    server,
-                    port,
-                    urllib.urlencode(
+            data = solr_for(crdoc.congress).select(
                         {'q': 'page_id:%s AND session:%s AND congress:%s' % (crdoc.page_id, crdoc.session, crdoc.congress),
                          'mlt': 'true',
                          'mlt.fl': 'speaking,document_title,date',
                          'mlt.mintf': 1,
                          'mlt.mindf': 1,
                          'mlt.count': 5,
-                         'wt': 'json',
                          'fl': 'id,score,document_title,page_id,slug,congress,session,date',
-                         #'shards': ','.join(['%s:%s/solr' % (server, port) for server, port in settings.SOLR_SERVERS.values()]),
+                         #'shards': ','.join([solr.url for congress, solr in congress_solrs()]),
                         })
-                    )
-            #print url
             try:
-                results = json.loads(urllib2.urlopen(url).read())['moreLikeThis']
+                results = data['moreLikeThis']
             except KeyError:
                 print 'nothing found'
                 continue
@@ -1,19 +1,16 @@
-import json
-import urllib2
-import urllib
 import re
 import sys
 
 from cwod_api.models import *
 
 from django.core.management.base import BaseCommand
-from django.conf import settings
+from solrclient import congress_solrs, solr_for
 
 
 class Command(BaseCommand):
 
     def handle(self, *args, **options):
-        for congress, (server, port) in settings.SOLR_SERVERS.items():
+        for congress, solr in congress_solrs():
             if congress != '111':
                 continue
 
@@ -28,23 +25,20 @@ class Command(BaseCommand):
 
 
 def get_page_ids(congress, session):
-    server, port = settings.SOLR_SERVERS[congress]
-    url = 'http://%s:%s/solr/select?%s' % (server, port, urllib.urlencode(
+    data = solr_for(congress).select(
             {'q': '(congress:%s AND session: %s)' % (congress, session),
              'facet': 'true',
              'facet.field': 'page_id',
              'facet.method': 'enum',
              'facet.sort': 'index',
              'facet.limit': -1, 
-             'wt': 'json',
-             }
-            ))
-    page_ids = json.loads(urllib2.urlopen(url).read())['facet_counts']['facet_fields']['page_id'][::2]
+             })
+    page_ids = data['facet_counts']['facet_fields']['page_id'][::2]
     return page_ids
 
 
 def get_sips(congress, session, page_id):
-    server, port = settings.SOLR_SERVERS[congress]
+    solr = solr_for(congress)
     fields = ['pentagrams',
               'quadgrams',
               'trigrams',
@@ -52,7 +46,7 @@ def get_sips(congress, session, page_id):
               'unigrams', ]
     for field in fields:
         print field, page_id
-        url = 'http://%s:%s/solr/select?%s' % (server, port, urllib.urlencode(
+        data = solr.select(
                 {'q': '(congress:%s AND session:%s AND page_id:%s)' % (congress, session, page_id),
                  'facet': 'true',
                  'facet.field': field,
@@ -60,11 +54,7 @@ def get_sips(congress, session, page_id):
                  'facet.sort': 'relative',
                  'facet.limit': 100,
                  'facet.mincount': 1,
-                 'wt': 'json',
-                 }
-                ))
-        print url
-        data = json.loads(urllib2.urlopen(url).read())['facet_counts']['facet_fields'][field]
+                 })['facet_counts']['facet_fields'][field]
         phrases = data[::2]
         pcts = data[1::2]
         yield zip(phrases, pcts)
@@ -1,18 +1,28 @@
 from optparse import make_option
+from itertools import imap
 import os
 import datetime
-import json
-import urllib
-import urllib2
+import multiprocessing
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
 from cwod_api.models import NgramDateCount
 from ngrams.models import Date
+from ngramcounts import day_totals, save_date_counts
+from solrstore import day_solrdocs
 
 from dateutil.parser import parse as dateparse
 
 
+# the dates recounted are saved this many at a time.
+SAVE_EVERY = 100
+
+
 class DateCounter(object):
+    ''' the ingest saves the totals of the days it ingests itself; this
+    recounts them, for backfills and for days ingested before it did. '''
 
     fields = ['unigrams', 'bigrams', 'trigrams', 'quadgrams',
               'pentagrams', ]
@@ -26,16 +36,32 @@ class DateCounter(object):
             curr += datetime.timedelta(1)
 
     def make_path(self, date):
-        root = '/opt/data/solrdocs'
+        root = settings.SOLR_DOC_PATH
         return os.path.join(root, str(date.year), date.strftime('%m'), date.strftime('%d'))
 
-    def count(self, field, date):
+    def count(self, date):
+        ''' {n: ngrams said on date}, from the day's ngram count file (see
+        ngramcounts.py), or if it has none, by reading each of its solr
+        documents once, from their files or the day's bundle. '''
         path = self.make_path(date)
-        all_filename = 'all-%s-%s-%s.xml' % (date.year, date.strftime('%m'), date.strftime('%d'))
-        if os.path.exists(path):
-            result = os.popen('''grep '"%s">' %s | wc -l''' % (field, os.path.join(path, 'CREC*.xml')))
-            return int(list(result)[0].strip())
-        return 0
+        totals = day_totals(path)
+        if totals is not None:
+            return totals
+        totals = {}
+        for filename, solrdoc in day_solrdocs(path):
+            if not os.path.basename(filename).startswith('CREC'):
+                continue
+            for n, field in enumerate(self.fields):
+                if isinstance(solrdoc, dict):
+                    said = len(solrdoc.get(field, []))
+                else:
+                    said = solrdoc.count('"%s">' % field)
+                totals[n + 1] = totals.get(n + 1, 0) + said
+        return totals
+
+
+def count_date(date):
+    return date, DateCounter().count(date)
 
 
 class Command(BaseCommand):
@@ -61,21 +87,42 @@ class Command(BaseCommand):
                 dest='n',
                 default=None,
                 help='Size of phrase for which to store date data'),
+            make_option('--processes',
+                action='store',
+                dest='processes',
+                default=None,
+                help='How many days to count at once'),
             )
 
+    def save(self, totals):
+        # save_date_counts() upserts in mysql's dialect; the models are
+        # slower, but work with any database CAPWORDS_DATABASE names.
+        if connection.vendor == 'mysql':
+            save_date_counts(connection.cursor(), totals)
+            transaction.commit_unless_managed()
+            return
+        for date, counts in sorted(totals.items()):
+            for n, count in sorted(counts.items()):
+                if not count:
+                    continue
+                if not NgramDateCount.objects.filter(n=n, date=date).update(count=count):
+                    NgramDateCount.objects.create(n=n, date=date, count=count)
+            if [count for count in counts.values() if count]:
+                Date.objects.get_or_create(date=date)
+
     def handle(self, *args, **options):
         date = options.get('date')
         start_date = options.get('start_date')
         end_date = options.get('end_date')
         n = options.get('n')
+        processes = options.get('processes') or settings.DATE_COUNT_PROCESSES
 
         counter = DateCounter()
 
         if n:
-            n = int(n)
-            enumerator = [(n, counter.fields[n-1]),]
+            ns = [int(n), ]
         else:
-            enumerator = list(enumerate(counter.fields))
+            ns = range(1, len(counter.fields) + 1)
 
         dates = []
         if date:
@@ -86,18 +133,30 @@ class Command(BaseCommand):
             dates = counter.dates(dateparse(start_date).date(), datetime.date.today())
         else:
             dates = counter.dates(datetime.date(2009, 1, 1), datetime.date.today())
-
-        for date in dates:
-            for n, field in enumerator:
-                print date, n, field
-                num = counter.count(field, date)
-                if num == 0:
-                    continue
-                ngramcount, created = NgramDateCount.objects.get_or_create(n=n,
-                                                                           date=date,
-                                                                           defaults={'count': 0})
-                ngramcount.count = num
-                ngramcount.save()
-                print date, field, num
-
-                d = Date.objects.get_or_create(date=date)
+        dates = list(dates)
+
+        # each day is read once, for all its counts, and the days are spread
+        # across a pool of processes.
+        processes = int(processes or multiprocessing.cpu_count())
+        pool = None
+        if processes > 1 and len(dates) > 1:
+            pool = multiprocessing.Pool(min(processes, len(dates)))
+            counted = pool.imap_unordered(count_date, dates, 8)
+        else:
+            counted = imap(count_date, dates)
+
+        totals = {}
+        for date, counts in counted:
+            counts = dict([(n, counts.get(n, 0)) for n in ns])
+            if not sum(counts.values()):
+                continue
+            totals[date] = counts
+            for n in ns:
+                print date, counter.fields[n - 1], counts[n]
+            if len(totals) >= SAVE_EVERY:
+                self.save(totals)
+                totals = {}
+        self.save(totals)
+        if pool is not None:
+            pool.close()
+            pool.join()
@@ -1,20 +1,24 @@
-import json
 import time
-import urllib2
 
 from django.core.management.base import BaseCommand
 
 from cache_document_data import opencongress_create_bill
 from cwod_api.models import *
+from solrclient import solr_for
 
 
 class Command(BaseCommand):
 
     def handle(self, *args, **options):
-        url = 'http://localhost:8989/solr/select?q=*:*&facet=true&facet.method=enum&facet.sort=index&facet.field=bill&indent=on&rows=0&facet.limit=-1&wt=json'
-        data = json.loads(urllib2.urlopen(url).read())
-        bills = data['facet_counts']['facet_fields']['bill'][::2]
         congress = 110
+        data = solr_for(congress).select({'q': '*:*',
+                                          'facet': 'true',
+                                          'facet.method': 'enum',
+                                          'facet.sort': 'index',
+                                          'facet.field': 'bill',
+                                          'rows': 0,
+                                          'facet.limit': -1, })
+        bills = data['facet_counts']['facet_fields']['bill'][::2]
         for bill in bills:
 
             if Bill.objects.filter(bill=bill, congress=congress).count():
@@ -2,8 +2,6 @@ import re
 import datetime
 import json
 import logging
-import urllib
-import urllib2
 import numpy
 
 from collections import defaultdict
@@ -25,6 +23,7 @@ from bioguide.models import *
 from cwod_api.models import *
 from ngrams.models import *
 from cwod.utils import get_entry_detail_url
+from solrclient import solr_for
 
 
 class GenericHandler(BaseHandler):
@@ -168,11 +167,7 @@ class GenericHandler(BaseHandler):
 
         params['q'] = params['q'].encode('utf-8', 'ignore')
 
-        url = 'http://%s:%s/solr/select?%s' % (settings.SOLR_SERVER,
-                                               settings.SOLR_PORT,
-                                               urllib.urlencode(params))
-        # print url
-        results = urllib2.urlopen(url).read()
+        results = solr_for().request('select', params)
 
         show_totals = request.GET.get('totals', 'false') == 'true'
         show_percentages = request.GET.get('percentages', 'false') == 'true'
@@ -772,12 +767,7 @@ class SimilarDocumentHandler(GenericHandler):
                   'mlt.rows': 10,
                   }
 
-        url = 'http://%s:%s/solr/mlt?%s' % (settings.SOLR_SERVER,
-                                            settings.SOLR_PORT,
-                                            urllib.urlencode(params))
-
-        results = urllib2.urlopen(url).read()
-        data = json.loads(results)
+        data = solr_for().mlt(params)
 
         docs = set()
         for doc in data['response']['docs']:
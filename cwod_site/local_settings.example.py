@@ -28,3 +28,9 @@ SUNLIGHT_API_KEY = ""
 API_ROOT = "capitolwords.org/api"
 
 USE_LOCKSMITH = False
+
+# the default solr, and the solr holding each congress, if not all on one
+# (see SOLR_SERVERS in settings.py).
+SOLR_SERVER = 'localhost'
+SOLR_PORT = 8983
+SOLR_SERVERS = {}
@@ -3,18 +3,16 @@ from decimal import Decimal
 from operator import itemgetter
 from optparse import OptionParser
 import csv
-import json
 import math
 from optparse import make_option
 import sys
-import urllib
-import urllib2
 
 from dateutil.parser import parse as dateparse
 
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from ngrams.models import *
+from solrclient import solr_for
 
 
 class Calculator(object):
@@ -22,7 +20,7 @@ class Calculator(object):
         #self.n = n
         #self.gram = ['unigrams', 'bigrams', 'trigrams', 'quadgrams', 'pentagrams', ][self.n-1]
         self.facet_field = facet_field
-        self.url = 'http://ec2-184-72-184-231.compute-1.amazonaws.com:8983/solr/select'
+        self.solr = solr_for(congress)
         self.df = {}
         self.congress = congress
 
@@ -30,10 +28,7 @@ class Calculator(object):
         return ['unigrams', 'bigrams', 'trigrams', 'quadgrams', 'pentagrams', ][n-1]
 
     def _query_solr(self, data):
-        body = urllib.urlencode(data)
-        url = '%s?%s' % (self.url, body)
-        r = urllib2.urlopen(url)
-        return json.loads(r.read())
+        return self.solr.select(data)
 
     def docs(self):
         if not hasattr(self, 'numdocs'):
@@ -108,7 +103,6 @@ class Calculator(object):
         return zip(data[::2], data[1::2])
 
     def get_date_diversity(self, bioguide, n, ngram):
-        url = 'http://localhost:8983/solr/select'
         q = ['speaker_bioguide:"%s"' % bioguide,
              '%s:"%s"' % (self.gram(n), ngram),
              ]
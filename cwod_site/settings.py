@@ -175,8 +175,31 @@ LOG_DIR = os.environ.get("CAPWORDS_LOGS")
 OLDEST_DATE = '01/06/2010'
 # where should the scraper log the files it's downloaded?
 SCRAPER_LOG = os.path.join(LOG_DIR, 'scraper.log')
+# where the ingest writes the solr documents it makes, as files or day
+# bundles (see solrstore.py), and the counts of the ngrams said each day (see
+# ngramcounts.py).
+SOLR_DOC_PATH = os.path.join(CWOD_HOME, 'solrdocs')
+NGRAM_COUNT_DIR = os.path.join(CWOD_HOME, 'ngramcounts')
+# how many processes get_date_counts recounts days with. None means one per
+# core.
+DATE_COUNT_PROCESSES = None
 # what domain and port are solr listening on?
 SOLR_DOMAIN = os.environ.get("CAPWORDS_SOLR_URL")
+# the solr clients (see solrclient.py) keep up to SOLR_POOL_SIZE idle
+# connections open to each solr, give up on a call after SOLR_TIMEOUT seconds,
+# and retry a call that couldn't reach solr, or that solr failed with a 5xx, up
+# to SOLR_RETRIES times, waiting SOLR_BACKOFF seconds before the first retry
+# and twice as long before each one after.
+SOLR_POOL_SIZE = 4
+SOLR_TIMEOUT = 30
+SOLR_RETRIES = 3
+SOLR_BACKOFF = 0.5
+# which solr holds each congress, as {'111': ('localhost', 8983), ...}. calls
+# for a congress not listed go to the default solr: SOLR_SERVER and SOLR_PORT
+# if SOLR_SERVER is set, or else SOLR_DOMAIN.
+SOLR_SERVERS = {}
+SOLR_SERVER = None
+SOLR_PORT = 8983
 
 db_serialized = os.environ.get("CAPWORDS_DATABASE")
 if db_serialized:
@@ -0,0 +1 @@
+../solrclient.py
\ No newline at end of file
@@ -1,4 +1,12 @@
 #!/bin/bash
+
+# Hold the update lock (see updatelock.py) until the script exits, so that a
+# poll or a backfill doesn't write the day's manifests and bundles at the
+# same time. A poll may be part way through a round at 08:00, so wait for it
+# rather than miss the day; give up after an hour.
+exec 9>>$CAPWORDS_TMP/update.lock
+flock -w 3600 9 || exit 1
+
 yesterday=`date -d '1 day ago' +'%Y/%m/%d'`
 
 date_count_date=`date -d '1 day ago' +'%Y-%m-%d'`
@@ -12,27 +20,23 @@ $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/scraper/scraper.py backto $scraper_yest
 source $CAPWORDS_VENV/bin/activate
 
 # Ingest if congress was in session
-if [ -d /opt/data/raw/$yesterday ]; then
-
-  for i in `find /opt/data/raw/$yesterday -name '*PgH*.txt'`; do
-      $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/parser/parser.py $i;
-  done
-
-  for i in `find /opt/data/raw/$yesterday -name '*PgS*.txt'`; do
-      $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/parser/parser.py $i;
-  done
-
-  for i in `find /opt/data/raw/$yesterday -name '*PgE*.txt'`; do
-      $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/parser/parser.py $i;
-  done
-
-  for i in `find /opt/data/xml/$yesterday -mtime -1 -name '*.xml'`; do
-      $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/solr/ingest.py $i --solrdocs-only;
-  done
-
-  find /opt/data/solrdocs/$yesterday -mtime -1 -name '*.xml' -exec curl -d @{} $CAPWORDS_SOLR_URL/update -H "Content-Type: text/xml" \;
-
-  curl "$CAPWORDS_SOLR_URL/update?commit=true"
+if [ -d /opt/data/raw/$yesterday ] || [ -f /opt/data/raw/$yesterday.pack ]; then
+
+  # Parse the granules of the day that are new or have changed, spread
+  # across the cores
+  $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/parser/parser.py $yesterday
+
+  # Ingest what the day's manifest says was parsed since it was last ingested,
+  # in one run, so that the legislators are only loaded once
+  $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/manifest.py pending /opt/data/raw/$yesterday \
+      | $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/solr/ingest.py - --solrdocs-only
+
+  # Post the solr documents written since the last post, in batches with a
+  # single commit, and note that they were if solr took them all
+  if $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/manifest.py unposted /opt/data/raw/$yesterday \
+      | $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/solr/update.py -; then
+    $CAPWORDS_VENV/bin/python $CAPWORDS_HOME/manifest.py posted /opt/data/raw/$yesterday
+  fi
 
   /usr/bin/env python $CAPWORDS_HOME/cwod_site/manage.py get_date_counts --date=$date_count_date
   /usr/bin/env python $CAPWORDS_HOME/cwod_site/manage.py calculate_ngram_tfidf --field=date
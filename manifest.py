@@ -0,0 +1,180 @@
+#!/usr/bin/python
+
+''' A manifest of what has been done with each granule of a day.
+
+For every granule the manifest records the sha1 of the raw text it was last
+parsed from, the version of the parser that parsed it, how that went and the
+sha1 of the xml it made; and the sha1 of the xml it was last ingested from,
+the version of the ingest, and the solr documents that were written for it
+and whether they have been posted. Re-runs over a day then parse only the
+granules whose raw text or parser has changed since, and ingest only those
+whose xml or ingest has, however old the files look.
+
+The manifests are kept apart from the data, under manifests/YYYY/MM/DD.json,
+so that a day's raw documents may be a pack (see rawstore.py) and its xml
+directory holds only xml. A day is found by the last three parts of any of
+its directories: raw/, xml/ or solrdocs/YYYY/MM/DD.
+
+Usage:
+
+./manifest.py show path/to/raw/YYYY/MM/DD       print the day's manifest
+./manifest.py pending path/to/raw/YYYY/MM/DD    list xml parsed but not ingested
+./manifest.py unposted path/to/raw/YYYY/MM/DD   list solr documents not posted
+./manifest.py posted path/to/raw/YYYY/MM/DD     mark them all as posted
+'''
+
+import hashlib, os, sys
+from settings import *
+try:
+    import json
+except:
+    import simplejson as json
+
+
+def digest(data):
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+def file_digest(path):
+    ''' the sha1 of a file, or None if it doesn't exist. '''
+    if not os.path.exists(path):
+        return None
+    return digest(open(path, 'rb').read())
+
+def day_parts(path):
+    ''' raw/2010/07/12/ or xml/2010/07/12/CREC-...xml -> ['2010', '07', '12'] '''
+    path = os.path.normpath(path)
+    if os.path.splitext(path)[1]:
+        path = os.path.dirname(path)
+    return path.split(os.sep)[-3:]
+
+def manifest_path(path):
+    return os.path.join(MANIFEST_DIR, *day_parts(path)) + '.json'
+
+def granule_name(path):
+    ''' the raw file name a granule is known by, from the path of its raw
+    text or its xml. '''
+    name = os.path.basename(path)
+    if name.endswith('.xml'):
+        name = name[:-len('.xml')] + '.txt'
+    return name
+
+
+class DayManifest(object):
+    ''' the manifest of the day that path (a directory or file) belongs to.
+    changes are only written by save(). '''
+
+    def __init__(self, path):
+        self.path = manifest_path(path)
+        self.granules = {}
+        if os.path.exists(self.path):
+            self.granules = json.loads(open(self.path).read())['granules']
+
+    def entry(self, name):
+        return self.granules.setdefault(granule_name(name), {})
+
+    def needs_parse(self, name, raw_digest, parser_version, xml_path=None):
+        ''' whether the granule's raw text or the parser has changed since it
+        was last parsed. if xml_path is given, the xml saved then must also
+        still be there, unchanged. '''
+        entry = self.granules.get(granule_name(name))
+        if (entry is None or entry.get('raw') != raw_digest
+            or entry.get('parser_version') != parser_version):
+            return True
+        if xml_path and entry.get('status') == 'parsed':
+            return file_digest(xml_path) != entry.get('xml')
+        return False
+
+    def parsed(self, name, raw_digest, parser_version, status, xml_digest=None):
+        entry = self.entry(name)
+        entry.update({'raw': raw_digest, 'parser_version': parser_version,
+                      'status': status, 'xml': xml_digest, })
+
+    def needs_ingest(self, name, ingest_version):
+        ''' whether the granule was parsed into xml that hasn't been ingested,
+        or was ingested by an older version of the ingest. '''
+        entry = self.granules.get(granule_name(name))
+        if entry is None or entry.get('status') != 'parsed':
+            return False
+        return (entry.get('ingested') != entry.get('xml')
+                or entry.get('ingest_version') != ingest_version)
+
+    def ingested(self, name, xml_digest, ingest_version, solrdocs, posted):
+        ''' solrdocs is a dict of the path of each solr document written for
+        the granule to its sha1. '''
+        entry = self.entry(name)
+        entry.update({'ingested': xml_digest, 'ingest_version': ingest_version,
+                      'solrdocs': solrdocs, 'posted': posted, })
+
+    def pending(self, ingest_version):
+        ''' the names of the granules that need ingesting. '''
+        return sorted([name for name in self.granules if self.needs_ingest(name, ingest_version)])
+
+    def unposted(self):
+        ''' the solr documents written but not yet posted. '''
+        paths = []
+        for name, entry in sorted(self.granules.items()):
+            if entry.get('solrdocs') and not entry.get('posted'):
+                paths.extend(sorted(entry['solrdocs']))
+        return paths
+
+    def mark_posted(self):
+        for entry in self.granules.values():
+            if entry.get('solrdocs'):
+                entry['posted'] = True
+
+    def save(self):
+        dirname = os.path.dirname(self.path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        fh = open(self.path + '.tmp', 'w')
+        fh.write(json.dumps({'granules': self.granules}, indent=1, sort_keys=True))
+        fh.close()
+        os.rename(self.path + '.tmp', self.path)
+
+
+class Manifests(dict):
+    ''' the manifests of the days a run touches, loaded as they are needed. '''
+
+    def of(self, path):
+        ''' the manifest of the day path belongs to. '''
+        key = manifest_path(path)
+        if key not in self:
+            self[key] = DayManifest(path)
+        return self[key]
+
+    def save(self):
+        for manifest in self.values():
+            manifest.save()
+
+
+def usage():
+    print __doc__
+    sys.exit()
+
+if __name__ == '__main__':
+
+    if len(sys.argv) != 3:
+        usage()
+
+    command, path = sys.argv[1:]
+    manifest = DayManifest(path)
+    if command == 'show':
+        print json.dumps(manifest.granules, indent=2, sort_keys=True)
+    elif command == 'pending':
+        # the ingest version is only known to the ingest; pending here means
+        # parsed since the last ingest.
+        xml_dir = os.path.join(CWOD_HOME, 'xml', *day_parts(path))
+        for name in sorted(manifest.granules):
+            entry = manifest.granules[name]
+            if entry.get('status') == 'parsed' and entry.get('ingested') != entry.get('xml'):
+                print os.path.join(xml_dir, name.replace('.txt', '.xml'))
+    elif command == 'unposted':
+        for solrdoc in manifest.unposted():
+            print solrdoc
+    elif command == 'posted':
+        manifest.mark_posted()
+        manifest.save()
+    else:
+        usage()
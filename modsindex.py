@@ -0,0 +1,154 @@
+#!/usr/bin/python
+
+''' An index of the metadata in a day's mods.xml, keyed by granule.
+
+Every granule of a day shares one mods.xml, which used to be read and parsed
+again for each granule by both the parser and the solr ingest. The scraper now
+parses it once, when the day is retrieved, and saves the result alongside it as
+mods.json (in the day directory or pack, see rawstore.py). The parser and
+ingest load that, falling back to indexing mods.xml in memory for days
+retrieved before there was an index, or whose mods.xml has been replaced since
+it was indexed.
+
+Usage:
+
+./modsindex.py build path/to/raw/YYYY/MM/DD          index a day's mods.xml
+./modsindex.py show path/to/raw/YYYY/MM/DD/granule   print a granule's entry
+'''
+
+import hashlib, os, sys
+import lxml.etree
+from settings import *
+from rawstore import read_raw, write_raw, raw_mtime
+try:
+    import json
+except:
+    import simplejson as json
+
+
+INDEX_NAME = 'mods.json'
+
+def first_text(node, path):
+    found = node.xpath(path)
+    if found:
+        return found[0].text
+    return None
+
+def build_index(mods):
+    ''' returns the index of the mods.xml in the string mods. the index is a
+    dict of the day's volume, issue, congress and session, and a list of
+    granules in the order mods.xml gives them. each granule is a dict of its
+    id, title, members of congress and the identifiers it is referenced by. '''
+    digest = hashlib.sha1(mods).hexdigest()
+    # Remove namespace to make using xpath easier.
+    mods = mods.replace('xmlns="http://www.loc.gov/mods/v3" ', '')
+    doc = lxml.etree.fromstring(mods)
+    index = {'mods_digest': digest,
+             'volume': first_text(doc, 'extension/volume'),
+             'issue': first_text(doc, 'extension/issue'),
+             'congress': first_text(doc, 'extension/congress'),
+             'session': first_text(doc, '//session'),
+             'granules': [], }
+
+    for item in doc.xpath('//relatedItem[@ID]'):
+        members = []
+        for member in item.xpath('extension/congMember'):
+            data = dict(member.attrib)
+            data['name'] = first_text(member, 'name')
+            members.append(data)
+
+        referenced_by = []
+        for related_item in item.xpath('relatedItem[@type="isReferencedBy"]'):
+            for identifier in related_item.xpath('identifier'):
+                data = dict(identifier.attrib)
+                data['text'] = identifier.text or ''
+                referenced_by.append(data)
+
+        index['granules'].append({'id': item.get('ID')[len('id-'):],
+                                  'title': first_text(item, 'titleInfo/title'),
+                                  'members': members,
+                                  'referenced_by': referenced_by, })
+    return index
+
+def dumps(index):
+    return json.dumps(index)
+
+def loads(data):
+    ''' strings come back from json as unicode; give back plain strings where
+    they are ascii, as lxml would have. '''
+    def plain(value):
+        if isinstance(value, dict):
+            return dict([(plain(k), plain(v)) for k, v in value.items()])
+        if isinstance(value, list):
+            return [plain(v) for v in value]
+        if isinstance(value, unicode):
+            try:
+                return value.encode('ascii')
+            except UnicodeError:
+                pass
+        return value
+    return plain(json.loads(data))
+
+def index_day(day_dir):
+    ''' index the mods.xml held for a day and save the index with it. '''
+    index = build_index(read_raw(os.path.join(day_dir, 'mods.xml')))
+    write_raw(day_dir, {INDEX_NAME: dumps(index), })
+    return index
+
+
+# the parser and ingest work through one day at a time, so only the most
+# recently used index is kept. it is reloaded if the files it came from have
+# been written since, as they are when the scraper polls for corrections.
+current_index = (None, None, None)
+
+def load_index(day_dir):
+    ''' returns the index for a day. raises IOError if there is no mods.xml.
+    a saved index that doesn't match mods.xml is ignored. '''
+    global current_index
+    day_dir = os.path.normpath(day_dir)
+    index_path = os.path.join(day_dir, INDEX_NAME)
+    mods_path = os.path.join(day_dir, 'mods.xml')
+    version = (raw_mtime(index_path), raw_mtime(mods_path))
+    if current_index[:2] != (day_dir, version):
+        mods = read_raw(mods_path)
+        try:
+            index = loads(read_raw(index_path))
+        except IOError:
+            index = None
+        if index is None or index.get('mods_digest') != hashlib.sha1(mods).hexdigest():
+            index = build_index(mods)
+        index['by_id'] = dict([(item['id'], item) for item in index['granules']])
+        current_index = (day_dir, version, index)
+    return current_index[2]
+
+def find_granule(index, granule, pagenums=None):
+    ''' returns the entry for a granule, or None. if there is no entry under
+    the granule's own id, fall back to the first entry whose id contains the
+    page numbers. '''
+    item = index['by_id'].get(granule)
+    if item is None and pagenums:
+        for candidate in index['granules']:
+            if pagenums in candidate['id']:
+                return candidate
+    return item
+
+
+def usage():
+    print __doc__
+    sys.exit()
+
+if __name__ == '__main__':
+
+    if len(sys.argv) != 3:
+        usage()
+
+    command, path = sys.argv[1:]
+    if command == 'build':
+        index = index_day(path)
+        print 'indexed %d granules for %s' % (len(index['granules']), path)
+    elif command == 'show':
+        day_dir, granule = os.path.split(path)
+        item = find_granule(load_index(day_dir), granule.split('.')[0])
+        print json.dumps(item, indent=2)
+    else:
+        usage()
@@ -0,0 +1,304 @@
+#!/usr/bin/python
+
+''' Counts of the ngrams said on each day, written by the solr ingest beside
+the solr documents, so that the jobs that total ngrams up (get_date_counts,
+calculate_ngram_tfidf, cache_sips, dump_from_solr_docs, check_numbers) can
+scan a local file instead of making solr queries or grepping solr documents.
+
+A day's counts are kept in NGRAM_COUNT_DIR/YYYY/MM/DD.counts. There is a row
+for each ngram of each solr document (chunk) made that day, stored as columns.
+The file is an ordinary zip holding:
+
+    chunk.u4        the row of the chunk in the chunk table
+    n.u1            the length of the ngram: 1 for unigrams to 5 for pentagrams
+    ngram.u4        the line of the ngram in the vocabulary
+    count.u4        how many times the ngram was said in the chunk
+    vocabulary.txt  the ngrams of the day, one utf-8 ngram to a line
+    chunks.json     the chunk table: for each chunk its solr id, the granule
+                    it came from, its chamber and the bioguide id, state
+                    and party of its speaker ('' if it has none)
+
+Each column is a flat array of little-endian integers, and the suffix of its
+name is its numpy dtype:
+
+    numpy.frombuffer(zipfile.ZipFile(path).read('count.u4'), '<u4')
+
+DayCounts reads the columns with the array module, so it needs no numpy. A
+granule that is ingested again replaces its rows.
+
+The totals of each day by n are what NgramDateCount holds; save_date_counts()
+puts them there, for the ingest at the end of a run and for get_date_counts
+when it recounts.
+
+Usage:
+
+./ngramcounts.py show path/to/solrdocs/YYYY/MM/DD       chunks and ngrams said, by n
+./ngramcounts.py top path/to/solrdocs/YYYY/MM/DD [N]    the ngrams said most, N of each n
+'''
+
+import array, os, sys, zipfile
+from itertools import izip
+from settings import *
+from manifest import day_parts, granule_name
+try:
+    import json
+except:
+    import simplejson as json
+
+
+COUNT_EXT = '.counts'
+
+# bump this whenever the layout of the files changes.
+COUNTS_VERSION = 1
+
+# the fields of the chunk table.
+chunk_fields = ['id', 'granule', 'chamber', 'bioguide', 'state', 'party', ]
+
+# the columns of the rows: name, array typecode and numpy dtype.
+columns = [('chunk', 'I', 'u4'), ('n', 'B', 'u1'), ('ngram', 'I', 'u4'), ('count', 'I', 'u4'), ]
+
+# the tables of cwod_api.models.NgramDateCount and ngrams.models.Date.
+DATE_COUNT_TABLE = 'cwod_api_ngramdatecount'
+DATE_TABLE = 'ngrams_date'
+
+def counts_path(path):
+    ''' solrdocs/2010/07/12/ or xml/2010/07/12/CREC-...xml ->
+    ngramcounts/2010/07/12.counts '''
+    return os.path.join(NGRAM_COUNT_DIR, *day_parts(path)) + COUNT_EXT
+
+def swapped(column):
+    ''' column with its bytes in little-endian order, on any machine. '''
+    if sys.byteorder == 'big':
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    return column
+
+def read_column(pack, name):
+    for column, typecode, dtype in columns:
+        if column == name:
+            data = array.array(typecode)
+            data.fromstring(pack.read('%s.%s' % (name, dtype)))
+            return swapped(data)
+    raise KeyError(name)
+
+def add_totals(totals, ns, counts):
+    for n, count in izip(ns, counts):
+        totals[n] = totals.get(n, 0) + count
+    return totals
+
+def day_totals(path):
+    ''' the totals of the day path belongs to, as DayCounts.totals() has
+    them, reading only the columns they need; None if the day has no count
+    file. '''
+    path = counts_path(path)
+    if not os.path.exists(path):
+        return None
+    pack = zipfile.ZipFile(path)
+    try:
+        return add_totals({}, read_column(pack, 'n'), read_column(pack, 'count'))
+    finally:
+        pack.close()
+
+
+class DayCounts(object):
+    ''' the ngram counts of the day that path (a directory or file) belongs
+    to. changes are only written by save(). '''
+
+    def __init__(self, path):
+        self.path = counts_path(path)
+        self.date = '-'.join(day_parts(path))
+        self.vocabulary = []
+        self.chunks = dict([(field, []) for field in chunk_fields])
+        self.columns = dict([(name, array.array(typecode)) for name, typecode, dtype in columns])
+        # the id of each ngram of the vocabulary, made when it is first added to.
+        self.ids = None
+        self.dropped = False
+        if os.path.exists(self.path):
+            self.read()
+
+    def read(self):
+        pack = zipfile.ZipFile(self.path)
+        try:
+            table = json.loads(pack.read('chunks.json'))
+            self.chunks = table['chunks']
+            if table['ngrams']:
+                self.vocabulary = pack.read('vocabulary.txt').split('\n')
+            for name, typecode, dtype in columns:
+                self.columns[name] = read_column(pack, name)
+        finally:
+            pack.close()
+
+    def __len__(self):
+        return len(self.columns['count'])
+
+    def column(self, name):
+        ''' a column of the rows, or a field of the chunk table as a column,
+        with the value of each row's chunk. '''
+        if name in self.columns:
+            return self.columns[name]
+        values = self.chunks[name]
+        return [values[chunk] for chunk in self.columns['chunk']]
+
+    def drop(self, granule):
+        ''' forget the chunks made from granule, and their rows. '''
+        granule = granule_name(granule)
+        keep = [i for i, name in enumerate(self.chunks['granule']) if name != granule]
+        if len(keep) == len(self.chunks['granule']):
+            return
+        for field in chunk_fields:
+            values = self.chunks[field]
+            self.chunks[field] = [values[i] for i in keep]
+        renumber = dict([(old, new) for new, old in enumerate(keep)])
+        rows = [i for i, chunk in enumerate(self.columns['chunk']) if chunk in renumber]
+        for name, typecode, dtype in columns:
+            column = self.columns[name]
+            self.columns[name] = array.array(typecode, [column[i] for i in rows])
+        self.columns['chunk'] = array.array('I', [renumber[chunk] for chunk in self.columns['chunk']])
+        self.dropped = True
+
+    def add(self, chunk_id, granule, chamber, speaker, counts):
+        ''' add a chunk and its counts, a dict of (n, ngram) to how many times
+        it was said. speaker is the legislator that said it, as
+        SpeakerIndex.find() gives it, or None. '''
+        if self.ids is None:
+            self.ids = dict([(ngram, i) for i, ngram in enumerate(self.vocabulary)])
+        chunk = len(self.chunks['id'])
+        fields = dict(speaker or {})
+        fields.update({'id': chunk_id, 'granule': granule_name(granule), 'chamber': chamber, })
+        for field in chunk_fields:
+            self.chunks[field].append(fields.get(field) or '')
+
+        ids, vocabulary = self.ids, self.vocabulary
+        chunks, ns, ngrams, counted = [self.columns[name] for name, typecode, dtype in columns]
+        for (n, ngram), count in sorted(counts.iteritems()):
+            if isinstance(ngram, unicode):
+                ngram = ngram.encode('utf-8')
+            i = ids.get(ngram)
+            if i is None:
+                i = ids[ngram] = len(vocabulary)
+                vocabulary.append(ngram)
+            chunks.append(chunk)
+            ns.append(n)
+            ngrams.append(i)
+            counted.append(count)
+
+    def replace(self, granule, chunks):
+        ''' the chunks made from granule, as (chunk id, chamber, speaker,
+        counts) for add(), in place of those it made before. '''
+        self.drop(granule)
+        for chunk_id, chamber, speaker, counts in chunks:
+            self.add(chunk_id, granule, chamber, speaker, counts)
+
+    def compact(self):
+        ''' leave out of the vocabulary the ngrams no row counts any more. '''
+        used = sorted(set(self.columns['ngram']))
+        renumber = dict([(old, new) for new, old in enumerate(used)])
+        self.vocabulary = [self.vocabulary[i] for i in used]
+        self.columns['ngram'] = array.array('I', [renumber[i] for i in self.columns['ngram']])
+        self.ids = None
+        self.dropped = False
+
+    def totals(self):
+        ''' {n: how many ngrams of length n were said}. '''
+        return add_totals({}, self.columns['n'], self.columns['count'])
+
+    def said(self, n=None, by=None):
+        ''' how many times each ngram (of length n, or of any length) was
+        said, as {ngram: count}; or as {(value, ngram): count} if by names a
+        field of the chunk table, eg. 'bioguide'. '''
+        vocabulary = self.vocabulary
+        values = by and self.chunks[by]
+        said = {}
+        for chunk, length, ngram, count in izip(*[self.columns[name] for name, typecode, dtype in columns]):
+            if n is not None and length != n:
+                continue
+            key = vocabulary[ngram]
+            if by:
+                key = (values[chunk], key)
+            said[key] = said.get(key, 0) + count
+        return said
+
+    def save(self):
+        if self.dropped:
+            self.compact()
+        dirname = os.path.dirname(self.path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        pack = zipfile.ZipFile(self.path + '.tmp', 'w', zipfile.ZIP_DEFLATED)
+        pack.writestr('chunks.json', json.dumps({'version': COUNTS_VERSION,
+                                                 'ngrams': len(self.vocabulary),
+                                                 'chunks': self.chunks, }))
+        pack.writestr('vocabulary.txt', '\n'.join(self.vocabulary))
+        for name, typecode, dtype in columns:
+            pack.writestr('%s.%s' % (name, dtype), swapped(self.columns[name]).tostring())
+        pack.close()
+        os.rename(self.path + '.tmp', self.path)
+
+
+class CountFiles(dict):
+    ''' the count files of the days a run touches. a run goes through its
+    documents a day at a time, so only one day is held at once: it is saved
+    and let go when another is opened. the totals of each day saved are kept,
+    by date, for save_date_counts(). '''
+
+    def __init__(self):
+        dict.__init__(self)
+        self.totals = {}
+
+    def of(self, path):
+        ''' the counts of the day path belongs to. '''
+        key = counts_path(path)
+        if key not in self:
+            self.save()
+            self.clear()
+            self[key] = DayCounts(path)
+        return self[key]
+
+    def save(self):
+        for counts in self.values():
+            counts.save()
+            self.totals[counts.date] = counts.totals()
+
+
+def save_date_counts(cursor, totals):
+    ''' upsert totals, {date: {n: ngrams said}}, into NgramDateCount, and
+    the dates into Date, with a DB-API cursor on the cwod_site database, in
+    one statement each. the caller commits. the statements are mysql's, as the
+    database is; get_date_counts uses the models on any other. '''
+    rows = [(n, date, count) for date, counts in sorted(totals.items())
+                             for n, count in sorted(counts.items()) if count]
+    if not rows:
+        return
+    cursor.executemany('''INSERT INTO %s (n, date, count) VALUES (%%s, %%s, %%s)
+                          ON DUPLICATE KEY UPDATE count = VALUES(count)''' % DATE_COUNT_TABLE, rows)
+    dates = sorted(set([date for n, date, count in rows]))
+    cursor.executemany('''INSERT INTO %s (date) SELECT %%s FROM DUAL
+                          WHERE NOT EXISTS (SELECT 1 FROM %s WHERE date = %%s)''' % (DATE_TABLE, DATE_TABLE),
+                       [(date, date) for date in dates])
+
+
+if __name__ == '__main__':
+
+    try:
+        command, path = sys.argv[1:3]
+    except ValueError:
+        print __doc__
+        sys.exit()
+    counts = DayCounts(path)
+    if not os.path.exists(counts.path):
+        print 'no counts for %s' % '/'.join(day_parts(path))
+        sys.exit(1)
+
+    if command == 'show':
+        print '%s: %d chunks, %d ngrams in the vocabulary, %d rows' % (
+            counts.path, len(counts.chunks['id']), len(counts.vocabulary), len(counts))
+        for n, total in sorted(counts.totals().items()):
+            print '%d  %d' % (n, total)
+    elif command == 'top':
+        top = len(sys.argv) > 3 and int(sys.argv[3]) or 10
+        for n in sorted(counts.totals()):
+            said = sorted(counts.said(n).items(), key=lambda item: (-item[1], item[0]))
+            for ngram, count in said[:top]:
+                print '%d  %8d  %s' % (n, count, ngram)
+    else:
+        print __doc__
@@ -1,17 +1,86 @@
 #!/usr/bin/python
 
-import datetime, sys
+import datetime, sys, time
 from settings import *
 from scraper.scraper import run_scraper
-from parser.parser import parse_directory
-from solr.ingest import solr_ingest_dir
+from parser.parser import (parse_directory, day_files, changed_files, iter_parse,
+                           record_results, summarize, report, xml_path, PARSER_VERSION)
+from solr.ingest import INGEST_VERSION, solr_ingest_dir, solr_ingest_documents
+from rawstore import PACK_EXT
+from manifest import Manifests, file_digest
 
 '''
 Given a directory, will iterate over all subdirectories, running the parser and
 then the ingest script, respectively. Important for manually bringing in bulk
-records. '''
+records. Granules that haven't changed since they were last brought in are left
+alone, unless --all is given. '''
+
+def plan_days(paths, save_xml=PARSER_SAVE_XML):
+    ''' by the manifests, the granules of the days in paths that need parsing,
+    and the xml files that only need ingesting again, because the ingest has
+    changed or an earlier ingest failed. such a granule is parsed again if its
+    xml wasn't kept. '''
+    files = day_files(paths)
+    parse = changed_files(files, save_xml)
+    unchanged = set(files) - set(parse)
+    manifests = Manifests()
+    ingest = []
+    for path in files:
+        manifest = manifests.of(path)
+        if path in unchanged and manifest.needs_ingest(path, INGEST_VERSION):
+            if file_digest(xml_path(path)) == manifest.entry(path)['xml']:
+                ingest.append(xml_path(path))
+            else:
+                parse.append(path)
+    return files, parse, ingest
+
+def parse_and_ingest_days(paths, processes=PARSER_PROCESSES, save_xml=PARSER_SAVE_XML,
+                          everything=False):
+    ''' parse the granules of the days in paths (raw/yyyy/mm/dd) and hand each
+    document straight from the parser to the solr ingest, rather than through
+    the xml files. unless everything is True, only the granules that have
+    changed since the last run are parsed, and only the documents that have
+    changed, or were ingested by an older ingest, are ingested (see
+    manifest.py). returns the parser's summary of the run. '''
+    started = time.time()
+    if everything:
+        files = parse = day_files(paths)
+        ingest = []
+    else:
+        files, parse, ingest = plan_days(paths, save_xml)
+    results = []
+    def parsed_documents():
+        for xml_file in ingest:
+            yield xml_file, None
+        manifests = Manifests()
+        for result in iter_parse(parse, processes, save=save_xml, keep=True):
+            document = result.pop('document')
+            results.append(result)
+            manifest = manifests.of(result['file'])
+            manifest.parsed(result['file'], result['raw_digest'], PARSER_VERSION,
+                            result['status'], result['xml_digest'])
+            if document is not None and (everything or manifest.needs_ingest(result['file'], INGEST_VERSION)):
+                yield result['xml'], document
+    solr_ingest_documents(parsed_documents())
+    # the ingest has recorded what it did in the manifests by now; the parse
+    # is recorded after it, so as not to be overwritten.
+    record_results(results)
+    summary = summarize(results, started)
+    summary['unchanged'] = len(files) - len(parse)
+    report(summary)
+    return summary
+
+def parse_and_ingest_dir(path, interactive=False, everything=False):
+    if interactive:
+        xml_dir = parse_directory(path, interactive)
+        solr_ingest_dir(xml_dir)
+    else:
+        parse_and_ingest_days([path, ], everything=everything)
 
 if __name__ == '__main__':
+    everything = '--all' in sys.argv
+    if everything:
+        sys.argv.remove('--all')
     interactive = False
     parent_path = sys.argv[1]
     if len(sys.argv) == 3 and sys.argv[2] == 'interactive':
@@ -19,8 +88,12 @@ if __name__ == '__main__':
     for level in os.walk(parent_path):
         files = level[2]
         thisdir = level[0]
-        if len(files) > 0:
-            xml_dir = parse_directory(thisdir, interactive)
-            solr_ingest_dir(xml_dir)
-
-
+        # a day kept as a pack shows up as a DD.pack file in the month
+        # directory; parse it under the day directory path it stands for.
+        packs = [f for f in files if f.endswith(PACK_EXT)]
+        for pack in packs:
+            day_dir = os.path.join(thisdir, pack[:-len(PACK_EXT)])
+            if not os.path.isdir(day_dir):
+                parse_and_ingest_dir(day_dir, interactive, everything)
+        if len(files) > len(packs):
+            parse_and_ingest_dir(thisdir, interactive, everything)
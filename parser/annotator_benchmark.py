@@ -0,0 +1,149 @@
+#!/usr/bin/python
+
+''' Times the line annotator on a day of Senate text. The day's PgS granules
+are parsed once to record every line the parser annotates, along with the tags
+registered for it; the recorded lines are then annotated again by the original
+annotator, which searched for every pattern uncompiled, and by the current one.
+The two must agree on every line.
+
+Usage:
+
+./annotator_benchmark.py yyyy/mm/dd [repeat]
+'''
+
+import os, re, sys, time
+import parser
+from parser import CRParser, Regex
+from settings import CWOD_HOME
+from rawstore import list_raw
+
+
+def original_apply(string, opentags, closetags):
+    ''' Regex.apply() as it was before patterns were compiled. '''
+    indexes = {}
+    for regex, tag, group in opentags:
+        matchobj = re.search(regex, string)
+        if matchobj:
+            if group:
+                start = matchobj.start(group)
+            else:
+                start = matchobj.start()
+            if start not in indexes:
+                indexes[start] = []
+            indexes[start].append(tag)
+
+    for regex, tag, group in closetags:
+        matchobj = re.search(regex, string)
+        if matchobj:
+            if group:
+                end = matchobj.end(group)
+            else:
+                end = matchobj.end()
+            if end not in indexes:
+                indexes[end] = []
+            indexes[end].append(tag)
+
+    if len(indexes):
+        l = indexes.keys()
+        l.sort()
+        first_substring = [(0,l[0])]
+        last_substring = [(l[-1], len(string))]
+        pairs = first_substring + [(l[i], l[i+1]) for i in xrange(len(l)-1)] + last_substring
+
+        output = []
+        already_matched = []
+        for start, stop in pairs:
+            substr = string[start:stop]
+            if start in indexes.keys() and start not in already_matched:
+                output.append(substr)
+                for tag in indexes[start]:
+                    output.append(tag)
+                already_matched.append(start)
+            elif stop in indexes.keys() and stop not in already_matched:
+                output.append(substr)
+                for tag in indexes[stop]:
+                    output.append(tag)
+                already_matched.append(stop)
+            else:
+                output.append(substr)
+        return ''.join(output)
+    else:
+        return string
+
+def record_lines(path):
+    ''' parse the senate granules in path, returning a list of documents, each
+    a list of (line, opentags, closetags) for every line annotated. '''
+    documents = []
+    apply = Regex.apply
+    def recording_apply(self):
+        documents[-1].append((self.string, list(self.opentags), list(self.closetags)))
+        return apply(self)
+    Regex.apply = recording_apply
+    stdout = sys.stdout
+    try:
+        for filename in list_raw(path):
+            if filename.find('PgS') == -1 or not parser.should_parse(filename):
+                continue
+            documents.append([])
+            sys.stdout = open(os.devnull, 'w')
+            try:
+                CRParser(os.path.join(path, filename)).parse()
+            except Exception, e:
+                pass
+            sys.stdout = stdout
+    finally:
+        sys.stdout = stdout
+        Regex.apply = apply
+    return [doc for doc in documents if doc]
+
+def time_original(documents):
+    started = time.time()
+    for doc in documents:
+        for string, opentags, closetags in doc:
+            original_apply(string, opentags, closetags)
+    return time.time() - started
+
+def time_current(documents):
+    started = time.time()
+    for doc in documents:
+        # as in the parser, one set of compiled patterns per document.
+        patterns = {}
+        for string, opentags, closetags in doc:
+            regx = Regex(string, patterns)
+            regx.opentags = opentags
+            regx.closetags = closetags
+            regx.apply()
+    return time.time() - started
+
+def check(documents):
+    for doc in documents:
+        for string, opentags, closetags in doc:
+            regx = Regex(string)
+            regx.opentags = opentags
+            regx.closetags = closetags
+            if regx.apply() != original_apply(string, opentags, closetags):
+                print 'MISMATCH: %r' % string
+                return False
+    return True
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 2:
+        print __doc__
+        sys.exit()
+    repeat = 1
+    if len(sys.argv) == 3:
+        repeat = int(sys.argv[2])
+
+    path = os.path.join(CWOD_HOME, 'raw', sys.argv[1])
+    documents = record_lines(path) * repeat
+    lines = sum([len(doc) for doc in documents])
+    if not lines:
+        print 'no senate lines found in %s' % path
+        sys.exit()
+    print '%d documents, %d annotated lines' % (len(documents), lines)
+    print 'output identical: %s' % check(documents)
+    for name, timer in [('original', time_original), ('current', time_current), ]:
+        elapsed = timer(documents)
+        print '%-10s %8.3fs %10.0f lines/s' % (name, elapsed, lines / elapsed)
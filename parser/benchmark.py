@@ -0,0 +1,177 @@
+#!/usr/bin/python
+
+''' Times the parser on a corpus of raw granules and checks what it makes of
+them against golden xml. Needs no network, solr or database.
+
+The corpus is the House, Senate and Extensions granules checked in under
+tests/fixtures/raw, with their mods.xml; the golden xml is under
+tests/fixtures/xml. The corpus is copied to a temporary directory and parsed
+there, over and over, reporting for each stage the time taken, granules and
+lines per second, and the peak memory of the process by the end of the stage.
+Documents that don't match the golden xml are listed, and the exit status is
+then 1.
+
+Usage:
+
+./benchmark.py                          time the corpus and check it
+./benchmark.py --repeat=N               parse the corpus N times (default 20)
+./benchmark.py --update                 rewrite the golden xml from the output
+./benchmark.py path/to/raw/YYYY/MM/DD   time other days instead, unchecked
+'''
+
+import os, resource, shutil, sys, tempfile, time
+import parser
+from parser import CRParser
+from rawstore import read_raw, list_raw
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'fixtures')
+
+STAGES = ['parse', 'balance', 'validate', 'save', ]
+
+def corpus_days(root):
+    ''' the day directories under root/raw. '''
+    days = []
+    for dirpath, dirnames, filenames in os.walk(os.path.join(root, 'raw')):
+        dirnames.sort()
+        if 'mods.xml' in filenames:
+            days.append(dirpath)
+    return days
+
+def copy_days(days, workdir):
+    ''' copy the granules and mods.xml of each day (in either layout) to
+    workdir/raw/YYYY/MM/DD, so that the xml saved goes to workdir/xml. returns
+    the paths of the granules copied. '''
+    granules = []
+    for day in days:
+        target = os.path.join(workdir, 'raw', *os.path.normpath(day).split(os.sep)[-3:])
+        os.makedirs(target)
+        for name in list_raw(day):
+            if name == 'mods.xml' or parser.should_parse(name):
+                open(os.path.join(target, name), 'w').write(read_raw(os.path.join(day, name)))
+                if name != 'mods.xml':
+                    granules.append(os.path.join(target, name))
+    return granules
+
+def peak_memory():
+    ''' the most memory the process has held so far, in megabytes. '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def run(granules, repeat):
+    ''' parse every granule repeat times, returning the seconds taken by each
+    stage and the peak memory of the process by the end of it, the number of
+    raw lines parsed, and the document each granule came out as, or None if
+    it failed. the time spent on failures is left out. '''
+    seconds = dict.fromkeys(STAGES, 0.0)
+    memory = dict.fromkeys(STAGES, 0.0)
+    lines = 0
+    documents = {}
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        for i in xrange(repeat):
+            for granule in granules:
+                started = time.time()
+                try:
+                    document = CRParser(granule)
+                    document.parse()
+                    timed = [('parse', time.time(), peak_memory()), ]
+                    document.balance()
+                    timed.append(('balance', time.time(), peak_memory()))
+                    document.validate()
+                    timed.append(('validate', time.time(), peak_memory()))
+                    document.save()
+                    timed.append(('save', time.time(), peak_memory()))
+                # the parser gives up on some documents with sys.exit().
+                except (Exception, SystemExit), e:
+                    documents[granule] = None
+                    continue
+                for stage, finished, peak in timed:
+                    seconds[stage] += finished - started
+                    memory[stage] = max(memory[stage], peak)
+                    started = finished
+                lines += len(document.rawlines)
+                documents[granule] = document.document()
+    finally:
+        sys.stdout = stdout
+    return seconds, memory, lines, documents
+
+def golden_path(granule, workdir, golden):
+    relative = os.path.relpath(granule, os.path.join(workdir, 'raw'))
+    return os.path.join(golden, relative.replace('.txt', '.xml'))
+
+def check(documents, workdir, golden, update=False):
+    ''' returns the granules whose documents don't match the golden xml, or
+    writes the golden xml if update is True. '''
+    mismatched = []
+    for granule, document in sorted(documents.items()):
+        path = golden_path(granule, workdir, golden)
+        if update and document is not None:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            open(path, 'w').write(document)
+        elif document is None or not os.path.exists(path) or open(path).read() != document:
+            mismatched.append(os.path.basename(granule))
+    return mismatched
+
+def report(documents, repeat, seconds, memory, lines):
+    failed = [granule for granule, document in documents.items() if document is None]
+    parsed = (len(documents) - len(failed)) * repeat
+    print '%d granules, %d lines, parsed %d times' % (len(documents) - len(failed), lines / repeat, repeat)
+    for granule in sorted(failed):
+        print '    failed: %s' % os.path.basename(granule)
+    print '%-9s %9s %12s %12s %9s' % ('stage', 'seconds', 'granules/s', 'lines/s', 'peak MB')
+    for stage in STAGES + ['total', ]:
+        if stage == 'total':
+            elapsed = sum(seconds.values())
+            peak = max(memory.values())
+        else:
+            elapsed = seconds[stage]
+            peak = memory[stage]
+        rate = elapsed and 1.0 / elapsed or 0.0
+        print '%-9s %9.3f %12.0f %12.0f %9.1f' % (stage, elapsed, parsed * rate, lines * rate, peak)
+
+
+if __name__ == '__main__':
+
+    repeat = 20
+    update = False
+    for arg in sys.argv[1:]:
+        if arg.startswith('--repeat='):
+            repeat = int(arg.split('=', 1)[1])
+        elif arg == '--update':
+            update = True
+        elif arg.startswith('-'):
+            print __doc__
+            sys.exit()
+        else:
+            continue
+        sys.argv.remove(arg)
+
+    days = sys.argv[1:]
+    golden = None
+    if not days:
+        days = corpus_days(FIXTURES)
+        golden = os.path.join(FIXTURES, 'xml')
+
+    workdir = tempfile.mkdtemp()
+    try:
+        granules = copy_days(days, workdir)
+        if not granules:
+            print 'no granules found in %s' % ', '.join(days)
+            sys.exit()
+        seconds, memory, lines, documents = run(granules, repeat)
+        report(documents, repeat, seconds, memory, lines)
+        if golden:
+            mismatched = check(documents, workdir, golden, update)
+            if update:
+                print 'golden xml written to %s' % golden
+            elif mismatched:
+                print 'golden xml: %d of %d documents differ' % (len(mismatched), len(documents))
+                for name in mismatched:
+                    print '    %s' % name
+                sys.exit(1)
+            else:
+                print 'golden xml: all %d documents match' % len(documents)
+    finally:
+        shutil.rmtree(workdir)
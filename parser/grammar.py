@@ -0,0 +1,251 @@
+''' The paragraph state machine of the parser, as a transition table.
+
+CRParser.markup_paragraph() classifies each line of a document once, into a
+LineClass, and makes a single lookup in a table keyed by (ParserState,
+LineClass) to find the tags to register and the state to move to. The table
+starts out empty; follow_rules() works out an entry the first time a state
+and class are seen together, and it is kept for every document after.
+follow_rules() is the one place the rules of the paragraph parser are written
+down.
+
+The states are named after the nodes of the chamber grammars in grammars/,
+and each transition the parser takes is counted against the edges of the
+chamber's graph, so that a document can be checked for where it wanders off
+the grammar. The graphs are only a loose description of a document and say
+nothing about how a line is recognised, so they don't decide what the parser
+does.
+'''
+
+import os, re
+from collections import namedtuple
+
+
+GRAMMAR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'grammars')
+
+# the grammar for each chamber, by the page prefix of its granules.
+CHAMBER_GRAMMARS = {
+    'PgS': 'senate',
+    'PgH': 'house',
+    'PgE': 'extensions',
+}
+
+re_edge = r'"([^"]+)"\s*->\s*"([^"]+)"'
+
+grammars = {}
+
+def load_grammar(name):
+    ''' returns the edges of grammars/<name>.gv as a set of (from, to) node
+    names. '''
+    if name not in grammars:
+        source = open(os.path.join(GRAMMAR_DIR, name + '.gv')).read()
+        # drop /* comments */ so that commented out edges don't count.
+        source = re.sub(r'(?s)/\*.*?\*/', '', source)
+        grammars[name] = set(re.findall(re_edge, source))
+    return grammars[name]
+
+def chamber_grammar(filename):
+    ''' the grammar edges for the chamber a granule is from, or an empty set
+    if it can't be told. '''
+    for prefix, name in CHAMBER_GRAMMARS.items():
+        if filename.find(prefix) != -1:
+            return load_grammar(name)
+    return set()
+
+
+# where the parser is: in a title, a long quote, a roll call, a recorder
+# comment or a short quote, at a new paragraph or on the first line, plus what
+# kind of speaker is current: None, 'recorder' or 'named' (the name itself is
+# kept by the parser, not in the state).
+ParserState = namedtuple('ParserState', [
+    'intitle', 'inlongquote', 'inrollcall', 'recorder', 'inquote',
+    'new_paragraph', 'speaker', 'first_line', ])
+
+START = ParserState(intitle=False, inlongquote=False, inrollcall=False,
+                    recorder=False, inquote=False, new_paragraph=False,
+                    speaker=None, first_line=True)
+
+# everything the state machine asks about a line. paragraph_ends depends on
+# the state the parser is in when it looks ahead, so there is a field for
+# each state it can be asked in. a question that can't matter for the line
+# (eg. whether a new paragraph is a title) is None. one that raised an error
+# when the line was classified holds RAISES, and the error is only raised if
+# the transition needs the answer.
+LineClass = namedtuple('LineClass', [
+    'new_paragraph', 'interjection', 'longquote_start', 'recorder_start',
+    'recorder_fuzzy', 'speaker', 'rollcall', 'title', 'billheading',
+    'startshortquote', 'closes_quote', 'ends', 'ends_in_quote',
+    'ends_in_rollcall', 'longquote_ends', ])
+
+RAISES = 'raises'
+
+# what a transition does: the state to move to; where the current speaker
+# comes from ('keep', 'line' for the speaker named on the line, or
+# 'recorder'); the tags to register, as (regex attribute, tag, group,
+# whether the tag takes the speaker's name); whether to print the
+# unrecognized state warning; an error, which is either 'unrecognized' or
+# ('raise', field) for a LineClass field that raised; and the grammar edge
+# it follows.
+Transition = namedtuple('Transition', [
+    'state', 'speaker', 'opentags', 'closetags', 'warn', 'error', 'edge', ])
+
+
+class NeedsAnswer(Exception):
+    pass
+
+def node(state):
+    ''' the grammar node a state stands for. '''
+    if state.inrollcall:
+        return 'vote'
+    if state.intitle:
+        return 'subheading'
+    if state.inlongquote:
+        return 'quote'
+    if state.recorder:
+        return 'recorder comment'
+    if state.inquote:
+        return 'shortquote'
+    if state.new_paragraph and state.speaker == 'named':
+        return 'newspeaker'
+    return 'speaking'
+
+def compile_transition(state, line):
+    ''' works out the transition for a line of class line in state. '''
+    try:
+        return follow_rules(state, line)
+    except NeedsAnswer, e:
+        return Transition(state, 'keep', (), (), False, ('raise', e.args[0]), None)
+
+def follow_rules(state, line):
+    ''' the rules of the paragraph parser. the state is updated for the start
+    of the line, the tags for the line are chosen, and then the state is
+    updated for the end of it. '''
+    def ask(field):
+        answer = getattr(line, field)
+        if answer is RAISES:
+            raise NeedsAnswer(field)
+        return answer
+
+    s = state._asdict()
+    speaker = 'keep'
+    opentags = []
+    closetags = []
+    warn = False
+    error = None
+
+    # what the line starts. a long quote keeps the current speaker; the
+    # recorder fuzzy terms only continue a recorder comment already going;
+    # and a document whose first paragraph has no speaker starts with the
+    # recorder.
+    interjection = ask('interjection')
+    if ask('new_paragraph') or interjection:
+        s['new_paragraph'] = True
+        s['intitle'] = False
+        if ask('longquote_start') or interjection:
+            if s['inlongquote']:
+                s['new_paragraph'] = False
+            s['inlongquote'] = True
+        else:
+            s['inlongquote'] = False
+            if ask('recorder_start') or (s['speaker'] == 'recorder' and ask('recorder_fuzzy')):
+                s['recorder'] = True
+                s['speaker'] = speaker = 'recorder'
+            else:
+                if ask('speaker'):
+                    s['speaker'] = 'named'
+                    speaker = 'line'
+                if s['speaker'] is None and s['first_line']:
+                    s['first_line'] = False
+                    s['recorder'] = True
+                    s['speaker'] = speaker = 'recorder'
+    elif ask('rollcall'):
+        s['inrollcall'] = True
+        s['intitle'] = False
+        s['new_paragraph'] = False
+    elif not s['inlongquote'] and not s['inrollcall'] and ask('title'):
+        s['intitle'] = True
+        s['new_paragraph'] = False
+    elif ask('billheading'):
+        s['intitle'] = True
+        s['inlongquote'] = False
+        s['new_paragraph'] = False
+    else:
+        s['new_paragraph'] = False
+        s['intitle'] = False
+    # a short quote lasts until a line closes it.
+    if not s['inlongquote'] and ask('startshortquote'):
+        s['inquote'] = True
+
+    # the tags to register. some only appear on the first line of a paragraph.
+    if s['intitle']:
+        opentags.append(('re_title', '<title>', 'title', False))
+        closetags.append(('re_title', '</title>', 'title', False))
+    elif s['inrollcall']:
+        opentags.append(('re_rollcall', '<recorder>', None, False))
+    elif s['new_paragraph']:
+        opentags.append(('re_longquotestart', '<speaking quote="true" speaker="%s">', 'start', True))
+        if s['recorder']:
+            opentags.append(('re_startofline', '<recorder>', None, False))
+        opentags.append(('re_newspeaker', '<speaker name="%s">', 'name', True))
+        closetags.append(('re_newspeaker', '</speaker>', 'name', False))
+        if interjection:
+            opentags.append(('re_longquotebody', '<speaking quote="true" speaker="%s">', 'start', True))
+        if not s['recorder'] and not s['inlongquote']:
+            if s['speaker'] == 'recorder':
+                opentags.append(('re_speaking', '<recorder>', 'start', False))
+                s['recorder'] = True
+            else:
+                opentags.append(('re_speaking', '<speaking name="%s">', 'start', True))
+
+    def paragraph_ends():
+        if s['inrollcall']:
+            return ask('ends_in_rollcall')
+        if s['inlongquote']:
+            return ask('ends_in_quote')
+        return ask('ends')
+
+    if paragraph_ends():
+        if s['inrollcall']:
+            closetags.append(('re_endofline', '</recorder>', None, False))
+            s['inrollcall'] = False
+        elif s['recorder']:
+            closetags.append(('re_endofline', '</recorder>', None, False))
+        elif s['inlongquote']:
+            if ask('longquote_ends'):
+                closetags.append(('re_endofline', '</speaking>', None, False))
+        elif s['intitle']:
+            pass
+        # this state usually means the parser is somewhere unrecognized, and
+        # closing the paragraph would leave a stray </speaking>.
+        elif (s['speaker'] == 'recorder' and not s['inquote']):
+            warn = True
+        else:
+            closetags.append(('re_endofline', '</speaking>', None, False))
+
+    # what ends with the line. a long quote only ends when a paragraph that
+    # isn't one starts. a recorder comment ends with its paragraph, but the
+    # recorder stays the current speaker, for the verbatim material it reads.
+    if not s['inlongquote']:
+        if not s['recorder'] and not s['intitle'] and s['speaker'] is None:
+            error = 'unrecognized'
+        else:
+            if s['inquote'] and ask('closes_quote'):
+                s['inquote'] = False
+            if s['recorder'] and paragraph_ends():
+                s['recorder'] = False
+            s['intitle'] = False
+
+    following = ParserState(**s)
+    return Transition(following, speaker, tuple(opentags), tuple(closetags),
+                      warn, error, (node(state), node(following)))
+
+
+# (ParserState, LineClass): Transition, shared by every document parsed.
+transitions = {}
+
+def transition(state, line):
+    ''' the transition for a line in state. line is the tuple of LineClass
+    fields given by CRParser.line_class(). '''
+    found = transitions.get((state, line))
+    if found is None:
+        found = transitions[(state, line)] = compile_transition(state, LineClass._make(line))
+    return found
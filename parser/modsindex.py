@@ -0,0 +1 @@
+../modsindex.py
\ No newline at end of file
@@ -2,19 +2,26 @@
 
 ''' Parse the plain text version of congressional record documents and mark them up with xml.'''
 
-import re, datetime, os, sys
+import re, datetime, os, sys, time, multiprocessing
 from cStringIO import StringIO
 import urllib2
 from xml.sax.saxutils import escape, unescape
-from settings import CWOD_HOME, LOG_DIR
-
-import lxml.etree
+from settings import CWOD_HOME, LOG_DIR, PARSER_PROCESSES, PARSER_VALIDATE
+from rawstore import read_raw, write_raw, list_raw, raw_exists
+from modsindex import load_index, find_granule
+from grammar import RAISES, START, transition, chamber_grammar
+from manifest import Manifests, digest
 
 
 MONTHS = [datetime.date(2010, x, 1).strftime('%B') for x in range(1,13)]
 
 DEBUG = False
 
+# bump this whenever a change alters the xml the parser makes of a granule,
+# so that granules parsed by an older version are parsed again (see
+# manifest.py). the golden tests in tests/test_parser.py catch such changes.
+PARSER_VERSION = 2
+
 
 class UnrecognizedCRDoc(Exception):
     pass
@@ -24,11 +31,16 @@ class AlignmentError(Exception):
 
 class Regex(object):
 
-    def __init__(self, string):
+    def __init__(self, string, patterns=None):
         self.string = string
         # a list of tuples containing (regex_string, xml_opening_tag)
         self.opentags = []
         self.closetags = []
+        # compiled patterns, keyed by regex string. pass in the same dict for
+        # every line of a document so that each pattern is compiled once.
+        if patterns is None:
+            patterns = {}
+        self.patterns = patterns
 
     def insert_before(self, re_string, tag, group=None):
         # start tags are inserted at the start of a regex match. if group is
@@ -40,82 +52,54 @@ class Regex(object):
         # specified, matched at the end of the group instead.
         self.closetags.append((re_string, tag, group))
 
+    def compile(self, re_string):
+        pattern = self.patterns.get(re_string)
+        if pattern is None:
+            pattern = self.patterns[re_string] = re.compile(re_string)
+        return pattern
 
     def apply(self):
-        indexes = {}
-        # identify where all the opening tags go (those that get inserted at
-        # the start of the regex match)
+        # each pattern is searched for once, even when it places both an
+        # opening and a closing tag.
+        matches = {}
+        def search(re_string):
+            if re_string not in matches:
+                matches[re_string] = self.compile(re_string).search(self.string)
+            return matches[re_string]
+
+        # collect (index, tag) for every tag, opening tags (inserted at the
+        # start of the regex match) first, then closing tags (inserted at the
+        # end of the match).
+        insertions = []
         for regex, tag, group in self.opentags:
-            matchobj = re.search(regex, self.string)
+            matchobj = search(regex)
             if matchobj:
-                if group:
-                    start = matchobj.start(group)
-                else:
-                    start = matchobj.start()
-                # the tag for a given position is stored as a list, because
-                # there may be more than one tag that goes here. (eg a quote
-                # that end at the end of a paragraph).
-                if start not in indexes:
-                    indexes[start] = []
-                indexes[start].append(tag)
-
-        # identify where all the closing tags go (those that get inserted at
-        # the end of the regex match)
+                insertions.append((matchobj.start(group or 0), tag))
         for regex, tag, group in self.closetags:
-            matchobj = re.search(regex, self.string)
+            matchobj = search(regex)
             if matchobj:
-                if group:
-                    end = matchobj.end(group)
-                else:
-                    end = matchobj.end()
-                # the tag for a given position is stored as a list, because
-                # there may be more than one tag that goes here. (eg a quote
-                # that end at the end of a paragraph).
-                if end not in indexes:
-                    indexes[end] = []
-                indexes[end].append(tag)
-
-        if len(indexes):
-            #print indexes
-
-            # we need to split the string into substrings between each pair of
-            # (sorted) indices, eg. at index_n and index_n+1. a substring is
-            # also needed from the beginning of the string to the first split
-            # index, and from the last split index to the end of the string.
-            l = indexes.keys()
-            l.sort()
-            first_substring = [(0,l[0])]
-            last_substring = [(l[-1], len(self.string))]
-            pairs = first_substring + [(l[i], l[i+1]) for i in xrange(len(l)-1)] + last_substring
-
-            output = []
-            # make sure we don't duplicate any insertions.
-            already_matched = []
-            for start, stop in pairs:
-                substr = self.string[start:stop]
-                # is there a tag that goes here?
-                if start in indexes.keys() and start not in already_matched:
-                    output.append(substr)
-                    for tag in indexes[start]:
-                        output.append(tag)
-                    already_matched.append(start)
-                elif stop in indexes.keys() and stop not in already_matched:
-                    output.append(substr)
-                    for tag in indexes[stop]:
-                        output.append(tag)
-                    already_matched.append(stop)
-                else:
-                    output.append(substr)
-            # now join the pieces of the output string back together
-            outputstring = ''.join(output)
-            return outputstring
-        else:
+                insertions.append((matchobj.end(group or 0), tag))
+
+        if not insertions:
             # if there were no matches, return the string unchanged.
             return self.string
 
+        # the sort is stable, so where there is more than one tag at an index
+        # (eg. a quote that ends at the end of a paragraph), opening tags stay
+        # ahead of closing tags and each keeps the order it was registered in.
+        insertions.sort(key=lambda insertion: insertion[0])
+        output = []
+        last = 0
+        for index, tag in insertions:
+            output.append(self.string[last:index])
+            output.append(tag)
+            last = index
+        output.append(self.string[last:])
+        return ''.join(output)
+
 class XMLAnnotator(object):
-    def __init__(self, string):
-        self.regx = Regex(string)
+    def __init__(self, string, patterns=None):
+        self.regx = Regex(string, patterns)
 
     def register_tag(self, re_string, open_tag, group=None):
         ''' Registers an XML tag to be inserted around a matching regular
@@ -147,6 +131,154 @@ class XMLAnnotator(object):
         return self.regx.apply()
 
 
+class MarkupLines(list):
+    ''' the lines of xml the parser emits, with the tags balanced as they go.
+    each line is scanned for tags as it is appended: open tags are kept on a
+    stack, and a close tag that doesn't match the top of the stack is an
+    orphan, as is any tag still open at the end. balance() then takes the
+    orphans out in a single pass, where validate() would scan the whole
+    document again. '''
+
+    re_tag = re.compile('</?.+?>')
+    re_opentag = re.compile(r'<[A-Za-z_]+( [a-z]+=".*?")?>')
+    re_closetag = re.compile(r'</[A-Za-z_]+>')
+
+    # tag: ('open', the close tag that matches it), ('close', None) or
+    # (None, None), for every tag seen by any document.
+    kinds = {}
+
+    def __init__(self, lines=()):
+        list.__init__(self)
+        # (tag, start, end, linenum)
+        self.active = []
+        self.orphans = []
+        for line in lines:
+            self.append(line)
+
+    def kind(self, tag):
+        found = self.kinds.get(tag)
+        if found is None:
+            if self.re_opentag.search(tag):
+                space = tag.find(' ')
+                if space != -1:
+                    found = ('open', '</' + tag[1:space] + '>')
+                else:
+                    found = ('open', '</' + tag[1:])
+            elif self.re_closetag.search(tag):
+                found = ('close', None)
+            else:
+                found = (None, None)
+            self.kinds[tag] = found
+        return found
+
+    def append(self, line):
+        list.append(self, line)
+        if line.find('<') == -1:
+            return
+        linenum = len(self) - 1
+        for match in self.re_tag.finditer(line):
+            tag = match.group()
+            kind, close = self.kind(tag)
+            if kind == 'open':
+                self.active.append((tag, match.start(), match.end(), linenum))
+            elif kind == 'close':
+                if self.active and self.kind(self.active[-1][0])[1] == tag:
+                    self.active.pop()
+                else:
+                    print 'no match-- orphaned\n'
+                    self.orphans.append((tag, match.start(), match.end(), linenum))
+
+    def balance(self):
+        ''' remove the orphaned tags, apart from the CRDoc tags, and return
+        them. '''
+        orphans = []
+        for orphan in self.orphans + self.active:
+            if orphan[0] == '<CRDoc>' or orphan[0] == '</CRDoc>':
+                print 'saving crdoc tag', orphan[0]
+            else:
+                orphans.append(orphan)
+        self.orphans = []
+        self.active = []
+
+        if len(orphans):
+            print 'Orphaned Tags:\n'
+        by_line = {}
+        for orphan in orphans:
+            print orphan, self[orphan[3]]
+            by_line.setdefault(orphan[3], []).append(orphan)
+
+        for linenum, found in by_line.items():
+            found.sort(key=lambda orphan: orphan[1])
+            theline = self[linenum]
+            pieces = []
+            last = 0
+            for orphan in found:
+                pieces.append(theline[last:orphan[1]])
+                last = orphan[2]
+            pieces.append(theline[last:])
+            self[linenum] = ''.join(pieces)
+        return orphans
+
+
+class LineFeatures(object):
+    ''' everything the parser's lookahead and state machine ask about a line.
+    the features that take a regex are worked out when first asked for, and
+    then kept. see CRParser.line_features(). '''
+
+    __slots__ = ['parser', 'line', 'cleaned', 'indent', 'blank', 'centered',
+                 'startshortquote', 'endshortquote', 'allcaps', 'newpage', 'billheading',
+                 'billdescription', 'date', 'speaker', 'recorder', 'recorder_fuzzy',
+                 'longquote_start', 'rollcall', ]
+
+    # feature: the CRParser regex that finds it
+    searches = {
+        'allcaps': 're_allcaps',
+        'newpage': 're_newpage',
+        'billheading': 're_billheading',
+        'billdescription': 're_billdescription',
+        'recorder': 're_recorderstart',
+        'recorder_fuzzy': 're_recorder_fuzzy',
+        'longquote_start': 're_longquotestart',
+        'rollcall': 're_rollcall',
+    }
+
+    def __init__(self, parser, line):
+        self.parser = parser
+        self.line = line
+        self.cleaned = parser.clean_line(line)
+        stripped = line.strip()
+        self.blank = not stripped
+        if self.blank:
+            self.indent = 0
+            self.centered = False
+        else:
+            self.indent = len(line) - len(line.lstrip())
+            right_align = (parser.LINE_MAX_LENGTH - len(stripped))/2
+            self.centered = self.indent in [right_align-1, right_align, right_align+1]
+        self.startshortquote = line.find('``') != -1
+        self.endshortquote = line.find("''") != -1
+
+    def search(self, re_string, string=None):
+        if string is None:
+            string = self.line
+        return self.parser.pattern(re_string).search(string)
+
+    def __getattr__(self, name):
+        # only called for features that haven't been worked out yet.
+        if name in self.searches:
+            value = bool(self.search(getattr(self.parser, self.searches[name])))
+        elif name == 'date':
+            value = bool(self.search(self.parser.re_date, self.line.strip()))
+        elif name == 'speaker':
+            value = self.search(self.parser.re_newspeaker)
+            if value:
+                value = value.group('name')
+        else:
+            raise AttributeError(name)
+        setattr(self, name, value)
+        return value
+
+
 class CRParser(object):
     ''' Parser functionality and regular expressions common to all
     congressional record documents'''
@@ -298,7 +430,8 @@ class CRParser(object):
 
         # Remove internal page numbers and timestamps
         f = StringIO()
-        content = open(abspath).read()
+        content = read_raw(abspath)
+        self.raw_digest = digest(content)
         content = re.sub(r'\n?\n?\[\[Page.*?\]\]\n?', ' ', content)
         #content = re.sub(r'\n\n +\{time\} +\d+\n', '', content)
         self.is_bullet = False
@@ -308,36 +441,53 @@ class CRParser(object):
 
         self.rawlines = StringIO(content).readlines()
         self.get_metadata()
+        # the regexes used on each line, compiled once per document, and what
+        # they found, by line.
+        self.patterns = {}
+        self.feature_table = {}
         self.has_speakers = False
         for line in self.rawlines:
-            if re.search(self.re_newspeaker, line):
+            if self.line_features(line).speaker is not None:
                 self.has_speakers = True
                 break
 
         self.date = None
 
-        # state information
+        # state information. the rest of the state of the paragraph state
+        # machine is kept by markup_paragraph() (see grammar.py).
         self.currentline = 0
         self.current_speaker = None
-        self.inquote = False
-        self.intitle = False
-        self.new_paragraph = False
-        self.recorder = False
-        self.inlongquote = False
-        self.newspeaker = False
-        self.inrollcall = False
+
+        # errors raised while classifying the current line, by LineClass field
+        self.line_errors = {}
+        # is_title() for the lines the state machine has asked about, by position
+        self.title_table = {}
+        # how often each grammar edge was followed, by (from, to)
+        self.transition_counts = {}
 
         # output
-        self.xml = ['<CRDoc>', ]
+        self.xml = MarkupLines(['<CRDoc>', ])
+
 
+    def pattern(self, re_string):
+        pattern = self.patterns.get(re_string)
+        if pattern is None:
+            pattern = self.patterns[re_string] = re.compile(re_string)
+        return pattern
+
+    def line_features(self, theline):
+        ''' returns the LineFeatures of a line. each distinct line is only
+        classified once, however often the lookahead comes back to it. lines
+        are looked up by their text rather than their position, because the
+        text at a position can change (see check_bullet). '''
+        features = self.feature_table.get(theline)
+        if features is None:
+            features = self.feature_table[theline] = LineFeatures(self, theline)
+        return features
 
     def spaces_indented(self, theline):
         ''' returns the number of spaces by which the line is indented. '''
-        re_textstart = r'\S'
-        try:
-            return re.search(re_textstart, theline).start()
-        except AttributeError:
-            return 0
+        return self.line_features(theline).indent
 
     def parse(self):
         ''' parses a raw senate document and returns the same document marked
@@ -352,30 +502,26 @@ class CRParser(object):
         url = 'http://www.gpo.gov/fdsys/pkg/CREC-%(year)s-%(month)s-%(day)s/mods.xml' % locals()
         print 'No mods file found locally. Downloading from %s' % url
         page = urllib2.urlopen(url).read()
-        fh = open(os.path.join(path, 'mods.xml'), 'w')
-        fh.write(page)
-        fh.close()
-        self.get_metadata()
+        write_raw(path, {'mods.xml': page, })
 
     def get_metadata(self):
         path, filename = os.path.split(self.filename)
-        xml_filename = os.path.join(path, 'mods.xml')
         granule = filename.split('.')[0]
 
+        # the metadata for the whole day is indexed once, rather than parsing
+        # mods.xml again for every granule.
         try:
-            xml = open(xml_filename, 'r').read()
+            index = load_index(path)
         except IOError:
             self.download_mods_file()
+            index = load_index(path)
 
-        xml = open(xml_filename, 'r').read()
+        self.members = []
 
-        # Remove namespace to make using xpath easier.
-        xml = xml.replace('xmlns="http://www.loc.gov/mods/v3" ', '')
-        doc = lxml.etree.fromstring(xml)
-        self.volume = doc.xpath('extension/volume')[0].text
-        self.issue = doc.xpath('extension/issue')[0].text
-        self.congress = doc.xpath('extension/congress')[0].text
-        self.session = doc.xpath('//session')[0].text
+        self.volume = index['volume']
+        self.issue = index['issue']
+        self.congress = index['congress']
+        self.session = index['session']
 
         try:
             pagenums = re.search(r'(Pg.*)', granule).groups()[0]
@@ -385,39 +531,41 @@ class CRParser(object):
             return
             # sys.exit()
 
-        try:
-            item = doc.xpath("//relatedItem[re:test(., '%s')]" % pagenums,
-                             namespaces={'re': 'http://exslt.org/regular-expressions'})[0]
-        except IndexError:
+        item = find_granule(index, granule, pagenums)
+        if item is None:
             print 'Item not found in xml: %s' % granule
             sys.exit()
 
         # Get the document title
-        self.document_title = escape(item.xpath('titleInfo/title')[0].text)
+        self.document_title = escape(item['title'])
 
         # Get the names of the members of Congress listed
-        self.members = []
-        for member in item.xpath('extension/congMember'):
-            data = member.attrib
-            data.update({'name': member.xpath('name')[0].text, })
-            self.members.append(data)
-        #print '|'.join([x['name'].replace('.', '\.') for x in self.members])
-        #print self.re_newspeaker
+        self.members = item['members']
         self.re_newspeaker = self.re_newspeaker % '|'.join([x['name'].replace('.', '\.') for x in self.members])
 
-        self.referenced_by = []
-        for related_item in item.xpath('relatedItem'):
-            if related_item.attrib.get('type') == 'isReferencedBy':
-                for identifier in related_item.xpath('identifier'):
-                    data = identifier.attrib
-                    data.update({'text': identifier.text or '', })
-                    #print data
-                    self.referenced_by.append(data)
+        self.referenced_by = item['referenced_by']
+
+    def member_ids(self):
+        ''' (name, bioguide id) for the members of congress mods.xml lists
+        with an id, in the order it lists them. a name given to more than one
+        id is left out. '''
+        ids = {}
+        names = []
+        for member in self.members:
+            name, bioguide = member.get('name'), member.get('bioGuideId')
+            if not name or not bioguide:
+                continue
+            if name not in ids:
+                names.append(name)
+            elif ids[name] != bioguide:
+                bioguide = None
+            ids[name] = bioguide
+        return [(name, ids[name]) for name in names if ids[name]]
 
     def markup_preamble(self):
         self.currentline = 1
         theline = self.rawlines[self.currentline]
-        annotator = XMLAnnotator(theline)
+        annotator = XMLAnnotator(theline, self.patterns)
         annotator.register_tag(self.re_volume, '<volume>')
         annotator.register_tag(self.re_number, '<number>')
         annotator.register_tag(self.re_weekday, '<weekday>', group='weekday')
@@ -434,7 +582,7 @@ class CRParser(object):
     def markup_chamber(self):
         self.currentline = 2
         theline = self.rawlines[self.currentline]
-        annotator = XMLAnnotator(theline)
+        annotator = XMLAnnotator(theline, self.patterns)
         annotator.register_tag(self.re_chamber, '<chamber>')
         xml_line = annotator.apply()
         #print xml_line
@@ -444,21 +592,25 @@ class CRParser(object):
     def markup_pages(self):
         self.currentline = 3
         theline = self.rawlines[self.currentline]
-        annotator = XMLAnnotator(theline)
+        annotator = XMLAnnotator(theline, self.patterns)
         annotator.register_tag(self.re_pages, '<pages>', group='pages')
         xml_line = annotator.apply()
         #print xml_line
         self.xml.append(xml_line)
         self.xml.append('<congress>%s</congress>\n' % self.congress)
         self.xml.append('<session>%s</session>\n' % self.session)
+        # the ingest finds each speaker by the id mods.xml gives them, before
+        # trying their name.
+        for name, bioguide in self.member_ids():
+            self.xml.append('<member bioguide="%s">%s</member>\n' % (bioguide, name))
         self.markup_title()
 
     def clean_line(self, theline):
         ''' strip unwanted parts of documents-- page transitions and spacers.'''
-        newpage = re.match(self.re_newpage, theline)
+        newpage = self.pattern(self.re_newpage).match(theline)
         if newpage:
             theline = theline[:newpage.start()]+theline[newpage.end():]
-        underscore = re.match(self.re_underscore, theline)
+        underscore = self.pattern(self.re_underscore).match(theline)
         if underscore:
             theline = theline[:underscore.start()]+theline[underscore.end():]
         # note: dont strip whitespace when cleaning the lines because
@@ -469,7 +621,7 @@ class CRParser(object):
     def get_line(self, offset=0):
         if self.currentline+offset > len(self.rawlines)-1:
             return None
-        return self.clean_line(self.rawlines[self.currentline+offset])
+        return self.line_features(self.rawlines[self.currentline+offset]).cleaned
 
     def is_special_title(self, title):
         title = title.strip()
@@ -508,7 +660,7 @@ class CRParser(object):
 
         else:
             # a regular old title
-            annotator = XMLAnnotator(theline)
+            annotator = XMLAnnotator(theline, self.patterns)
             annotator.register_tag_open(self.re_title_start, '<document_title>')
             self.currentline +=1
             theline = self.get_line()
@@ -532,7 +684,7 @@ class CRParser(object):
                 # once we hit an empty line, we know the end of the *previous* line
                 # is the end of the title.
                 theline = self.get_line(-1)
-                annotator = XMLAnnotator(theline)
+                annotator = XMLAnnotator(theline, self.patterns)
                 annotator.register_tag_close(self.re_title_end, '</document_title>')
                 xml_line = annotator.apply()
                 #print xml_line
@@ -542,16 +694,6 @@ class CRParser(object):
             # the end of the title, which should generally be a blank line.
             self.markup_paragraph()
 
-    def set_speaker(self, theline):
-        # checks if there is a new speaker, and if so, set the current_speaker
-        # attribute, and returns the name of the new (and now current) speaker.
-        # else leaves the current speaker.
-        new_speaker = re.search(self.re_newspeaker, theline)
-        if new_speaker:
-            name = new_speaker.group('name')
-            self.current_speaker = name # XXX TODO this should be a unique ID
-        return self.current_speaker
-
     def check_bullet(self, theline):
         if theline.find('<bullet>') >= 0:
             self.rawlines[self.currentline] = self.rawlines[self.currentline].replace('<bullet>', ' ')
@@ -568,7 +710,9 @@ class CRParser(object):
 
     def markup_paragraph(self):
         ''' this is the standard paragraph parser. handles new speakers,
-        standard recorder comments, long and short quotes, etc. '''
+        standard recorder comments, long and short quotes, etc. each line is
+        classified once and takes one transition of the state machine in
+        grammar.py. '''
 
         # get to the first line
         theline = self.get_line()
@@ -579,7 +723,6 @@ class CRParser(object):
 
         # remove <bullet> tags if they exist
         theline = self.check_bullet(theline)
-        self.document_first_line = True
 
         if not self.has_speakers:
             self.xml.append('<recorder>')
@@ -591,82 +734,37 @@ class CRParser(object):
             self.xml.append('</CRDoc>')
             return
 
+        state = START
         while theline:
 
-            self.preprocess_state(theline)
-            annotator = XMLAnnotator(theline)
-
-            if self.intitle:
-                annotator.register_tag(self.re_title, '<title>', group='title')
-            # some things only appear on the first line of a paragraph
-            elif self.inrollcall:
-                # will only match on first line of the roll call
-                annotator.register_tag_open(self.re_rollcall, '<recorder>')
-            elif self.new_paragraph:
-                annotator.register_tag_open(self.re_longquotestart, '<speaking quote="true" speaker="%s">' % self.current_speaker, group='start')
-                if self.recorder:
-                    annotator.register_tag_open(self.re_startofline, '<recorder>')
-                    #annotator.register_tag_open(self.re_recorderstart, '<recorder>', 'start')
-                    #annotator.register_tag_open(self.re_recorder_fuzzy, '<recorder>', 'start')
-                annotator.register_tag(self.re_newspeaker, '<speaker name="%s">' % self.current_speaker, group='name')
-                if self.return_from_quote_interjection(theline):
-                    annotator.register_tag_open(self.re_longquotebody, '<speaking quote="true" speaker="%s">' % self.current_speaker, group='start')
-                if not self.recorder and not self.inlongquote:
-                    # check the current speaker-- if it's the recorder, then
-                    # even though this isn't a "known" recorder sentence,
-                    # there's no other speaker so we treat it like a recorder
-                    # comment.
-                    if self.current_speaker == 'recorder':
-                        annotator.register_tag_open(self.re_speaking, '<recorder>', group='start')
-                        self.recorder=True
-                    else:
-                        annotator.register_tag_open(self.re_speaking, '<speaking name="%s">' % self.current_speaker, group='start')
-
-            if not self.intitle and not self.inlongquote and not self.inrollcall:
-                #annotator.register_tag_open(self.re_startshortquote, '<quote speaker="%s">' % self.current_speaker)
-                pass
-
-            # note: the endquote tag needs to be registered BEFORE the end
-            # speaking tag, because the quote tag should appear before (be
-            # nested within) the speaking tag. a nesting functionality should
-            # really be implemented within the XMLAnnotator class, but this
-            # will do for now.
-            if not self.inlongquote and not self.intitle and not self.inrollcall:
-                if self.inquote:
-                    #annotator.register_tag_close(self.re_endshortquote, '</speaking>')
-                    pass
-
-            if self.paragraph_ends():
-                if self.inrollcall:
-                    annotator.register_tag_close(self.re_endofline, '</recorder>')
-                    self.inrollcall = False
-                elif self.recorder:
-                    annotator.register_tag_close(self.re_endofline, '</recorder>')
-                elif self.inlongquote:
-                    if self.longquote_ends():
-                        annotator.register_tag_close(self.re_endofline, '</speaking>')
-                elif self.intitle:
-                    pass
-                #  this specific set of states usually means we're somewhere
-                #  unrecognized, and can without these caveats can end up with
-                #  stray </speaking> tags.
-                elif (self.current_speaker == 'recorder' and self.inlongquote == False and self.inrollcall == False
-                    and self.recorder == False and self.inquote == False and self.intitle == False):
-                    print "UNRECOGNIZED STATE (but that's ok): %s" % theline
-                else:
-                    annotator.register_tag_close(self.re_endofline, '</speaking>')
-
-            #if (self.current_speaker == 'recorder' and self.inlongquote == False and self.inrollcall == False
-            #    and self.recorder == False and self.inquote == False and self.intitle == False):
-            #    print "UNRECOGNIZED STATE (but that's ok): %s" % theline
-            #    annotator.register_tag(self.re_alltext, '<unknown>', group='text')
+            (state, speaker, opentags, closetags, warn, error,
+             edge) = transition(state, self.line_class(theline))
+            if error and error != 'unrecognized':
+                error, flagged = self.line_errors[error[1]]
+                self.error_flag = flagged
+                raise error
+
+            if speaker == 'line':
+                self.current_speaker = self.line_features(theline).speaker
+            elif speaker == 'recorder':
+                self.current_speaker = 'recorder'
+
+            annotator = XMLAnnotator(theline, self.patterns)
+            for regex, tag, group, named in opentags:
+                if named:
+                    tag = tag % self.current_speaker
+                annotator.register_tag_open(getattr(self, regex), tag, group)
+            for regex, tag, group, named in closetags:
+                annotator.register_tag_close(getattr(self, regex), tag, group)
+            if warn:
+                print "UNRECOGNIZED STATE (but that's ok): %s" % theline
 
             xml_line = annotator.apply()
-            #print xml_line
             self.xml.append(xml_line)
 
-            # do some post processing
-            self.postprocess_state(theline)
+            if error == 'unrecognized':
+                self.unrecognized_state()
+            self.transition_counts[edge] = self.transition_counts.get(edge, 0) + 1
 
             # get the next line and do it all again
             self.currentline +=1
@@ -678,6 +776,111 @@ class CRParser(object):
                 # end of file
                 self.xml.append('</CRDoc>')
 
+        if DEBUG:
+            for edge, count in self.off_grammar():
+                print 'off grammar: %s -> %s (%d)' % (edge[0], edge[1], count)
+
+    def line_class(self, theline):
+        ''' classify the current line, theline, for the state machine. returns
+        the fields of a LineClass as a plain tuple, which is quicker to build
+        and hash. an error raised by one of the questions asked of the line is
+        kept in line_errors, and only raised if the transition needs the
+        answer. questions whose answers can't matter, whatever the state, are
+        left as None rather than searched for. '''
+        features = self.line_features(theline)
+        errors = self.line_errors = {}
+
+        error_flag = self.error_flag
+        try:
+            interjection = self.return_from_quote_interjection(theline)
+        except Exception, e:
+            errors['interjection'] = (e, self.error_flag)
+            self.error_flag = error_flag
+            interjection = RAISES
+
+        new_paragraph = self.is_new_paragraph(theline)
+        longquote_start = recorder_start = recorder_fuzzy = speaker = None
+        rollcall = title = billheading = None
+        if new_paragraph or interjection:
+            longquote_start = features.longquote_start
+            if not longquote_start and not interjection:
+                recorder_start = features.recorder
+                if not recorder_start:
+                    recorder_fuzzy = features.recorder_fuzzy
+                    speaker = features.speaker is not None
+        else:
+            rollcall = features.rollcall
+            if not rollcall:
+                title, error = self.title_answers(theline, 0)[0]
+                if error is not None:
+                    errors['title'] = error
+                billheading = features.billheading
+
+        closes_quote = False
+        if features.endshortquote:
+            last_open_quote = theline.rfind("``")
+            closes_quote = last_open_quote == -1 or theline.rfind("''") > last_open_quote
+
+        # whether the paragraph, or a long quote, ends on this line, looking
+        # ahead to the next line once for every state it might be asked in.
+        offset = 1
+        following = self.get_line(offset)
+        while following and not following.strip():
+            offset += 1
+            following = self.get_line(offset)
+        if not following:
+            ends = ends_in_quote = ends_in_rollcall = longquote_ends = True
+        else:
+            indent = self.spaces_indented(following)
+            ends_in_rollcall = indent == self.NEW_PARA_INDENT
+            longquote_ends = indent not in self.LONGQUOTE_NEW_PARA_INDENT
+            if self.is_new_paragraph(following):
+                ends = ends_in_quote = True
+            else:
+                outside, inside = self.title_answers(following, offset)
+                local_offset = self.currentline+offset
+                line_above = self.line_features(self.rawlines[local_offset - 1])
+                first_line_on_page = self.line_features(self.rawlines[local_offset - 2]).newpage
+                interjected = (indent == self.LONGQUOTE_INDENT and line_above.blank
+                               and not first_line_on_page)
+                ends = outside[0] or interjected
+                ends_in_quote = inside[0] or interjected
+                if outside[1] is not None:
+                    errors['ends'] = errors['ends_in_quote'] = outside[1]
+
+        # in the order of the LineClass fields
+        return (new_paragraph, interjection, longquote_start, recorder_start,
+                recorder_fuzzy, speaker, rollcall, title, billheading,
+                features.startshortquote, closes_quote, ends, ends_in_quote,
+                ends_in_rollcall, longquote_ends)
+
+    def title_answers(self, theline, offset):
+        ''' is_title() for the line at offset, outside and then inside a long
+        quote, each as (answer, error). kept by position, so a line looked
+        ahead to isn't asked about again once the parser gets to it. '''
+        position = self.currentline + offset
+        answers = self.title_table.get(position)
+        if answers is None:
+            error_flag = self.error_flag
+            try:
+                outside = (self.is_title(theline, offset, False), None)
+            except Exception, e:
+                outside = (RAISES, (e, self.error_flag))
+                self.error_flag = error_flag
+            inside = outside
+            # being in a long quote only ever turns a title into a non-title.
+            if outside[0] is True:
+                inside = (self.is_title(theline, offset, True), None)
+            answers = self.title_table[position] = (outside, inside)
+        return answers
+
+    def off_grammar(self):
+        ''' the transitions taken that aren't edges of the chamber's grammar,
+        as a list of ((from, to), count). '''
+        grammar = chamber_grammar(os.path.basename(self.filename))
+        return sorted([(edge, count) for edge, count in self.transition_counts.items()
+                       if edge not in grammar])
+
     def matching_tags(self, open, close):
         ''' determine if the close tag matches the open tag '''
         space = open.find(' ')
@@ -691,10 +894,17 @@ class CRParser(object):
             return False
 
 
+    def balance(self):
+        ''' remove the tags that were found to be mismatched as the document
+        was marked up (see MarkupLines). returns the tags removed. '''
+        return self.xml.balance()
+
     def validate(self):
         ''' validate the xml in the file, checking for mismatched tags and
         removing any tags if necessary. basically, it's more important for the
-        document to validate than to get everything perfect.'''
+        document to validate than to get everything perfect. balance() does
+        the same as the document is marked up; this scans it again, and only
+        finds anything in a document balance() hasn't been run on. '''
 
         re_opentag = r'<[A-Za-z_]+( [a-z]+=".*?")?>'
         re_closetag = r'</[A-Za-z_]+>'
@@ -759,146 +969,18 @@ class CRParser(object):
         '''
         return
 
-    def longquote_ends(self):
-        # XXX this function is totally repeating patterns used in other
-        # places...
-
-        offset = 1
-        theline = self.get_line(offset)
-        while theline and not theline.strip():
-            offset += 1
-            theline = self.get_line(offset)
-
-        # there should only be NO line if it's the end of the document
-        if not theline:
-            return True
-        # longquote ends when the new paragraph is NOT another longquote
-        # paragraph (be it a new title, vote, or just regular paragraph).
-        if self.spaces_indented(theline) not in self.LONGQUOTE_NEW_PARA_INDENT:
-            return True
-        return False
-
-    def preprocess_state(self, theline):
-        ''' in certain cases we need to match a regular expression AND a state,
-        so do some analysis to determine which tags to register. '''
-
-        return_from_interjection = self.return_from_quote_interjection(theline)
-
-        if self.is_new_paragraph(theline) or return_from_interjection:
-            self.new_paragraph = True
-            self.intitle = False
-
-            # if there's a new speaker, we don't want to
-            #if re.search(self.re_newspeaker, theline):
-            #    self.newspeaker = True
-
-            # in the case of a long quote, we don't change the current speaker.
-            if re.search(self.re_longquotestart, theline) or return_from_interjection:
-                # if it's a long quote but we're already IN a long quote, then
-                # we don't want to mark the beginning again, so suppress the
-                # new paragraph state.
-                if self.inlongquote == True:
-                    self.new_paragraph = False
-                self.inlongquote = True
-            else:
-                self.inlongquote = False
-                # if it's a recorder reading, then make a note.
-                # re_recroder_fuzzy looks for terms that indicate a
-                # continuation of a recorder comment only if the recorder was
-                # already speaking, but not otherwise.
-                if re.search(self.re_recorderstart, theline) or (self.current_speaker == 'recorder'
-                    and re.search(self.re_recorder_fuzzy, theline)):
-                    self.recorder = True
-                    self.current_speaker = 'recorder'
-                else:
-                    self.set_speaker(theline)
-                    if self.current_speaker == None and self.document_first_line:
-                        self.document_first_line = False
-                        self.recorder = True
-                        self.current_speaker = 'recorder'
-
-        elif re.search(self.re_rollcall, theline):
-            self.inrollcall=True
-            self.intitle = False
-            self.new_paragraph = False
-
-        elif not self.inlongquote and not self.inrollcall and self.is_title(theline):
-            self.intitle = True
-            self.new_paragraph = False
-
-        elif re.search(self.re_billheading, theline):
-            self.intitle = True
-            self.inlongquote = False
-            self.new_paragraph = False
-
-        else:
-            self.new_paragraph = False
-            self.intitle = False
-
-        # if a quote starts we are "in a quote" but we stay in that quote until
-        # we detect it ends.
-        if not self.inlongquote and re.search(self.re_startshortquote, theline):
-            self.inquote = True
-
-        # debugging..
-        #print 'in title? %s' % self.intitle
-        #print 'new paragraph? %s' % self.new_paragraph
-        '''
-        if self.current_speaker:
-            print 'current speaker: ' + self.current_speaker
-        else:
-            print 'no current speaker'
-        '''
-        #print 'in long quote? %s' % self.inlongquote
-        #print 'in recorder? %s' % self.recorder
-        #print 'in quote? %s' % self.inquote
-        #print 'in roll call? %s' % self.inrollcall
-
-    def postprocess_state(self, theline):
-        ''' in certain cases where a state ends on a line, we only want to note
-        that after the proper tags have been registered and inserted. '''
-
-        # if we're in a long quote, the only way that we know the long quote is
-        # over is when a new paragraph starts and is NOT a long quote. else,
-        # just move along... nothing to see here.
-        if self.inlongquote:
-            return
-
-        if (not self.recorder and not self.inlongquote
-            and not self.intitle and not self.current_speaker):
-            #return
-            # this is a wierd state we shouldn't be in
-            #print ''.join(self.rawlines)
-            objdata = self.__dict__
-            del objdata['xml']
-            del objdata['rawlines']
-            #print ''
-            #print objdata
-            #print ''
-            message = 'Unrecognized state while parsing %s\n' % self.filename
-            self.error_flag = True
-            raise UnrecognizedCRDoc(message)
-
-        # if there's one or more complete quotes (start and end) on a line, or
-        # if a single quote ends that started on a previous line,  then we're
-        # good to go and close the state. but if there's a quote that opens,
-        # that doesn't close, we need to stay in this state.
-        if self.inquote and re.search(self.re_endshortquote, theline):
-            last_open_quote = theline.rfind("``")
-            last_close_quote = theline.rfind("''")
-            if last_open_quote == -1 or last_close_quote > last_open_quote:
-                self.inquote = False
-
-        # note that here we set self.recorder to be False whilst leaving
-        # self.current_speaker set to 'recorder' (which it gets set to when a
-        # recorder state is recognized). this half-state is used when parsing
-        # long bits of verbatim material included in the CR as ready by the
-        # recorder.
-        if self.recorder and self.paragraph_ends():
-            self.recorder = False
-
-        if self.intitle:
-            self.intitle = False
+    def unrecognized_state(self):
+        # this is a wierd state we shouldn't be in
+        #print ''.join(self.rawlines)
+        objdata = self.__dict__
+        del objdata['xml']
+        del objdata['rawlines']
+        #print ''
+        #print objdata
+        #print ''
+        message = 'Unrecognized state while parsing %s\n' % self.filename
+        self.error_flag = True
+        raise UnrecognizedCRDoc(message)
 
     def return_from_quote_interjection(self, theline):
         ''' sometimes a paragraph in a long quote is not indented because it
@@ -910,72 +992,21 @@ class CRParser(object):
             self.error_flag = True
             raise AlignmentError(message)
 
-        line_above = self.rawlines[self.currentline -1].strip()
+        line_above = self.line_features(self.rawlines[self.currentline -1])
         two_lines_above = self.rawlines[self.currentline -2].strip()
-        empty = ""
 
         if (self.spaces_indented(theline) == self.LONGQUOTE_INDENT and
-            line_above == empty and two_lines_above.endswith('--')):
+            line_above.blank and two_lines_above.endswith('--')):
             return True
         else:
             return False
 
-    def paragraph_ends(self):
-        ''' check if the current paragraph ends by looking ahead to what the
-        next non-empty line is. idempotent. '''
-
-        # a paragraph ending is really only indicated by the formatting which
-        # follows it. if a line is followed by a new paragraph, a long section
-        # of quoted text, or a subheading, then we know this must be the end of
-        # athe current paragraph. almost all of those possibilities are
-        # indicated by the indentation level.
-        offset = 1
-        theline = self.get_line(offset)
-        while theline and not theline.strip():
-            offset += 1
-            theline = self.get_line(offset)
-
-        # if the document ends here, then it's certainly also the end of the
-        # paragraph
-        if not theline:
-            return True
-        if self.inrollcall:
-            if self.spaces_indented(theline) == self.NEW_PARA_INDENT:
-                return True
-            else:
-                return False
-        # new para or new long quote?
-        if self.is_new_paragraph(theline):
-            return True
-        # if the next line is a title then this paragraph is also over.
-        if self.is_title(theline, offset=offset):
-            return True
-        # this strange case arises sometimes when legislators interject a
-        # comment into the middle of something they are quoting/reading.
-        local_offset = self.currentline+offset
-        line_above = self.rawlines[local_offset - 1].strip()
-        first_line_on_page = re.search(self.re_newpage, self.rawlines[local_offset - 2])
-        empty = ""
-        if self.spaces_indented(theline) == self.LONGQUOTE_INDENT and line_above == empty and not first_line_on_page:
-            return True
-        # finally, if none of these cases are true, return false.
-        return False
-
     def is_centered(self, theline):
+        # a line is centered if its left and right align are the same (modulo
+        # off-by-one for even-length titles), which makes it a title.
+        return self.line_features(theline).centered
 
-        if not theline.strip():
-            return False
-        left_align = re.search('\S', theline).start()
-        right_align = (self.LINE_MAX_LENGTH - len(theline.strip()))/2
-        # if the left and right align are the same (modulo off-by-one for
-        # even-length titles) then we consider it centered, and therefore a
-        # title.
-        if left_align in [right_align-1, right_align, right_align+1]:
-            return True
-        else:
-            return False
-
-    def is_title(self, theline, offset=0):
+    def is_title(self, theline, offset=0, inlongquote=False):
         #self.current_line +offset must be the index for theline
         local_offset = self.currentline + offset
         if not self.rawlines[local_offset] == theline:
@@ -983,54 +1014,48 @@ class CRParser(object):
             self.error_flag = True
             raise AlignmentError(message)
 
-        first_line_on_page = re.search(self.re_newpage, self.rawlines[local_offset - 2])
-        line_above = self.rawlines[local_offset - 1].strip('\n')
-        line_below = self.rawlines[local_offset + 1].strip('\n')
-        empty = lambda line: len(line.strip()) == 0
+        features = self.line_features(theline)
+        first_line_on_page = self.line_features(self.rawlines[local_offset - 2]).newpage
+        line_above = self.line_features(self.rawlines[local_offset - 1])
+        line_below = self.line_features(self.rawlines[local_offset + 1])
 
-        if re.search(self.re_allcaps, theline):
+        if features.allcaps:
             return True
 
-        if re.search(self.re_billdescription, theline):
+        if features.billdescription:
             return False
 
-        if self.is_centered(theline) and self.spaces_indented(theline) > 0:
-            if (empty(line_above) and self.is_centered(line_below)):
-                #print 'line above empty'
-                #print 'line above:', line_above
-                #print 'theline:', theline
-                #print 'line_below:', line_below
-                #print 'context:', '\n'.join(self.rawlines[local_offset-5:local_offset+5])
+        if features.centered and features.indent > 0:
+            if (line_above.blank and line_below.centered):
                 return True
-            if (empty(line_below) and self.is_centered(line_above)):
-                #print 'line below empty'
+            if (line_below.blank and line_above.centered):
                 return True
-            if (self.is_centered(line_above) and self.is_centered(line_below)):
-                if self.inlongquote:
+            if (line_above.centered and line_below.centered):
+                if inlongquote:
                     return False
                 else:
                     return True
-            if (empty(line_above) and empty(line_below)):
+            if (line_above.blank and line_below.blank):
                 # the first line on a page can look like a title because
                 # there's an empty line separating new page designators from
                 # page content. but, we know exactly what those look like so
                 # eliminate that possibility here.
                 if not first_line_on_page:
                     return True
-                elif self.spaces_indented(theline) > 2:
+                elif features.indent > 2:
                     return True
         # this basically accounts for letter headers. note that the line
         # lengths include a character for the \n newline character.
-        if (empty(line_above) and
-            (empty(line_below) or self.spaces_indented(line_below) in self.LONGQUOTE_NEW_PARA_INDENT
-             or self.spaces_indented(line_below) == self.LONGQUOTE_INDENT) and
+        if (line_above.blank and
+            (line_below.blank or line_below.indent in self.LONGQUOTE_NEW_PARA_INDENT
+             or line_below.indent == self.LONGQUOTE_INDENT) and
             (len(theline) == 67 or len(theline) == 66 or len(theline) == 63)):
             return True
         # bill headers eg like  SEC. _03. SENSE OF CONGRESS.
-        if re.search(self.re_billheading, theline):
+        if features.billheading:
             return True
 
-        if self.is_centered(theline) and re.search(self.re_date, theline.strip()):
+        if features.centered and features.date:
             return True
 
         return False
@@ -1045,16 +1070,32 @@ class CRParser(object):
             return True
         return False
 
+    def output_path(self):
+        ''' where the xml file for this document is saved. '''
+        return xml_path(self.filename)
+
+    def document(self):
+        ''' the marked up document, as the string save() writes. '''
+        document = ''.join(self.xml)
+        if isinstance(document, unicode):
+            document = document.encode('utf-8')
+        return document
+
     def save(self):
         ''' save the xml file to disk.'''
-        saveas = self.filename.replace('raw', 'xml').replace('.txt', '.xml')
+        saveas = self.output_path()
         savedir = os.path.dirname(saveas)
         if not os.path.exists(savedir):
             os.makedirs(savedir)
         fp = open(saveas, 'w')
-        fp.write(''.join(self.xml))
+        fp.write(self.document())
         fp.close()
         print "saved file %s to disk" % saveas
+        return saveas
+
+def xml_path(abspath):
+    ''' where the xml file for a raw document is saved. '''
+    return abspath.replace('raw', 'xml').replace('.txt', '.xml')
 
 def usage():
     print ''
@@ -1063,10 +1104,17 @@ def usage():
     print ''
     print './parser.py CREC-2010-07-12-pt1-PgS5744-2.txt'
     print './parser.py 2010/07/02 [interactive]'
+    print './parser.py 2010/07/01 - 2010/07/31'
+    print './parser.py --all 2010/07/01 - 2010/07/31'
     print ''
     print "The optional 'interactive' mode is for debugging and will prompt"
     print "the user if they want to continue after each file."
     print ''
+    print "Days are parsed by a pool of processes, one per core unless"
+    print "PARSER_PROCESSES in settings.py or --processes=N says otherwise."
+    print "Only the granules that have changed, or were parsed by an older"
+    print "version of the parser, are parsed again, unless --all is given."
+    print ''
     sys.exit()
 
 def initialize_logfile():
@@ -1076,40 +1124,222 @@ def initialize_logfile():
     logfile = open(os.path.join(CWOD_HOME, LOG_DIR, 'parser.log'), 'a')
     return logfile
 
-def parse_directory(path, interactive=False):
-    logfile = initialize_logfile()
-    for file in os.listdir(path):
-        # we don't process the daily digest or front matter.
-        if file.find('FrontMatter') != -1 or file.find('PgD') != -1:
-            continue
-        if interactive:
-            resp = raw_input("process file %s? (y/n/q) " % file)
-            if resp == 'n':
-                print 'skipping\n'
-                continue
-            elif resp == 'q':
-                sys.exit()
-
-        abspath = os.path.join(path, file)
+def should_parse(filename):
+    ''' only granules are parsed, and not the daily digest or front matter. '''
+    return (filename.endswith('.txt') and filename.find('FrontMatter') == -1
+            and filename.find('PgD') == -1)
+
+# the stages of parsing a file that are timed separately.
+STAGES = ['read', 'parse', 'validate', 'save', ]
+
+def parse_file(abspath, logfile, save=True, keep=False):
+    ''' parse a raw document, saving it as xml unless save is False. returns a
+    dict describing the outcome: status is 'parsed', 'flagged' if the parser
+    set its error flag, or 'failed'; xml is the path of the xml file, whether
+    or not it was saved; raw_digest and xml_digest are the sha1 of the raw
+    text and the xml, for the manifest; seconds is the time spent in each
+    stage. if keep is
+    True, document holds the marked up document, so that it can be handed
+    straight on to the solr ingest. a failure is logged and never raised, so
+    one bad document can't stop a run. '''
+    result = {'file': abspath, 'status': 'failed', 'xml': None, 'document': None,
+              'raw_digest': None, 'xml_digest': None,
+              'seconds': dict.fromkeys(STAGES, 0.0), }
+    timer = [time.time(), ]
+    def finished(stage):
+        now = time.time()
+        result['seconds'][stage] += now - timer[0]
+        timer[0] = now
+
+    try:
         parser = CRParser(abspath)
-        try:
-            parser.parse()
-            print 'flag status:', parser.error_flag
-            if not parser.error_flag:
+        result['raw_digest'] = parser.raw_digest
+        finished('read')
+        parser.parse()
+        finished('parse')
+        print 'flag status:', parser.error_flag
+        if parser.error_flag:
+            result['status'] = 'flagged'
+        else:
+            parser.balance()
+            if PARSER_VALIDATE:
                 parser.validate()
+            finished('validate')
+            result['xml'] = parser.output_path()
+            document = parser.document()
+            result['xml_digest'] = digest(document)
+            if save:
                 parser.save()
-        except Exception, e:
-            today = datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            logfile.write('%s: Error processing file %s\n' % (today, abspath))
-            logfile.write('\t%s' % e)
-            logfile.flush()
+            if keep:
+                result['document'] = document
+            finished('save')
+            result['status'] = 'parsed'
+    # the parser gives up on some documents with sys.exit().
+    except (Exception, SystemExit), e:
+        today = datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        logfile.write('%s: Error processing file %s\n' % (today, abspath))
+        logfile.write('\t%s' % (e or e.__class__.__name__))
+        logfile.flush()
+    return result
+
+worker_logfile = None
+
+def parse_in_worker(args):
+    global worker_logfile
+    if worker_logfile is None:
+        worker_logfile = initialize_logfile()
+    abspath, save, keep = args
+    return parse_file(abspath, worker_logfile, save, keep)
+
+def iter_parse(paths, processes=PARSER_PROCESSES, save=True, keep=False):
+    ''' parse many raw documents, spread across a pool of processes, yielding
+    the result of each (see parse_file) as it is finished. '''
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if processes > 1 and len(paths) > 1:
+        pool = multiprocessing.Pool(min(processes, len(paths)))
+        try:
+            for result in pool.imap_unordered(parse_in_worker,
+                                              [(path, save, keep) for path in paths]):
+                yield result
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        logfile = initialize_logfile()
+        for path in paths:
+            yield parse_file(path, logfile, save, keep)
+
+def summarize(results, started):
+    ''' a summary of a run: the results of the files parsed, flagged and
+    failed, and the seconds spent in each stage, summed over all the files,
+    along with the wall time since the run started. '''
+    summary = {'parsed': [], 'flagged': [], 'failed': [],
+               'seconds': dict.fromkeys(STAGES, 0.0), }
+    for result in results:
+        summary[result['status']].append(result)
+        for stage, seconds in result['seconds'].items():
+            summary['seconds'][stage] += seconds
+    for status in ['parsed', 'flagged', 'failed', ]:
+        summary[status].sort(key=lambda result: result['file'])
+    summary['seconds']['total'] = time.time() - started
+    return summary
+
+def parse_files(paths, processes=PARSER_PROCESSES):
+    ''' parse many raw documents across a pool of processes and return a
+    summary of the run. '''
+    started = time.time()
+    return summarize(list(iter_parse(paths, processes)), started)
+
+def day_files(paths):
+    ''' the granules to parse for every day in paths (raw/yyyy/mm/dd). '''
+    files = []
+    for path in paths:
+        files.extend([os.path.join(path, file) for file in list_raw(path) if should_parse(file)])
+    return files
+
+def changed_files(files, save=True):
+    ''' the files whose raw text, or the parser, has changed since they were
+    last parsed, by the manifests of their days. if save is True, a granule
+    whose saved xml has gone missing or been changed is parsed again too. '''
+    manifests = Manifests()
+    changed = []
+    for path in files:
+        if manifests.of(path).needs_parse(path, digest(read_raw(path)), PARSER_VERSION,
+                                          save and xml_path(path) or None):
+            changed.append(path)
+    return changed
+
+def record_results(results):
+    ''' note what came of parsing each file in the manifest of its day. '''
+    manifests = Manifests()
+    for result in results:
+        if result['raw_digest'] is not None:
+            manifests.of(result['file']).parsed(result['file'], result['raw_digest'],
+                                                PARSER_VERSION, result['status'],
+                                                result['xml_digest'])
+    manifests.save()
+
+def parse_days(paths, processes=PARSER_PROCESSES, everything=False):
+    ''' parse the granules of every day in paths in one run, leaving out those
+    that haven't changed since they were last parsed unless everything is
+    True. returns the summary from parse_files, which also gives the time
+    taken to list the days and the number of granules left unchanged. '''
+    started = time.time()
+    files = day_files(paths)
+    if not everything:
+        changed = changed_files(files)
+    else:
+        changed = files
+    listed = time.time() - started
+    summary = parse_files(changed, processes)
+    record_results(summary['parsed'] + summary['flagged'] + summary['failed'])
+    summary['unchanged'] = len(files) - len(changed)
+    summary['seconds']['list'] = listed
+    summary['seconds']['total'] += listed
+    return summary
+
+def report(summary):
+    print ''
+    print 'Parser summary'
+    print '=============='
+    for status in ['parsed', 'flagged', 'failed', ]:
+        print '%s: %d' % (status, len(summary[status]))
+    if summary.get('unchanged'):
+        print 'unchanged: %d' % summary['unchanged']
+    for result in summary['failed']:
+        print '    failed: %s' % result['file']
+    for stage in ['list', ] + STAGES + ['total', ]:
+        if stage in summary['seconds']:
+            print '%-9s %8.2fs' % (stage, summary['seconds'][stage])
+
+def parse_directory(path, interactive=False, processes=PARSER_PROCESSES, everything=False):
+    if not interactive:
+        report(parse_days([path], processes, everything))
+        return path.replace('raw', 'xml')
+
+    logfile = initialize_logfile()
+    for file in list_raw(path):
+        if not should_parse(file):
+            continue
+        resp = raw_input("process file %s? (y/n/q) " % file)
+        if resp == 'n':
+            print 'skipping\n'
+            continue
+        elif resp == 'q':
+            sys.exit()
+
+        parse_file(os.path.join(path, file), logfile)
 
     output_dir = path.replace('raw', 'xml')
     return output_dir
 
+def day_paths(start, end):
+    ''' returns the raw directories that exist for the days from start to end
+    (yyyy/mm/dd), inclusive. '''
+    date = datetime.datetime.strptime(start, '%Y/%m/%d')
+    end = datetime.datetime.strptime(end, '%Y/%m/%d')
+    paths = []
+    while date <= end:
+        path = os.path.join(CWOD_HOME, 'raw', date.strftime('%Y/%m/%d'))
+        if raw_exists(path):
+            paths.append(path)
+        date += datetime.timedelta(1)
+    return paths
+
 if __name__ == '__main__':
 
-    # processes a file or entire directory
+    # processes a file, an entire directory or a range of them
+
+    processes = PARSER_PROCESSES
+    everything = False
+    for arg in sys.argv[1:]:
+        if arg.startswith('--processes='):
+            processes = int(arg.split('=', 1)[1])
+            sys.argv.remove(arg)
+        elif arg == '--all':
+            everything = True
+            sys.argv.remove(arg)
 
     if len(sys.argv) < 2:
         usage()
@@ -1137,9 +1367,19 @@ if __name__ == '__main__':
             sys.exit()
 
         if not parser.error_flag:
-            parser.validate()
+            parser.balance()
+            if PARSER_VALIDATE:
+                parser.validate()
             parser.save()
 
+    # if a range of dates is passed in, process all the files in it
+    elif len(sys.argv) == 4 and sys.argv[2] == '-':
+        try:
+            paths = day_paths(sys.argv[1], sys.argv[3])
+        except ValueError:
+            usage()
+        report(parse_days(paths, processes, everything))
+
     # if a date is passed in, process all files from that date
     else:
         date_path = sys.argv[1]
@@ -1149,9 +1389,8 @@ if __name__ == '__main__':
             interactive = True
         else: interactive = False
 
-        if not os.path.exists(path):
+        if not raw_exists(path):
             print 'no records exist for that date. try a different date.'
             usage()
 
-        parse_directory(path, interactive)
-
+        parse_directory(path, interactive, processes, everything)
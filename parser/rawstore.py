@@ -0,0 +1 @@
+../rawstore.py
\ No newline at end of file
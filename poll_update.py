@@ -0,0 +1,75 @@
+#!/usr/bin/python
+
+''' Polls GPO for new and corrected granules during the day, and takes only
+those through the parser and into solr. The daily update only ever looks at
+yesterday and skips any date already retrieved, so corrections and late
+granules would otherwise never be picked up.
+
+Usage:
+
+./poll_update.py                        poll today and yesterday once
+./poll_update.py dd/mm/yyyy [...]       poll the given dates once
+./poll_update.py --every=MINUTES [...]  keep polling, every MINUTES minutes
+
+A round of polling is skipped while the daily update, a backfill or another
+poll holds the update lock (see updatelock.py).
+'''
+
+import datetime, os, sys, time
+from settings import *
+from scraper.scraper import CRScraper, date_from_string
+from parser.parser import initialize_logfile, parse_file, should_parse, record_results
+from solr.ingest import solr_ingest_documents
+from updatelock import take_lock
+
+
+def poll_and_ingest(date, scraper=None):
+    ''' returns the xml files that were parsed and ingested for the date. the
+    documents go straight from the parser to the ingest. '''
+    scraper = scraper or CRScraper()
+    changed = scraper.poll(date)
+    logfile = initialize_logfile()
+    documents = []
+    results = []
+    for path in changed:
+        if should_parse(os.path.basename(path)):
+            result = parse_file(path, logfile, save=PARSER_SAVE_XML, keep=True)
+            results.append(result)
+            if result['document'] is not None:
+                documents.append((result['xml'], result['document']))
+    solr_ingest_documents(documents)
+    # so that the daily update doesn't take them through again.
+    record_results(results)
+    return [xml_file for xml_file, document in documents]
+
+def default_dates():
+    today = datetime.datetime.now()
+    return [today - datetime.timedelta(1), today, ]
+
+
+if __name__ == '__main__':
+
+    every = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--every='):
+            every = float(arg.split('=', 1)[1]) * 60
+            sys.argv.remove(arg)
+
+    try:
+        dates = [date_from_string(arg) for arg in sys.argv[1:]]
+    except ValueError:
+        print __doc__
+        sys.exit()
+
+    scraper = CRScraper()
+    while True:
+        lock = take_lock()
+        if lock is not None:
+            try:
+                for date in dates or default_dates():
+                    poll_and_ingest(date, scraper)
+            finally:
+                lock.close()
+        if not every:
+            break
+        time.sleep(every)
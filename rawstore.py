@@ -0,0 +1,234 @@
+#!/usr/bin/python
+
+''' Storage for the raw congressional record documents of a day.
+
+By default the scraper explodes each day into raw/YYYY/MM/DD/, one small text
+file per granule. With RAW_STORAGE = 'pack' in settings.py it instead writes a
+single compressed pack per day, raw/YYYY/MM/DD.pack. A pack is an ordinary zip
+file holding the granule text files and mods.xml; the zip central directory is
+the offset index. Packs are read through mmap, so pulling one granule out only
+touches that granule's bytes.
+
+Code that reads raw documents should go through read_raw() and list_raw(),
+which take the same raw/YYYY/MM/DD/filename paths in either layout and prefer
+a real file when both exist.
+
+Usage:
+
+./rawstore.py pack path/to/raw/YYYY/MM/DD     pack an existing day directory
+./rawstore.py list path/to/raw/YYYY/MM/DD     list the documents for a day
+./rawstore.py cat path/to/raw/YYYY/MM/DD/file print one document
+'''
+
+import mmap, os, sys, threading, zipfile
+from settings import *
+
+
+PACK_EXT = '.pack'
+
+def pack_path(day_dir):
+    ''' raw/2010/07/12/ -> raw/2010/07/12.pack '''
+    return os.path.normpath(day_dir) + PACK_EXT
+
+def inode(path):
+    try:
+        return os.stat(path).st_ino
+    except OSError:
+        return None
+
+
+class MappedFile(object):
+    ''' the file-like view of an mmap that zipfile needs. mmap.read() will not
+    read to the end without being given a size. '''
+
+    def __init__(self, map):
+        self.map = map
+
+    def read(self, size=-1):
+        if size < 0:
+            size = len(self.map) - self.map.tell()
+        return self.map.read(size)
+
+    def __getattr__(self, name):
+        return getattr(self.map, name)
+
+
+class DayPack(object):
+    ''' read access to a day's pack. '''
+
+    def __init__(self, path):
+        self.path = path
+        self.fh = open(path, 'rb')
+        self.inode = os.fstat(self.fh.fileno()).st_ino
+        self.map = mmap.mmap(self.fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.zip = zipfile.ZipFile(MappedFile(self.map))
+
+    def names(self):
+        return self.zip.namelist()
+
+    def __contains__(self, name):
+        return name in self.zip.NameToInfo
+
+    def read(self, name):
+        return self.zip.read(name)
+
+    def open(self, name):
+        return self.zip.open(name)
+
+    def close(self):
+        self.zip.close()
+        self.map.close()
+        self.fh.close()
+
+
+class PackWriter(object):
+    ''' builds a day's pack. the pack is written under a temporary name and
+    only moved into place by close(), so readers never see half a pack. '''
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        self.zip = zipfile.ZipFile(self.tmp_path, 'w', zipfile.ZIP_DEFLATED)
+
+    def add_file(self, name, path):
+        ''' zipfile streams the file in, so large documents are never held in
+        memory. '''
+        self.zip.write(path, name)
+
+    def add_data(self, name, data):
+        self.zip.writestr(name, data)
+
+    def names(self):
+        return self.zip.namelist()
+
+    def close(self):
+        self.zip.close()
+        os.rename(self.tmp_path, self.path)
+        # this thread may still hold the old pack open; others reopen it
+        # when they see it has been replaced.
+        forget(self.path)
+
+    def abort(self):
+        self.zip.close()
+        os.remove(self.tmp_path)
+
+
+# the parser and ingest work through one day at a time, so keeping the most
+# recently used pack open is enough to avoid reopening it for every granule.
+# each thread keeps its own, since the scraper writes packs from several at
+# once, and a pack rewritten since it was opened is opened again.
+cache = threading.local()
+
+def open_pack(path):
+    current = getattr(cache, 'pack', None)
+    if current is not None and (current.path != path or current.inode != inode(path)):
+        current.close()
+        current = None
+    if current is None:
+        current = cache.pack = DayPack(path)
+    return current
+
+def forget(path):
+    current = getattr(cache, 'pack', None)
+    if current is not None and current.path == path:
+        current.close()
+        cache.pack = None
+
+def read_raw(path):
+    ''' returns the contents of raw/YYYY/MM/DD/filename, from the day
+    directory if the file is there, else from the day's pack. raises IOError
+    if neither has it. '''
+    if os.path.exists(path):
+        return open(path).read()
+    day_dir, name = os.path.split(path)
+    pack = pack_path(day_dir)
+    if os.path.exists(pack):
+        days_pack = open_pack(pack)
+        if name in days_pack:
+            return days_pack.read(name)
+    raise IOError('No such raw document: %s' % path)
+
+def raw_mtime(path):
+    ''' when raw/YYYY/MM/DD/filename was last written, or None if it doesn't
+    exist. for a document in a pack this is when the pack was written. '''
+    for candidate in [path, pack_path(os.path.dirname(path)), ]:
+        if os.path.exists(candidate):
+            return os.path.getmtime(candidate)
+    return None
+
+def list_raw(day_dir):
+    ''' returns the names of the documents for a day, in either layout. '''
+    names = set()
+    if os.path.isdir(day_dir):
+        names.update(os.listdir(day_dir))
+    pack = pack_path(day_dir)
+    if os.path.exists(pack):
+        names.update(open_pack(pack).names())
+    return sorted(names)
+
+def raw_exists(day_dir):
+    return os.path.isdir(day_dir) or os.path.exists(pack_path(day_dir))
+
+def write_raw(day_dir, docs):
+    ''' store new or replacement documents for a day, given as a dict of
+    filename: contents, in whichever layout the day already uses. a pack
+    can't be changed in place, so it is rewritten with the new documents in
+    it; pass in all of a day's changes at once. '''
+    pack = pack_path(day_dir)
+    if os.path.isdir(day_dir) or (RAW_STORAGE != 'pack' and not os.path.exists(pack)):
+        if not os.path.exists(day_dir):
+            os.makedirs(day_dir)
+        for name, data in docs.items():
+            path = os.path.join(day_dir, name)
+            fh = open(path + '.tmp', 'wb')
+            fh.write(data)
+            fh.close()
+            os.rename(path + '.tmp', path)
+        return
+
+    writer = PackWriter(pack)
+    try:
+        if os.path.exists(pack):
+            old = open_pack(pack)
+            for name in old.names():
+                if name not in docs:
+                    writer.add_data(name, old.read(name))
+        for name in sorted(docs):
+            writer.add_data(name, docs[name])
+    except:
+        writer.abort()
+        raise
+    writer.close()
+
+def pack_directory(day_dir):
+    ''' convert an exploded day directory into a pack. the directory is left
+    in place; remove it once the pack has been checked. '''
+    writer = PackWriter(pack_path(day_dir))
+    for name in sorted(os.listdir(day_dir)):
+        writer.add_file(name, os.path.join(day_dir, name))
+    writer.close()
+
+
+def usage():
+    print __doc__
+    sys.exit()
+
+if __name__ == '__main__':
+
+    if len(sys.argv) != 3:
+        usage()
+
+    command, path = sys.argv[1:]
+    if command == 'pack':
+        pack_directory(path)
+        print 'packed %s into %s' % (path, pack_path(path))
+    elif command == 'list':
+        for name in list_raw(path):
+            print name
+    elif command == 'cat':
+        sys.stdout.write(read_raw(path))
+    else:
+        usage()
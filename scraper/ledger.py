@@ -0,0 +1,185 @@
+#!/usr/bin/python
+
+''' An indexed record of which dates the scraper has retrieved, kept in a small
+sqlite database keyed by date. This replaces scraper.log, which had to be read
+and rewritten in full for every date. Updates are atomic, so several scraper
+threads or processes can share one ledger.
+
+Usage:
+
+./ledger.py retry               list the dates that need to be retrieved again
+./ledger.py status dd/mm/yyyy   show the status and any granule errors for a date
+./ledger.py import [logfile]    load the entries from an old scraper.log
+'''
+
+import datetime, os, sqlite3, sys, threading
+from settings import *
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS dates (
+    date    TEXT PRIMARY KEY,
+    status  TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dates_status ON dates (status);
+CREATE TABLE IF NOT EXISTS granule_errors (
+    date    TEXT NOT NULL,
+    granule TEXT NOT NULL,
+    error   TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    PRIMARY KEY (date, granule)
+);
+CREATE TABLE IF NOT EXISTS granules (
+    date          TEXT NOT NULL,
+    granule       TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    digest        TEXT,
+    mods_digest   TEXT,
+    updated       TEXT NOT NULL,
+    PRIMARY KEY (date, granule)
+);
+'''
+
+# once a date has one of these statuses there is nothing more to fetch for it.
+FINISHED = ('success', 'nosession', )
+
+
+def datekey(date):
+    return date.strftime('%Y-%m-%d')
+
+def now():
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ScraperLedger(object):
+
+    def __init__(self, path=SCRAPER_DB):
+        self.path = path
+        self.local = threading.local()
+        is_new = not os.path.exists(path)
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        # carry over what the old text log knew the first time round.
+        if is_new and os.path.exists(SCRAPER_LOG):
+            self.import_log(SCRAPER_LOG)
+
+    def connection(self):
+        ''' sqlite connections can't be shared between threads, so each thread
+        gets its own. '''
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            dirname = os.path.dirname(self.path)
+            if dirname and not os.path.exists(dirname):
+                os.makedirs(dirname)
+            conn = sqlite3.connect(self.path, timeout=60)
+            self.local.conn = conn
+        return conn
+
+    def get_status(self, date):
+        row = self.connection().execute('SELECT status FROM dates WHERE date = ?',
+                                        [datekey(date), ]).fetchone()
+        if row:
+            return row[0]
+        return None
+
+    def set_status(self, date, status):
+        conn = self.connection()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO dates (date, status, updated) VALUES (?, ?, ?)',
+                         [datekey(date), status, now(), ])
+            # errors from an earlier attempt no longer apply once a date is done.
+            if status in FINISHED:
+                conn.execute('DELETE FROM granule_errors WHERE date = ?', [datekey(date), ])
+
+    def record_granule_error(self, date, granule, error):
+        conn = self.connection()
+        with conn:
+            conn.execute('''INSERT OR REPLACE INTO granule_errors (date, granule, error, updated)
+                                VALUES (?, ?, ?, ?)''',
+                         [datekey(date), granule, str(error), now(), ])
+
+    def granule_errors(self, date):
+        rows = self.connection().execute('''SELECT granule, error FROM granule_errors
+                                                WHERE date = ? ORDER BY granule''',
+                                         [datekey(date), ])
+        return rows.fetchall()
+
+    def get_granule(self, date, granule):
+        ''' returns what the last poll saw of a granule, as a dict with the
+        etag and last_modified validators sent by GPO and digests of its text
+        and of its mods.xml entry. every value is None for a granule we have
+        never polled. '''
+        row = self.connection().execute('''SELECT etag, last_modified, digest, mods_digest
+                                               FROM granules WHERE date = ? AND granule = ?''',
+                                        [datekey(date), granule, ]).fetchone()
+        if row is None:
+            row = (None, None, None, None, )
+        return dict(zip(['etag', 'last_modified', 'digest', 'mods_digest', ], row))
+
+    def set_granule(self, date, granule, **fields):
+        ''' update some of the values returned by get_granule. '''
+        values = self.get_granule(date, granule)
+        values.update(fields)
+        conn = self.connection()
+        with conn:
+            conn.execute('''INSERT OR REPLACE INTO granules
+                                (date, granule, etag, last_modified, digest, mods_digest, updated)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                         [datekey(date), granule, values['etag'], values['last_modified'],
+                          values['digest'], values['mods_digest'], now(), ])
+
+    def is_finished(self, date):
+        return self.get_status(date) in FINISHED
+
+    def needs_retry(self):
+        ''' returns the dates, oldest first, whose last attempt did not finish
+        cleanly. '''
+        rows = self.connection().execute('''SELECT date FROM dates
+                                                WHERE status NOT IN (%s) ORDER BY date'''
+                                         % ', '.join(['?'] * len(FINISHED)),
+                                         FINISHED)
+        return [datetime.datetime.strptime(row[0], '%Y-%m-%d') for row in rows]
+
+    def import_log(self, path):
+        ''' load the "dd/mm/yyyy, status" lines of an old scraper.log. '''
+        conn = self.connection()
+        with conn:
+            for line in open(path):
+                pieces = [x.strip() for x in line.split(',', 1)]
+                try:
+                    date = datetime.datetime.strptime(pieces[0], '%d/%m/%Y')
+                except ValueError:
+                    # the header line
+                    continue
+                conn.execute('INSERT OR REPLACE INTO dates (date, status, updated) VALUES (?, ?, ?)',
+                             [datekey(date), pieces[1], now(), ])
+
+
+def usage():
+    print __doc__
+    sys.exit()
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 2:
+        usage()
+
+    ledger = ScraperLedger()
+    command = sys.argv[1]
+    if command == 'retry':
+        for date in ledger.needs_retry():
+            print '%s, %s' % (date.strftime('%d/%m/%Y'), ledger.get_status(date))
+    elif command == 'status' and len(sys.argv) == 3:
+        date = datetime.datetime.strptime(sys.argv[2], '%d/%m/%Y')
+        print '%s, %s' % (sys.argv[2], ledger.get_status(date))
+        for granule, error in ledger.granule_errors(date):
+            print '    %s: %s' % (granule, error)
+    elif command == 'import':
+        if len(sys.argv) == 3:
+            ledger.import_log(sys.argv[2])
+        else:
+            ledger.import_log(SCRAPER_LOG)
+    else:
+        usage()
@@ -1,24 +1,152 @@
 #!/usr/bin/python
 
 import urllib, urllib2, os, datetime, re, sys, httplib, zipfile
-import time
+import time, threading, Queue, socket, shutil, hashlib, tempfile
+from cStringIO import StringIO
 from settings import *
+from ledger import ScraperLedger
+import rawstore, modsindex
 try:
     import json
 except:
     import simplejson as json
 
 
+class HostThrottle(object):
+    ''' limits the rate of requests and the number of open connections to a
+    single host. use it as a context manager around each request; it is safe
+    to share between threads. '''
+
+    def __init__(self, rate=SCRAPER_REQUESTS_PER_SECOND,
+                 connections=SCRAPER_MAX_CONNECTIONS):
+        if rate:
+            self.interval = 1.0 / rate
+        else:
+            self.interval = 0
+        self.connections = threading.BoundedSemaphore(connections)
+        self.lock = threading.Lock()
+        self.next_request = 0
+
+    def __enter__(self):
+        self.connections.acquire()
+        # reserve the next free slot in the schedule, then sleep outside the
+        # lock until it comes around.
+        self.lock.acquire()
+        now = time.time()
+        wait = self.next_request - now
+        self.next_request = max(now, self.next_request) + self.interval
+        self.lock.release()
+        if wait > 0:
+            time.sleep(wait)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connections.release()
+        return False
+
+throttles = {}
+throttles_lock = threading.Lock()
+
+def get_throttle(host):
+    ''' returns the throttle shared by every request to the given host. '''
+    throttles_lock.acquire()
+    try:
+        if host not in throttles:
+            throttles[host] = HostThrottle()
+        return throttles[host]
+    finally:
+        throttles_lock.release()
+
+
+def content_range(header):
+    ''' the first byte and the total size a Content-Range header gives, as
+    (start, total). either is None if the header doesn't say. '''
+    match = re.match(r'bytes (?:(\d+)-\d+|\*)/(\d+|\*)$', (header or '').strip())
+    if match is None:
+        return None, None
+    start, total = match.groups()
+    if start is not None:
+        start = int(start)
+    if total == '*':
+        total = None
+    else:
+        total = int(total)
+    return start, total
+
+
+def extract_pre(src, dest, chunk_size=SCRAPER_CHUNK_SIZE):
+    ''' copy the ascii-formatted <pre> section of the html granule in src to
+    dest, a chunk at a time. this matches r'<body><pre>(.*)</pre></body>': the
+    text runs from the first opening marker to the *last* closing marker. since
+    we can't know which closing marker is the last one until the end, all the
+    text is written out and dest is truncated back to the last marker seen.
+    returns False if either marker is missing. '''
+    start, end = '<body><pre>', '</pre></body>'
+
+    # find the opening marker, keeping enough of each chunk to catch a marker
+    # that straddles two chunks.
+    data = ''
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            return False
+        data += chunk
+        found = data.find(start)
+        if found != -1:
+            data = data[found+len(start):] or src.read(chunk_size)
+            break
+        data = data[-(len(start)-1):]
+
+    last_end = None
+    tail = ''
+    while data:
+        # the window starts len(tail) bytes before the current end of dest.
+        window = tail + data
+        found = window.rfind(end)
+        if found != -1:
+            last_end = dest.tell() - len(tail) + found
+        dest.write(data)
+        tail = window[-(len(end)-1):]
+        data = src.read(chunk_size)
+
+    if last_end is None:
+        return False
+    dest.seek(last_end)
+    dest.truncate()
+    return True
+
+
+shared_ledger = None
+ledger_lock = threading.Lock()
+
+def get_ledger():
+    ''' returns the ledger shared by every scraper in this process. '''
+    global shared_ledger
+    ledger_lock.acquire()
+    try:
+        if shared_ledger is None:
+            shared_ledger = ScraperLedger()
+        return shared_ledger
+    finally:
+        ledger_lock.release()
+
+
 class CRScraper(object):
-    def __init__(self):
+    def __init__(self, throttle=None, domain="www.gpo.gov", secure=True, ledger=None):
         # use httplib so that we can retrieve the headers before retrieving the
         # body.
-        self.domain = "www.gpo.gov"
+        self.domain = domain
+        self.secure = secure
         self.path = "/fdsys/pkg/"
         self.date = None
         self.datestring = None
         self.url = None
         self.zipsize = None
+        self.throttle = throttle or get_throttle(self.domain)
+        self.ledger = ledger or get_ledger()
+        # outcome of the last retrieve_by_date call, for reporting.
+        self.status = None
+        self.bytes_downloaded = 0
 
     def set_date(self, date):
         ''' given a date object, retrieve the documents for that given date and
@@ -27,20 +155,33 @@ class CRScraper(object):
         self.datestring = date.strftime("%Y-%m-%d")
         self.url = self.path + "CREC-%s.zip" % self.datestring
 
+    def save_path(self):
+        ''' the raw directory for the current date. use strftime here to ensure
+        day and month directories are always 2 digits. '''
+        return os.path.join(CWOD_HOME, 'raw/%d/%s/%s/' % (self.date.year,
+        self.date.strftime("%m"), self.date.strftime("%d")))
+
+    def connect(self, timeout=25):
+        if self.secure:
+            return httplib.HTTPSConnection(self.domain, timeout=timeout)
+        return httplib.HTTPConnection(self.domain, timeout=timeout)
+
     def was_in_session(self):
         # check the response header to make sure the Record exists for this date.
-        conn = httplib.HTTPSConnection(self.domain, timeout=25)
-        conn.request("HEAD", self.url)
-        # the connection can be a little dodgy, let it try connecting a few
-        # times if needed.
-        could_not_connect = 0
-        while could_not_connect < 3:
-            try:
-                resp = conn.getresponse()
-                could_not_connect = False
-                break
-            except:
-                could_not_connect += 1
+        with self.throttle:
+            conn = self.connect()
+            conn.request("HEAD", self.url)
+            # the connection can be a little dodgy, let it try connecting a few
+            # times if needed.
+            could_not_connect = 0
+            while could_not_connect < 3:
+                try:
+                    resp = conn.getresponse()
+                    could_not_connect = False
+                    break
+                except:
+                    could_not_connect += 1
+            conn.close()
         if could_not_connect:
             return None
 
@@ -48,7 +189,82 @@ class CRScraper(object):
         if content_type != 'application/zip':
             print 'Congress was not in session on %s' % self.datestring
             return False
-        self.zipsize = resp.getheader('content-length')
+        try:
+            self.zipsize = int(resp.getheader('content-length'))
+        except (TypeError, ValueError):
+            self.zipsize = None
+        return True
+
+    def download(self, tmpfile):
+        ''' stream the zip file to disk in fixed size chunks. the data goes to
+        a .part file which is renamed to tmpfile once complete; if a .part file
+        is left over from an interrupted attempt, the download resumes where it
+        stopped using a range request. a .part file that doesn't line up with
+        what the server has is thrown away, and the download starts over.
+        returns True on success. '''
+        partfile = tmpfile + '.part'
+        for attempt in xrange(SCRAPER_DOWNLOAD_ATTEMPTS):
+            have = 0
+            if os.path.exists(partfile):
+                have = os.path.getsize(partfile)
+            if self.zipsize is not None and have == self.zipsize:
+                break
+            headers = {}
+            if have:
+                headers['Range'] = 'bytes=%d-' % have
+                print 'resuming zip file %s at byte %d' % (tmpfile, have)
+            else:
+                print 'retrieving zip file %s. this could take a few mins...' % tmpfile
+            try:
+                with self.throttle:
+                    conn = self.connect(timeout=60)
+                    conn.request('GET', self.url, headers=headers)
+                    resp = conn.getresponse()
+                    if resp.status == 416 and have:
+                        conn.close()
+                        start, total = content_range(resp.getheader('content-range'))
+                        # nothing left past what we already have, which is
+                        # only done if it is the whole file.
+                        if have == (self.zipsize or total):
+                            break
+                        print 'partial zip file %s is %d bytes, not %s; starting over' % (
+                            tmpfile, have, self.zipsize or total)
+                        os.remove(partfile)
+                        continue
+                    if resp.status == 206:
+                        start, total = content_range(resp.getheader('content-range'))
+                        if start != have or (self.zipsize and total and total != self.zipsize):
+                            print 'asked for %s from byte %d, got byte %s of %s; starting over' % (
+                                self.url, have, start, total)
+                            conn.close()
+                            os.remove(partfile)
+                            continue
+                        out = open(partfile, 'ab')
+                    elif resp.status == 200:
+                        # the server ignored the range; start over.
+                        out = open(partfile, 'wb')
+                    else:
+                        print 'Problem downloading %s: HTTP %d' % (self.url, resp.status)
+                        conn.close()
+                        continue
+                    try:
+                        while True:
+                            chunk = resp.read(SCRAPER_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            out.write(chunk)
+                            self.bytes_downloaded += len(chunk)
+                    finally:
+                        out.close()
+                        conn.close()
+            except (httplib.HTTPException, socket.error), e:
+                print 'Problem downloading %s: %s' % (self.url, e)
+                continue
+            if self.zipsize is None or os.path.getsize(partfile) == self.zipsize:
+                break
+        else:
+            return False
+        os.rename(partfile, tmpfile)
         return True
 
     def retrieve(self):
@@ -57,18 +273,19 @@ class CRScraper(object):
         # download the zipfile if we don't already have it.
         rightsize = lambda tmpfile: os.path.getsize(tmpfile) == self.zipsize
         if not os.path.exists(tmpfile) or not rightsize(tmpfile):
-            zip = urllib.urlopen('http://' + self.domain + self.url)
-            tmp = open(tmpfile, 'w')
-            print 'retrieving zip file %s. this could take a few mins...' % tmpfile
-            tmp.write(zip.read())
-            tmp.close()
+            if not self.download(tmpfile):
+                self.status = 'download error'
+                self.log_download_status(self.status)
+                return None
         else: print '%s exists. skipping download' % tmpfile
 
-        # prepare the directory to copy the zipped files into. use strftime
-        # here to ensure day and month directories are always 2 digits.
-        save_path = os.path.join(CWOD_HOME, 'raw/%d/%s/%s/' % (self.date.year,
-        self.date.strftime("%m"), self.date.strftime("%d")))
-        if not os.path.exists(save_path):
+        # prepare the directory to copy the zipped files into. when packing,
+        # the directory is never created; its path names the pack.
+        save_path = self.save_path()
+        packing = RAW_STORAGE == 'pack'
+        if packing:
+            pack = rawstore.PackWriter(rawstore.pack_path(save_path))
+        elif not os.path.exists(save_path):
             os.makedirs(save_path)
 
         # iterate over the html files in the zipfile, extracting the
@@ -78,95 +295,251 @@ class CRScraper(object):
         num_expected_files = len(files)
         errors = 0
         for f in files:
-            doc = zip.read(f)
             if f.endswith('htm'):
                 filename = os.path.basename(f).split('.')[0]+'.txt'
             else:
                 filename = os.path.basename(f)
             saveas = os.path.join(save_path, filename)
-            if not os.path.exists(saveas):
-                # re.DOTALL is important - it tells 'dot' (.) to match newline character.
-                findraw = re.compile(r'<body><pre>(?P<raw>.*)</pre></body>', re.DOTALL)
+            if packing:
+                # TMP_DIR is shared by the days being scraped at once, and
+                # every day has a mods.xml, so each member gets a name of its
+                # own there.
+                fd, tmpname = tempfile.mkstemp(prefix=filename + '.', suffix='.tmp', dir=TMP_DIR)
+                os.close(fd)
+            else:
+                tmpname = saveas + '.tmp'
+            if packing or not os.path.exists(saveas):
+                # members are streamed out a chunk at a time, into a temporary
+                # file so that a failure never leaves a truncated granule.
                 try:
+                    doc = zip.open(f)
+                    out = open(tmpname, 'wb')
                     if f.endswith('htm'):
-                        raw = findraw.search(doc).group('raw')
+                        if not extract_pre(doc, out):
+                            raise ValueError('no <pre> section found in %s' % f)
                     else:
-                        raw = doc
-                    out = open(saveas, 'w')
-                    out.write(raw)
+                        shutil.copyfileobj(doc, out, SCRAPER_CHUNK_SIZE)
                     out.close()
+                    doc.close()
+                    if packing:
+                        pack.add_file(filename, tmpname)
+                        os.remove(tmpname)
+                    else:
+                        os.rename(tmpname, saveas)
                 except BaseException, e:
                     errors += 1
                     print 'Problem downloading file %s. Error:' % saveas
                     print e
+                    self.ledger.record_granule_error(self.date, filename, e)
+                    if os.path.exists(tmpname):
+                        os.remove(tmpname)
             else:
                 print 'file %s already exists. skipping.' % saveas
 
+        # index the day's metadata now, so that the parser and ingest don't
+        # each parse mods.xml again for every granule.
+        mods = [f for f in files if os.path.basename(f) == 'mods.xml']
+        if mods:
+            try:
+                index = modsindex.dumps(modsindex.build_index(zip.read(mods[0])))
+                if packing:
+                    pack.add_data(modsindex.INDEX_NAME, index)
+                else:
+                    rawstore.write_raw(save_path, {modsindex.INDEX_NAME: index, })
+            except Exception, e:
+                errors += 1
+                print 'Problem indexing %s. Error:' % mods[0]
+                print e
+                self.ledger.record_granule_error(self.date, modsindex.INDEX_NAME, e)
+
         # do some sanity checking
-        if errors or len(os.listdir(save_path)) != num_expected_files:
+        if packing:
+            saved_files = pack.names()
+            pack.close()
+        else:
+            saved_files = os.listdir(save_path)
+        num_saved_files = len([f for f in saved_files if f != modsindex.INDEX_NAME])
+        if errors or num_saved_files != num_expected_files:
             status = "errors"
         else:
             status = "success"
-        self.log_download_status(self.date.strftime("%d/%m/%Y"), status)
+        self.status = status
+        self.log_download_status(status)
         print 'Files for %s were retrieved with: %s' % (self.date.strftime("%d/%m/%Y"), status)
 
         # delete tmfile
+        zip.close()
         os.remove(tmpfile)
 
         return save_path
 
-    def log_download_status(self, datestring, status):
-        if not os.path.exists(SCRAPER_LOG):
-            if not os.path.exists(LOG_DIR):
-                os.makedirs(LOG_DIR)
-            scraper_log = open(SCRAPER_LOG, 'w')
-            scraper_log.write('Date, Status\n')
-            scraper_log.close()
-
-        scraper_log = open(SCRAPER_LOG, 'r')
-        scraper_lines = scraper_log.readlines()
-        scraper_log.close()
-        update_line = None
-        # if this date is already in the log file, update it.
-        for linenum, logline in enumerate(scraper_lines):
-            if datestring in logline:
-                # update the status of that line
-                update_line = linenum
-        if update_line:
-            scraper_lines[update_line] = '%s, %s\n' % (datestring, status)
-        # if the date was not already in the log file, append it at the end
+    def conditional_get(self, url, etag=None, last_modified=None):
+        ''' GET a url, sending the validators from our last fetch of it so that
+        GPO can answer 304 if it hasn't changed. returns the status, body,
+        etag and last-modified of the response. '''
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        with self.throttle:
+            conn = self.connect()
+            try:
+                conn.request('GET', url, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            finally:
+                conn.close()
+        self.bytes_downloaded += len(body)
+        return resp.status, body, resp.getheader('etag'), resp.getheader('last-modified')
+
+    def poll(self, date):
+        ''' check a day for new or corrected granules, without downloading the
+        whole zip file. the day's mods.xml is fetched with a conditional GET;
+        if GPO reports it unchanged there is nothing more to do. otherwise each
+        granule it lists is fetched, again conditionally, and compared with
+        what we already hold. new and changed granules are saved, along with
+        the new mods.xml. returns the raw paths of the granules whose text or
+        mods.xml entry changed, which are the ones that need parsing again. '''
+        self.set_date(date)
+        self.status = 'unchanged'
+        self.bytes_downloaded = 0
+        save_path = self.save_path()
+        package = self.path + 'CREC-%s/' % self.datestring
+
+        known = self.ledger.get_granule(self.date, 'mods.xml')
+        try:
+            status, mods, mods_etag, mods_modified = self.conditional_get(package + 'mods.xml',
+                known['etag'], known['last_modified'])
+        except (httplib.HTTPException, socket.error), e:
+            print 'Problem polling %s: %s' % (package, e)
+            self.status = 'GPO connection error'
+            return []
+        if status == 304:
+            return []
+        if status != 200:
+            # nothing published for this day, or not yet.
+            print 'No record published for %s (HTTP %d)' % (self.datestring, status)
+            self.status = 'not published'
+            return []
+        mods_digest = digest(mods)
+        if mods_digest == known['digest']:
+            self.ledger.set_granule(self.date, 'mods.xml', etag=mods_etag,
+                                    last_modified=mods_modified)
+            return []
+
+        # when the ledger hasn't seen a granule before, compare against the
+        # copy we already hold, if any, so a day first retrieved as a zip file
+        # is not parsed all over again.
+        try:
+            held_entries = dict(mods_entries(rawstore.read_raw(os.path.join(save_path, 'mods.xml'))))
+        except IOError:
+            held_entries = {}
+
+        try:
+            docs = {'mods.xml': mods,
+                    modsindex.INDEX_NAME: modsindex.dumps(modsindex.build_index(mods)), }
+        except Exception, e:
+            print 'Problem indexing mods.xml for %s: %s' % (self.datestring, e)
+            self.ledger.record_granule_error(self.date, 'mods.xml', e)
+            self.status = 'errors'
+            return []
+        updates = {}
+        changed = []
+        errors = 0
+        for granule, entry in mods_entries(mods):
+            filename = granule + '.txt'
+            known = self.ledger.get_granule(self.date, granule)
+            entry_digest = digest(entry)
+            if known['mods_digest'] is None and granule in held_entries:
+                known['mods_digest'] = digest(held_entries[granule])
+            try:
+                status, body, etag, last_modified = self.conditional_get(
+                    package + 'html/%s.htm' % granule, known['etag'], known['last_modified'])
+                if status == 304:
+                    text_digest = known['digest']
+                elif status == 200:
+                    out = StringIO()
+                    if not extract_pre(StringIO(body), out):
+                        raise ValueError('no <pre> section found in %s' % granule)
+                    text = out.getvalue()
+                    text_digest = digest(text)
+                    if known['digest'] is None:
+                        try:
+                            known['digest'] = digest(rawstore.read_raw(os.path.join(save_path, filename)))
+                        except IOError:
+                            pass
+                    if text_digest != known['digest']:
+                        docs[filename] = text
+                else:
+                    raise ValueError('HTTP %d' % status)
+            except (httplib.HTTPException, socket.error, ValueError), e:
+                errors += 1
+                print 'Problem polling granule %s. Error:' % granule
+                print e
+                self.ledger.record_granule_error(self.date, filename, e)
+                continue
+            updates[granule] = {'etag': etag or known['etag'],
+                                'last_modified': last_modified or known['last_modified'],
+                                'digest': text_digest,
+                                'mods_digest': entry_digest, }
+            if filename in docs or entry_digest != known['mods_digest']:
+                changed.append(filename)
+
+        # only record what we've seen once it is safely stored, so that a
+        # failure here is picked up again by the next poll.
+        rawstore.write_raw(save_path, docs)
+        for granule, fields in updates.items():
+            self.ledger.set_granule(self.date, granule, **fields)
+        if not errors:
+            self.ledger.set_granule(self.date, 'mods.xml', etag=mods_etag,
+                                    last_modified=mods_modified, digest=mods_digest)
+            self.status = 'success'
         else:
-            scraper_lines.append('%s, %s\n' % (datestring, status))
-        scraper_log = open(SCRAPER_LOG, 'w')
-        scraper_log.writelines(scraper_lines)
-        scraper_log.close()
+            self.status = 'errors'
+        self.log_download_status(self.status)
+        print 'Polled %s: %d changed granules, %d errors' % (self.date.strftime("%d/%m/%Y"),
+                                                              len(changed), errors)
+        return [os.path.join(save_path, filename) for filename in sorted(changed)]
+
+    def log_download_status(self, status):
+        self.ledger.set_status(self.date, status)
 
     def previously_retrieved(self):
-        datestring = self.date.strftime("%d/%m/%Y")
-        if not os.path.exists(SCRAPER_LOG):
-             return False
-        scraper_lines = open(SCRAPER_LOG).readlines()
-        for line in scraper_lines:
-            if datestring in line and 'success' in line:
-                print 'This date was previously retrieved: Record already exists\n'
-                return True
-            if datestring in line and 'nosession' in line:
-                print 'This date was previously retrieved: Congress was not in session.\n'
-                return True
+        status = self.ledger.get_status(self.date)
+        if status == 'success':
+            print 'This date was previously retrieved: Record already exists\n'
+            return True
+        if status == 'nosession':
+            print 'This date was previously retrieved: Congress was not in session.\n'
+            return True
         return False
 
     def retrieve_by_date(self, date):
         self.set_date(date)
+        self.status = 'previously retrieved'
+        self.bytes_downloaded = 0
         if not self.previously_retrieved():
             in_session = self.was_in_session()
             if in_session:
                 path = self.retrieve()
                 return path
             elif in_session == False:
-                datestring = self.date.strftime("%d/%m/%Y")
-                self.log_download_status(datestring, 'nosession')
+                self.status = 'nosession'
+                self.log_download_status('nosession')
             elif in_session == None:
-                self.log_download_status(self.date.strftime("%d/%m/%Y"), 'GPO connection error')
+                self.status = 'GPO connection error'
+                self.log_download_status('GPO connection error')
+
+def digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+def mods_entries(mods):
+    ''' returns (granule, entry) for each granule listed in a day's mods.xml,
+    where entry is the text of the granule's relatedItem element. '''
+    entries = re.finditer(r'<relatedItem [^>]*ID="id-([^"]+)".*?(?=<relatedItem [^>]*ID="|</mods>)',
+                          mods, re.S)
+    return [(entry.group(1), entry.group(0)) for entry in entries]
 
 def date_from_string(datestring):
     return datetime.datetime.strptime(datestring, "%d/%m/%Y")
@@ -178,6 +551,72 @@ def daterange_list(start, end):
     dates = [start + datetime.timedelta(n) for n in xrange(daterange)]
     return dates
 
+def scrape_dates(dates, workers=SCRAPER_WORKERS):
+    ''' check and retrieve the records for many dates at once, using a pool of
+    worker threads. requests to GPO are paced by the shared per-host throttle.
+    returns a list of dicts describing the outcome for each date, in date
+    order. '''
+    todo = Queue.Queue()
+    for date in dates:
+        todo.put(date)
+    results = []
+    results_lock = threading.Lock()
+
+    def work():
+        scraper = CRScraper()
+        while True:
+            try:
+                date = todo.get_nowait()
+            except Queue.Empty:
+                return
+            print "Checking Congressional Record for %s" % date
+            started = time.time()
+            try:
+                path = scraper.retrieve_by_date(date)
+                status = scraper.status
+            except Exception, e:
+                path = None
+                status = 'error: %s' % e
+            result = {'date': date,
+                      'status': status,
+                      'path': path,
+                      'bytes': scraper.bytes_downloaded,
+                      'seconds': time.time() - started, }
+            results_lock.acquire()
+            results.append(result)
+            results_lock.release()
+
+    threads = [threading.Thread(target=work) for i in xrange(max(1, workers))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    # join with a timeout so that ctrl-c still reaches the main thread.
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(1)
+
+    results.sort(key=lambda result: result['date'])
+    return results
+
+def report(results, elapsed):
+    ''' print the outcome for each date and the overall throughput. '''
+    print ''
+    print 'Scraper summary'
+    print '==============='
+    for result in results:
+        print '%s  %-22s %8.1fs %10d bytes' % (result['date'].strftime("%d/%m/%Y"),
+            result['status'], result['seconds'], result['bytes'])
+    total_bytes = sum([result['bytes'] for result in results])
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    print ''
+    for status, count in sorted(counts.items()):
+        print '%s: %d' % (status, count)
+    if elapsed:
+        print '%d dates in %.1fs (%.2f dates/min, %.1f KB/s)' % (len(results),
+            elapsed, len(results) * 60.0 / elapsed, total_bytes / 1024.0 / elapsed)
+
 def usage():
     return '''
 Several ways to invoke the scraper:
@@ -191,7 +630,11 @@ Several ways to invoke the scraper:
 3. "./scraper.py dd/mm/yyyy - dd/mm/yyyy" will retreive congressional records for all days within the range given. the first date should occur before the second date in time.
 
 4. "./scraper.py dd/mm/yyyy" will retreive the congressional record for the day given.
-    '''
+
+Any of these may be preceded by "--workers=N" to check and download N dates at
+once (default %d). Requests to each host are limited to
+SCRAPER_REQUESTS_PER_SECOND and SCRAPER_MAX_CONNECTIONS from settings.py.
+    ''' % SCRAPER_WORKERS
 
 def run_scraper(date):
     ''' Returns True if there were records to retrieve, and False is congress
@@ -202,6 +645,12 @@ def run_scraper(date):
 
 if __name__ == '__main__':
 
+    workers = SCRAPER_WORKERS
+    for arg in sys.argv[1:]:
+        if arg.startswith('--workers='):
+            workers = int(arg.split('=', 1)[1])
+            sys.argv.remove(arg)
+
     if len(sys.argv) == 1:
         print usage()
         sys.exit()
@@ -232,15 +681,6 @@ if __name__ == '__main__':
         print 'There was an error: ', e
         sys.exit()
 
-    for date in dates:
-        print "Checking Congressional Record for %s" % date
-        if CRScraper().retrieve_by_date(date):
-            print 'Will now sleep for 10 seconds before retrieving next record...zzz...'
-            time.sleep(10)
-        else:
-            if len(dates) == 1:
-                sys.exit()
-            else:
-                #print 'sleeping for 5 seconds...zzz...'
-                #time.sleep(5)
-                continue
+    started = time.time()
+    results = scrape_dates(dates, workers)
+    report(results, time.time() - started)
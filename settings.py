@@ -9,7 +9,78 @@ LOG_DIR = os.environ.get("CAPWORDS_LOGS")
 # how far back in time does the system check for congressional record
 # documents? dd/mm/yyyy format.
 OLDEST_DATE = '01/06/2010'
-# where should the scraper log the files it's downloaded?
+# where should the scraper log the files it's downloaded? the log is kept in
+# an sqlite database; the old text log is only read to seed a new database.
+SCRAPER_DB = os.path.join(LOG_DIR, 'scraper.db')
 SCRAPER_LOG = os.path.join(LOG_DIR, 'scraper.log')
+# how hard may the scraper hit GPO? these replace the old fixed sleep between
+# dates. the rate is in requests per second and applies to each host, as does
+# the cap on open connections. workers is the default number of dates checked
+# and downloaded at once.
+SCRAPER_WORKERS = 4
+SCRAPER_REQUESTS_PER_SECOND = 0.5
+SCRAPER_MAX_CONNECTIONS = 2
+# zip files are downloaded and unpacked this many bytes at a time, and an
+# interrupted download is resumed up to this many times before giving up.
+SCRAPER_CHUNK_SIZE = 64 * 1024
+SCRAPER_DOWNLOAD_ATTEMPTS = 5
+# how raw documents are stored: 'directory' writes one text file per granule
+# under raw/YYYY/MM/DD/, 'pack' writes one compressed pack per day to
+# raw/YYYY/MM/DD.pack (see rawstore.py). readers handle either layout.
+RAW_STORAGE = 'directory'
+# how many processes parse documents at once. None means one per core.
+PARSER_PROCESSES = None
+# the parser balances tags as it marks a document up. set this to also run
+# the older full validation pass over each document afterwards, as a check.
+PARSER_VALIDATE = False
+# parse_and_ingest.py and capitolwords.py hand parsed documents straight to
+# the solr ingest; the xml files under xml/ are then only an archive, and are
+# not written when this is False. daily_update.sh still ingests from them.
+PARSER_SAVE_XML = True
+# where the ingest writes the solr documents it makes from the xml.
+SOLR_DOC_PATH = os.path.join(CWOD_HOME, 'solrdocs')
+# how solr documents are stored: 'files' writes each to a file of its own under
+# solrdocs/YYYY/MM/DD/, 'bundle' appends them to one compressed bundle per day,
+# solrdocs/YYYY/MM/DD.bundle (see solrstore.py). readers handle either layout.
+SOLR_DOC_STORAGE = 'files'
+# where the manifest of each day is kept: what was last parsed and ingested
+# from each granule, so that re-runs skip what hasn't changed (see
+# manifest.py).
+MANIFEST_DIR = os.path.join(CWOD_HOME, 'manifests')
+# where the ingest writes the counts of the ngrams said each day, for jobs
+# that total them up (see ngramcounts.py).
+NGRAM_COUNT_DIR = os.path.join(CWOD_HOME, 'ngramcounts')
+# where backfill.py checkpoints the days it has finished, so it can resume.
+BACKFILL_STATE = os.path.join(LOG_DIR, 'backfill.json')
+# the lock held by whichever of poll_update.py, daily_update.sh and
+# backfill.py is writing the days' packs, manifests and bundles, so that only
+# one of them does at a time (see updatelock.py).
+UPDATE_LOCK = os.path.join(TMP_DIR, 'update.lock')
 # what domain and port are solr listening on?
 SOLR_DOMAIN = os.environ.get("CAPWORDS_SOLR_URL")
+# solr documents are posted in batches of up to this many documents or bytes,
+# whichever comes first, with one commit at the end of a run (see
+# solr/update.py). set SOLR_COMMIT_WITHIN to a number of milliseconds to have
+# solr also commit each batch itself within that time.
+SOLR_BATCH_DOCUMENTS = 100
+SOLR_BATCH_BYTES = 4 * 1024 * 1024
+SOLR_COMMIT_WITHIN = None
+# how the ingest posts solr documents: 'xml' as <add> requests, or 'json' in
+# solr's json update format, to its update/json handler (solr 3.1 and later).
+# the solr documents are saved as xml either way.
+SOLR_UPDATE_FORMAT = 'xml'
+# the solr clients (see solrclient.py) keep up to SOLR_POOL_SIZE idle
+# connections open to each solr, give up on a call after SOLR_TIMEOUT seconds,
+# and retry a call that couldn't reach solr, or that solr failed with a 5xx, up
+# to SOLR_RETRIES times, waiting SOLR_BACKOFF seconds before the first retry
+# and twice as long before each one after.
+SOLR_POOL_SIZE = 4
+SOLR_TIMEOUT = 30
+SOLR_RETRIES = 3
+SOLR_BACKOFF = 0.5
+# which solr holds each congress, as {'111': ('localhost', 8983), ...}. calls
+# for a congress not listed go to the default solr: SOLR_SERVER and SOLR_PORT
+# if SOLR_SERVER is set, or else SOLR_DOMAIN.
+SOLR_SERVERS = {}
+SOLR_SERVER = None
+SOLR_PORT = 8983
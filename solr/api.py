@@ -4,7 +4,7 @@
 returning nicely formatted statistics.  '''
 
 import datetime
-import urllib, urllib2, sys, os
+import sys
 import settings
 try:
     import json
@@ -14,6 +14,7 @@ except:
 from dateutil.parser import parse as dateparse
 
 from lib import volume_lookup
+from solrclient import solr_for
 
 
 # return dicts of dates and frequency counts, plus links back to the raw ascii
@@ -28,12 +29,7 @@ def as_solr_date(datestring):
 
 def encode_and_retrieve(args):
     ''' encode the args and retrieve the solr response.'''
-    base_url = os.path.join(settings.SOLR_DOMAIN, 'solr/select?')
-    data = urllib.urlencode(args)
-    full_url = base_url+data
-    print full_url
-    fp = urllib2.urlopen(full_url)
-    return json.loads(fp.read())
+    return solr_for().select(args)
 
 def solr_api_call(args):
     ''' manages the actual API call. adds common query parameters, and handles
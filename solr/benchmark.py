@@ -0,0 +1,199 @@
+#!/usr/bin/python
+
+''' Times the ngram extractor (see ngrams.py) on the solr document bodies of
+parsed days, against the extractor it replaced, and checks that both give the
+same ngrams in each field. Needs no network, solr or database.
+
+The days are the xml checked in under tests/fixtures/xml, unless others are
+given. Each body is run through both extractors, over and over, reporting the
+time taken and bodies and ngrams per second. Bodies the two don't agree on
+are listed. Those with text outside ascii, or with double quotes, are listed
+as changed: the old extractor read their utf-8 a byte at a time, splitting
+accented words, and read &quot; as a word (see make_ngrams in ngrams.py).
+Any other body that differs is listed as such, and the exit status is then 1.
+
+Usage:
+
+./benchmark.py                          time the fixture days
+./benchmark.py --repeat=N               extract from each body N times (default 5)
+./benchmark.py path/to/xml/YYYY/MM/DD   time other days
+'''
+
+import os, re, sys, time
+from xml.sax.saxutils import escape, unescape
+import nltk
+from nltk.util import ngrams as nltk_ngrams
+from ingest import SolrDoc
+from ngrams import make_ngrams
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'fixtures')
+
+def reference_make_ngrams(xml, filename):
+    ''' the extractor as the ingest had it before ngrams.py. tokens are whole
+    matches of the tokenizer pattern, as nltk 2 gave them; later versions of
+    nltk.regexp_tokenize give the groups of the pattern instead, and don't
+    have nltk.util as an attribute of nltk. '''
+    text = re.findall(r'<field name="speaking">(.*?)<\/field>', xml, re.S)
+
+    fields = ['unigrams', 'bigrams', 'trigrams', 'quadgrams', 'pentagrams', ]
+    ngrams = []
+
+    bill_regex = re.compile(r'(?:H|S)\. ?(?:(?:J|R)\. ?)?(?:Con\. ?)?(?:Res\. ?)?$')
+
+    for graf in text:
+        graf = re.sub(r' +', ' ', graf.replace('\n', ' '))
+        sentences = nltk.tokenize.sent_tokenize(graf)
+
+        done = []
+
+        for n, sentence in enumerate(sentences):
+
+            if n in done:
+                continue
+
+            sentence = re.sub(r'<.*?>', '', unescape(sentence))
+
+            if bill_regex.search(sentence):
+                try:
+                    if re.search(r'[0-9]+\.', sentences[n+1]):
+                        sentence = ' '.join([sentence, sentences[n+1]])
+                        done.append(n+1)
+                except IndexError:
+                    pass
+            done.append(n)
+
+            regex = r'''(?x)
+            (?:H|S)\.\ ?(?:(?:J|R)\.\ )?(?:Con\.\ )?(?:Res\.\ )?\d+ # Bills
+          | ([A-Z]\.)+                                              # Abbreviations (U.S.A., etc.)
+          | ([A-Z]+\&[A-Z]+)                                        # Internal ampersands (AT&T, etc.)
+          | (Mr\.|Dr\.|Mrs\.|Ms\.)                                  # Mr., Mrs., etc.
+          | \d*\.\d+                                                # Numbers with decimal points.
+          | \d\d?:\d\d                                              # Times.
+          | \$?[,\.0-9]+\d                                          # Numbers with thousands separators, (incl currency).
+          | (((a|A)|(p|P))\.(m|M)\.)                                # a.m., p.m., A.M., P.M.
+          | \w+((-|')\w+)*                                          # Words with optional internal hyphens.
+          | \$?\d+(\.\d+)?%?                                        # Currency and percentages.
+          | (?<=\b)\.{3,4}(?=\b)                                     # Ellipses surrounded by word borders
+          | [][.,;"'?():-_`]
+            '''
+
+            tokens = [match.group() for match in
+                      re.finditer(regex, sentence, re.UNICODE | re.MULTILINE | re.DOTALL)]
+            words = [re.sub(r',', '', x.lower().rstrip('-').strip("'"))
+                        for x in tokens
+                        if re.search(r'[a-z0-9.?!]', x.lower()) and not re.search(r'[.]{5,}', x.lower())]
+
+            ngrams += [item for sublist in [['<field name="%s">%s</field>' % (field, escape(' '.join(ngram)))
+                            for ngram in nltk_ngrams(words, n+1)]
+                                for n, field in enumerate(fields)] for item in sublist]
+
+    return '\n'.join(ngrams)
+
+re_field = re.compile(r'<field name="(\w+)">(.*?)</field>')
+
+def reference_fields(xml):
+    ''' the ngrams of each field the reference extractor made, as ngrams.py
+    makes them. '''
+    fields = {}
+    for field, ngram in re_field.findall(xml):
+        fields.setdefault(field, []).append(unescape(ngram))
+    return fields
+
+def document_bodies(days):
+    ''' the text of the speaking fields of the solr documents made from the
+    xml documents of days, as the ingest hands them to the extractor, and as
+    the body the reference extractor took, with the path of each. '''
+    bodies = []
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        for day in days:
+            for name in sorted(os.listdir(day)):
+                if not name.endswith('.xml'):
+                    continue
+                path = os.path.join(day, name)
+                for section in SolrDoc(path).sections:
+                    grafs = [''.join(text) for field, text in section['fields'] if field == 'speaking']
+                    body = ''.join(['<field name="speaking">%s</field>' % escape(graf, {'"': '&quot;'})
+                                    for graf in grafs])
+                    bodies.append((path, body.encode('utf-8'), grafs))
+    finally:
+        sys.stdout = stdout
+    return bodies
+
+def changed(grafs):
+    ''' whether grafs have text that ngrams.py reads differently from the old
+    extractor, on purpose. '''
+    for graf in grafs:
+        if '"' in graf or (isinstance(graf, unicode) and [c for c in graf if ord(c) > 127]):
+            return True
+    return False
+
+def run(extract, bodies, repeat):
+    ''' the seconds extract took over bodies, repeat times, and the fields it
+    made of each. '''
+    started = time.time()
+    for i in xrange(repeat):
+        fields = [extract(body, path) for path, body in bodies]
+    return time.time() - started, fields
+
+def run_reference(bodies, repeat):
+    return run(reference_make_ngrams, [(path, body) for path, body, grafs in bodies], repeat)
+
+def run_ngrams(bodies, repeat):
+    return run(make_ngrams, [(path, grafs) for path, body, grafs in bodies], repeat)
+
+def fixture_days():
+    days = []
+    for dirpath, dirnames, filenames in os.walk(os.path.join(FIXTURES, 'xml')):
+        dirnames.sort()
+        if [name for name in filenames if name.endswith('.xml')]:
+            days.append(dirpath)
+    return days
+
+
+if __name__ == '__main__':
+
+    repeat = 5
+    for arg in sys.argv[1:]:
+        if arg.startswith('--repeat='):
+            repeat = int(arg.split('=', 1)[1])
+            sys.argv.remove(arg)
+        elif arg.startswith('-'):
+            print __doc__
+            sys.exit()
+    days = sys.argv[1:] or fixture_days()
+
+    bodies = document_bodies(days)
+    if not bodies:
+        print 'nothing said in the documents of %s' % ', '.join(days)
+        sys.exit()
+    reference_seconds, expected = run_reference(bodies, repeat)
+    seconds, found = run_ngrams(bodies, repeat)
+    ngrams = sum([sum(map(len, fields.values())) for fields in found]) * repeat
+
+    print '%d bodies, %d ngrams, %d times over' % (len(bodies), ngrams / repeat, repeat)
+    print '%-12s %10s %12s %12s' % ('extractor', 'seconds', 'bodies/s', 'ngrams/s')
+    for name, taken in [('before', reference_seconds), ('ngrams.py', seconds)]:
+        print '%-12s %10.3f %12.1f %12.1f' % (name, taken, len(bodies) * repeat / taken, ngrams / taken)
+    print '%.1fx faster' % (reference_seconds / seconds)
+
+    differ = []
+    changes = []
+    for (path, body, grafs), before, after in zip(bodies, expected, found):
+        if reference_fields(before) == after:
+            continue
+        if changed(grafs):
+            changes.append(path)
+        else:
+            differ.append(path)
+    if changes:
+        print '%d bodies changed, for their quotes or text outside ascii:' % len(changes)
+        for path in sorted(set(changes)):
+            print '  ' + path
+    if differ:
+        print '%d bodies differ:' % len(differ)
+        for path in sorted(set(differ)):
+            print '  ' + path
+        sys.exit(1)
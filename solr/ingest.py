@@ -4,96 +4,44 @@
 primary difference is that solr expects fields to be in a different format, and
 the coarseness of its retrieval ability is limited to documents, so for example,
 if you want to limit a search result to a specific speaker, then you may only
-have one speaker per solr document.'''
+have one speaker per solr document.
 
-from httplib import HTTPConnection
-import xml.dom.minidom as xml
-from xml.sax.saxutils import escape, unescape
-from xml.parsers.expat import ExpatError
+./ingest.py path/to/xml/YYYY/MM/DD/CREC-...xml [...] [--solrdocs-only]
+./manifest.py pending path/to/raw/YYYY/MM/DD | ./ingest.py - [--solrdocs-only]
+'''
+
+from xml.sax.saxutils import escape
+from cStringIO import StringIO
 import sys, os, re
-from lib import bioguide_lookup, db_bioguide_lookup, fallback_bioguide_lookup
+from lib import SpeakerIndex
+from modsindex import load_index, find_granule
+from manifest import Manifests, digest
+from ngramcounts import CountFiles, save_date_counts
+from solrstore import Bundles, solrdoc_name
+from update import SolrUpdater
+from ngrams import make_ngrams
+from records import to_add
 from settings import *
 import datetime
 
 import lxml.etree
-import nltk
 
 from django.template.defaultfilters import slugify
 
 
-def make_ngrams(xml, filename):
-    text = re.findall(r'<field name="speaking">(.*?)<\/field>', xml, re.S)
-
-    fields = ['unigrams', 'bigrams', 'trigrams', 'quadgrams', 'pentagrams', ]
-    ngrams = []
-
-    # Identify bills at the end of sentences.
-    # Should be able to train the sentence tokenizer
-    # to know that bill names aren't sentence delimiters.
-    bill_regex = re.compile(r'(?:H|S)\. ?(?:(?:J|R)\. ?)?(?:Con\. ?)?(?:Res\. ?)?$')
-
-    for graf in text:
-        graf = re.sub(r' +', ' ', graf.replace('\n', ' '))
-        sentences = nltk.tokenize.sent_tokenize(graf)
-
-        done = []
+# bump this whenever a change alters the solr documents made from the xml,
+# so that granules ingested by an older version are ingested again (see
+# manifest.py).
+INGEST_VERSION = 2
 
-        for n, sentence in enumerate(sentences):
-
-            if n in done:
-                continue
-
-            sentence = re.sub(r'<.*?>', '', unescape(sentence))
-
-            # Handle problem of bill numbers being split into new sentences.
-            if bill_regex.search(sentence):
-                try:
-                    if re.search(r'[0-9]+\.', sentences[n+1]):
-                        sentence = ' '.join([sentence, sentences[n+1]])
-                        done.append(n+1)
-                except IndexError:
-                    pass
-            done.append(n)
-
-
-            # Adapted From Natural Language Processing with Python
-            regex = r'''(?x)
-            (?:H|S)\.\ ?(?:(?:J|R)\.\ )?(?:Con\.\ )?(?:Res\.\ )?\d+ # Bills
-          | ([A-Z]\.)+                                              # Abbreviations (U.S.A., etc.)
-          | ([A-Z]+\&[A-Z]+)                                        # Internal ampersands (AT&T, etc.)
-          | (Mr\.|Dr\.|Mrs\.|Ms\.)                                  # Mr., Mrs., etc.
-          | \d*\.\d+                                                # Numbers with decimal points.
-          | \d\d?:\d\d                                              # Times.
-          | \$?[,\.0-9]+\d                                          # Numbers with thousands separators, (incl currency).
-          | (((a|A)|(p|P))\.(m|M)\.)                                # a.m., p.m., A.M., P.M.
-          | \w+((-|')\w+)*                                          # Words with optional internal hyphens.
-          | \$?\d+(\.\d+)?%?                                        # Currency and percentages.
-          | (?<=\b)\.{3,4}(?=\b)                                     # Ellipses surrounded by word borders
-          | [][.,;"'?():-_`]
-            '''
-
-            # Tokenize the sentence into unigrams
-            # and do some cleanup of the tokens
-            words = [re.sub(r',', '', x.lower().rstrip('-').strip("'"))
-                        for x in nltk.regexp_tokenize(sentence, regex)
-                        if re.search(r'[a-z0-9.?!]', x.lower()) and not re.search(r'[.]{5,}', x.lower())]
-
-            ngrams += [item for sublist in [['<field name="%s">%s</field>' % (field, escape(' '.join(ngram)))
-                            for ngram in nltk.util.ngrams(words, n+1)]
-                                for n, field in enumerate(fields)] for item in sublist]
-
-    return '\n'.join(ngrams)
-
-
-def find_bills(xml):
+def find_bills(grafs):
     """Find any ngrams that are bill numbers.
     """
-    text = re.findall(r'<field name="speaking">(.*?)<\/field>', xml, re.S)
     regex = re.compile(r'(?:H|S)\. ?(?:(?:J|R)\. )?(?:Con\. )?(?:Res\. )?\d+')
     bills = []
-    for graf in text:
+    for graf in grafs:
         bills += regex.findall(graf)
-    return '\n'.join(['<field name="bill">%s</field>' % bill for bill in set(bills)]) + '\n'
+    return sorted(set(bills))
 
 
 numeric_months = {
@@ -111,51 +59,150 @@ numeric_months = {
     'december': '12',
 }
 
+# the tags the parser marks a document up with. any other tag is dropped,
+# keeping what is inside it.
+valid_tags = set([
+    'doc', 'add', 'volume', 'number', 'weekday', 'month', 'day', 'year',
+    'chamber', 'pages', 'document_title', 'speaker', 'speaking', 'quote',
+    'recorder', 'title', 'rollcall', 'congress', 'session', 'bullet',
+    'member', ])
+
+# the solr field each tag in the body of a document becomes. the other tags
+# are dropped in the same way, keeping what is inside them.
+field_tags = {
+    'recorder': 'speaking',
+    'speaking': 'speaking',
+    'rollcall': 'rollcall',
+    'quote': 'quote',
+    'title': 'title',
+}
+
+# the tags whose text is the metadata of the whole document.
+metadata_tags = set([
+    'volume', 'number', 'chamber', 'pages', 'congress', 'session', 'day',
+    'month', 'year', ])
+
 
 class SolrDoc(object):
-    def __init__(self, file):
+    def __init__(self, file, document=None):
+        ''' file is the path of a document saved by the parser. the document
+        itself may be passed in straight from the parser instead, in which
+        case file need not have been written. '''
         self.status = None
         self.error = None
         self.warning = None
         self.filename = file
-        raw = open(self.filename).read()
-        # minidom doesn't properly escape ampersands!
-        raw_replaced = raw.replace("&", "&amp;")
-        self.dom = xml.parseString(raw_replaced)
-        self.metadata_xml = None
+        if document is None:
+            raw = open(self.filename).read()
+        else:
+            raw = document
+        # for the manifest: what was ingested, the solr documents written
+        # for it, by path, with their sha1, and whether they were posted.
+        self.digest = digest(raw)
+        self.solrdocs = {}
+        self.posted = False
+        # the day bundles the solr documents are written to, or None to
+        # write each to a file (see solrstore.py).
+        self.bundles = None
+        # the fields every solr document made from this one shares, and the
+        # fields of each section of it, with its speaker's, as records (see
+        # records.py).
+        self.metadata = None
         self.document_bodies = []
+        # the legislator speaking in each body, or None, and for the day's
+        # ngram counts, (solr id, chamber, speaker, counts) for each solr
+        # document written.
+        self.document_speakers = []
+        self.ngram_counts = []
+        # the text of each metadata tag, and the body of the document in
+        # sections, one for each speaker or recorder, each a list of the solr
+        # fields in it, as (name, [text, ...]).
+        self.fields = {}
+        self.sections = []
+        # the bioguide id of each member of congress the parser found in
+        # mods.xml, by the speaker name they go by.
+        self.members = {}
+        # the parser doesn't escape ampersands!
+        self.read(raw.replace("&", "&amp;"))
+
+    def read(self, raw):
+        ''' walk the document once, as lxml parses it. the text of each
+        metadata tag is kept, and each top level node from the first speaker
+        or recorder on is turned into solr fields, in a new section at each
+        speaker or recorder. text outside the fields isn't indexed by solr,
+        and is dropped. a node is thrown away once it's done with. '''
+        depth = 0
+        previous = None
+        for event, element in lxml.etree.iterparse(StringIO(raw), events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            if element.tag in metadata_tags and element.tag not in self.fields:
+                self.fields[element.tag] = element.text or ''
+            elif element.tag == 'member' and depth == 1:
+                self.members[(element.text or '').lower()] = element.get('bioguide')
+            # a node's tail is only all there once the node after it is.
+            if depth == 1:
+                if previous is not None:
+                    self.add_node(previous)
+                previous = element
+            elif depth == 0 and previous is not None:
+                self.add_node(previous)
+
+    def add_node(self, node):
+        if node.tag == 'speaker' or node.tag == 'recorder':
+            self.sections.append({'speaker': None, 'fields': [], })
+        if self.sections:
+            self.add_fields(node, self.sections[-1])
+        node.getparent().remove(node)
+
+    def add_fields(self, element, section, text=None):
+        ''' add the text of an element and everything in it to a section's
+        solr fields. text is the field the element is in, if it is in one. the
+        first speaker found names the speaker of the section, and is
+        otherwise dropped. '''
+        if element.tag == 'speaker':
+            if section['speaker'] is None and element.get('name') is not None:
+                section['speaker'] = element.get('name').lower()
+            return
+        if element.tag not in valid_tags:
+            print 'replacing invalid tag %s' % element.tag
+        field = field_tags.get(element.tag)
+        if field:
+            text = []
+            section['fields'].append((field, text))
+        if text is not None:
+            text.append(element.text or '')
+        for child in element:
+            self.add_fields(child, section, text)
+            if text is not None:
+                text.append(child.tail or '')
 
     def get_text(self, uniquetag):
-        ''' only use this for unique tags that appear once in the document'''
-        re_tag_content = r'<.*?>(?P<content>.*?)</.*?>'
-        try:
-            nodexml = self.dom.getElementsByTagName(uniquetag)[0].toxml()
-        except IndexError:
+        ''' the text of one of the metadata tags. '''
+        if uniquetag not in self.fields:
             print 'get_text error. uniquetag: %s' % uniquetag
             return ''
-        tag_content = re.search(re_tag_content, nodexml, re.DOTALL)
-        if tag_content:
-            text = tag_content.group('content')
-            return text
-        else:
-            return ''
+        return self.fields[uniquetag]
 
-    def make_solr_id(self, num):
-        uid = os.path.basename(self.filename).strip('xml')+'chunk%d' % num
-        id_xml = '''<field name="id">%s</field>\n''' % uid
-        return id_xml
+    def solr_id(self, num):
+        return os.path.basename(self.filename).strip('xml')+'chunk%d' % num
 
     def set_metadata(self):
         ''' each solr document generated from this CR document will share the
-        same metadata. assemble a string containing that metadata.'''
+        same metadata. assemble a record of it.'''
 
 
         # date format: 1995-12-31T23:59:59Z
         day = self.get_text('day')
         month = self.get_text('month')
         year = self.get_text('year')
-        # keep the year around; we use it later to retrieve speaker metadata
+        # keep the year, chamber and date around; we use them later to
+        # retrieve speaker metadata
         self.year = year
+        self.chamber = self.get_text('chamber').lower()
+        self.date = '%s-%s-%s' % (year, numeric_months[month.lower()], day)
         # set the date. note the time is set to noon. this is to avoid setting
         # the time near the boundary of the day, since solr requires more
         # subtle handling of such date queries.
@@ -163,13 +210,15 @@ class SolrDoc(object):
         day)
         page_id =  re.search(r'Pg([A-Z][-0-9]+)', self.filename).groups()[0]
         # store the original file this came from so we can go back to it
-        self.metadata_xml = '''<field name="crdoc">%s</field>\n''' % self.filename
-        self.metadata_xml += '''<field name="page_id">%s</field>\n''' % page_id
-        self.metadata_xml += '''<field name="date">%s</field>\n''' % date
-        self.metadata_xml += '''<field name="year">%s</field>\n''' % year
-        self.metadata_xml += '''<field name="month">%s</field>\n''' % numeric_months[month.lower()]
-        self.metadata_xml += '''<field name="day">%s</field>\n''' % self.get_text('day')
-        self.metadata_xml += '''<field name="year_month">%s%s</field>\n''' % (year, numeric_months[month.lower()])
+        self.metadata = {
+            'crdoc': self.filename,
+            'page_id': page_id,
+            'date': date,
+            'year': year,
+            'month': numeric_months[month.lower()],
+            'day': self.get_text('day'),
+            'year_month': '%s%s' % (year, numeric_months[month.lower()]),
+        }
 
         """
         if self.dom.getElementsByTagName('document_title'):
@@ -179,40 +228,35 @@ class SolrDoc(object):
         """
         doc_title = self.get_title_from_mods_file()
 
-        self.metadata_xml += '''<field name="document_title">%s</field>\n''' % doc_title
-        slug = slugify(doc_title)[:50]
-        self.metadata_xml += '''<field name="slug">%s</field>\n''' % slug
+        self.metadata['document_title'] = doc_title
+        # slugs have always been made from the title as it is escaped in xml.
+        self.metadata['slug'] = slugify(escape(doc_title))[:50]
 
         for tag in ['volume', 'number', 'chamber', 'pages', 'congress', 'session',]:
-            tag_content = self.get_text(tag)
-            self.metadata_xml += '''<field name="%s">%s</field>\n''' % (tag, tag_content)
+            self.metadata[tag] = self.get_text(tag)
 
         # the dummy field has the same value for all documents, and provides an
         # anchor when we want to do a wildcard search on all terms in a
         # specific field.
-        #self.metadata_xml += '''<field name="dummy">dummyvalue</field>\n'''
+        #self.metadata['dummy'] = 'dummyvalue'
 
     def get_title_from_mods_file(self):
         path, filename = os.path.split(self.filename)
         granule = filename.split('.')[0]
         raw_path = path.replace('xml', 'raw')
-        mods_path = os.path.join(raw_path, 'mods.xml')
-        fh = open(mods_path, 'r')
-        xml = fh.read().replace('xmlns="http://www.loc.gov/mods/v3" ', '')
-        doc = lxml.etree.fromstring(xml)
-        try:
-            item = doc.xpath('//relatedItem[@ID="id-%s"]' % granule)[0]
-        except IndexError:
+        item = find_granule(load_index(raw_path), granule)
+        if item is None:
             print 'Item not found in xml: %s' % granule
 
-        document_title = escape(item.xpath('titleInfo/title')[0].text)
-        return document_title
+        return item['title']
 
 
     def get_metadata(self):
-        return self.metadata_xml
+        return self.metadata
 
-    def get_speaker_metadata(self, speaker):
+    def find_speaker(self, speaker):
+        ''' the legislator speaker is, as SpeakerIndex.find() gives it, or
+        None if there isn't just one. '''
         pieces = speaker.split(' of ')
         lastname = pieces[0].lower()
         if lastname.startswith('mr.') or lastname.startswith('ms.') or lastname.startswith('mrs.'):
@@ -223,229 +267,123 @@ class SolrDoc(object):
         else:
             state = None
         # get the chamber info
-        chamber = self.get_text('chamber').lower()
+        chamber = self.chamber
         if chamber == 'senate':
             position = 'senator'
         else:
             position = 'representative'
 
-        day = self.get_text('day')
-        month = self.get_text('month')
-        year = self.get_text('year')
-        date = '%s-%s-%s' % (year, numeric_months[month.lower()], day)
+        date = self.date
 
         if chamber == 'extensions':
             chamber = 'house'
 
-        #data = db_bioguide_lookup(lastname, self.get_text('congress'), position, state)
-        data = db_bioguide_lookup(lastname, self.get_text('congress'), chamber, date, state)
-
-        if not data or len(data) > 1:
-            data = fallback_bioguide_lookup(speaker, self.get_text('congress'), position)
-            if not data:
-                msg = 'No data or too many responses for %s, %s, %s, %s\n' % (lastname, self.year, position, state)
-                print msg
-                logfile = initialize_logfile()
-                logfile.write('%s: %s' % (self.filename, msg))
-                logfile.flush()
-                return None
-
-        match = data[0]
-        #for k, v in match.iteritems():
-        #    match[k] = v.encode('utf-8')
-
-        xml = ''
-        xml += '''<field name="%s">%s</field>\n''' % ('speaker_bioguide', match['bioguide'])
-        xml += '''<field name="%s">%s</field>\n''' % ('speaker_party', match['party'])
-        xml += '''<field name="%s">%s</field>\n''' % ('speaker_state', match['state'])
-        xml += '''<field name="%s">%s</field>\n''' % ('speaker_firstname', match['firstname'])
-        xml += '''<field name="%s">%s</field>\n''' % ('speaker_middlename', match.get('middlename', ''))
-        xml += '''<field name="%s">%s</field>\n''' % ('speaker_lastname', match['lastname'])
-        xml += '''<field name="%s">%s</field>\n''' % ('speaker_title', match['title'])
-        xml += '''<field name="%s">%s</field>\n''' % ('speaker_district', match['district'])
-        return xml
+        match = speaker_index().find(speaker, lastname, self.get_text('congress'), chamber, date, state,
+                                     position, self.members.get(speaker))
+        if match is None:
+            msg = 'No data or too many responses for %s, %s, %s, %s\n' % (lastname, self.year, position, state)
+            print msg
+            logfile = initialize_logfile()
+            logfile.write('%s: %s' % (self.filename, msg))
+            logfile.flush()
+            return None
+        return match
+
+    def get_speaker_metadata(self, match):
+        return {
+            'speaker_bioguide': match['bioguide'],
+            'speaker_party': match['party'],
+            'speaker_state': match['state'],
+            'speaker_firstname': match['firstname'],
+            'speaker_middlename': match.get('middlename', ''),
+            'speaker_lastname': match['lastname'],
+            'speaker_title': match['title'],
+            'speaker_district': match['district'],
+        }
 
     def build_document_bodies(self):
-        # get the top level xml nodes
-        tln = self.dom.documentElement.childNodes
-
-        # break the CR document into sections. a new section starts when the
-        # speaker changes.
-        sectionstarts = []
-        for node in tln:
-            if node.nodeName == 'speaker' or node.nodeName == 'recorder':
-                sectionstarts.append(node)
-        # add a control item onto the end of this list so we don't go off the
-        # end when iterating over it below.
-        sectionstarts.append(None)
-
-        sections = []
-        for node_i in xrange(len(sectionstarts)):
-            sections.append([])
-            node = sectionstarts[node_i]
-            while node is not None and node is not sectionstarts[node_i+1]:
-                sections[-1].append(node.toxml())
-                node = node.nextSibling
-        sections.remove([])
-
-        # now that we have our sections, replace the <speaker>, <speaking> and
-        # <quote> tags with their solr equivalents
+        ''' a record of the fields of each section of the document, with the
+        metadata of its speaker. '''
         self.document_bodies = []
-        for section in sections:
-            body = ''.join(section)
-
-            # identify the current speaker
-            # remove the speaker/recorder tags
-            # replace <speaking> tags by <field name=speaking">
-            # replace <quote> tags by <field name="quote">
-            re_speaker = r'<speaker name="(?P<current_speaker>.*?)">.*?</speaker>'
-            re_recorder = r'<recorder>'
-            re_rollcall = r'<rollcall>'
-            re_quote = r'<quote speaker=.*?>'
-            re_speaking = r'<speaking (quote="true" )?(speaker|name)=.*?>'
-            re_title = r'<title>'
-            re_endtag = r'</.*?>'
-
-            someone_speaking = re.search(re_speaker, body)
-            if someone_speaking:
-                current_speaker = someone_speaking.group('current_speaker').lower()
-            else:
-                current_speaker = 'recorder'
-            # XXX add in more info about the speaker
-            #speaker_fields = self.get_speakerinfo(current_speaker))
-
-            body = re.sub(re_speaker, '', body)
-            body = re.sub(re_recorder, '<field name="speaking">', body)
-            body = re.sub(re_rollcall, '<field name="rollcall">', body)
-            body = re.sub(re_quote, '<field name="quote">', body)
-            body = re.sub(re_speaking, '<field name="speaking">', body)
-            body = re.sub(re_title, '<field name="title">', body)
-            body = re.sub(re_endtag, '</field>', body)
-
-            speaker_line = '''<field name="speaker_raw">%s</field>\n''' % current_speaker
+        self.document_speakers = []
+        for section in self.sections:
+            current_speaker = section['speaker'] or 'recorder'
+            body = {'speaker_raw': current_speaker, }
+            for field, text in section['fields']:
+                body.setdefault(field, []).append(''.join(text))
+            match = None
             if (current_speaker != 'recorder' and not re.search('pro tempore', current_speaker)
                 and not re.search('president', current_speaker)
                 and not re.search('presiding', current_speaker)):
-                speaker_metadata = self.get_speaker_metadata(current_speaker)
-                if speaker_metadata == None:
-                    speaker_metadata = ''
-            else:
-                speaker_metadata = ''
-            speaker_line = speaker_line.encode('utf-8')
-            body = body.encode('utf-8')
-            speaker_metadata = speaker_metadata.encode('utf-8')
-            self.document_bodies.append(speaker_line + speaker_metadata + body)
-
-    def assemble_and_submit(self):
-        ''' generate a proper solr document '''
+                match = self.find_speaker(current_speaker)
+            if match is not None:
+                body.update(self.get_speaker_metadata(match))
+            self.document_speakers.append(match)
+            self.document_bodies.append(body)
+
+    def assemble_and_submit(self, updater=None):
+        ''' generate a proper solr document, and queue it to be posted with
+        updater, if there is one. updater sets the status once it has posted
+        it. '''
         # add metadata
         # replace xml with proper solr fields
-        logfile = initialize_logfile()
+        self.posted = updater is not None
+        if self.posted and self.document_bodies:
+            self.status = 'queued'
+        if self.bundles is not None:
+            self.bundles.of(self.solrdoc_path(0)).drop(self.filename)
         for idx, body in enumerate(self.document_bodies):
-            document_id_field = self.make_solr_id(idx)
-            metadata_fields = self.get_metadata()
-            ngram_fields = make_ngrams(body, self.filename)
-            bill_fields = find_bills(body)
-            solrdoc = u'<add><doc>\n'
-            solrdoc += document_id_field
-            solrdoc += metadata_fields
-            solrdoc += ngram_fields
-            solrdoc += bill_fields
-            solrdoc += unicode(body, errors='replace')
-            solrdoc += '\n</doc></add>'
-            #solrdoc = '''<add><doc>\n''' + document_id_field + metadata_fields + ngram_fields + bill_fields + body + '''\n</doc></add>'''
-            try:
-                self.save_doc(solrdoc, idx)
-            except lxml.etree.XMLSyntaxError:
-                print '    lxml.etree.XMLSyntaxError'
-                logfile.write('%s: lxml.etree.XMLSyntaxError\n' % self.filename)
-                logfile.flush()
-                continue
-            if sys.argv[-1] != '--solrdocs-only':
-                self.post(solrdoc)
-                self.commit()
+            speaking = body.get('speaking', [])
+            counts = {}
+            solrdoc = {'id': self.solr_id(idx), }
+            solrdoc.update(self.get_metadata())
+            solrdoc.update(make_ngrams(speaking, self.filename, counts))
+            solrdoc['bill'] = find_bills(speaking)
+            solrdoc.update(body)
+            self.save_doc(solrdoc, idx)
+            self.ngram_counts.append((self.solr_id(idx), self.chamber,
+                                      self.document_speakers[idx], counts))
+            if updater is not None:
+                updater.add(solrdoc, self)
         if not len(self.document_bodies):
             self.status = 'OK'
             self.warning  = 'No document body. Skipping.'
 
-    def save_doc(self, solrdoc, idx):
+    def solrdoc_path(self, idx):
         p = [SOLR_DOC_PATH, ] + os.path.split(self.filename)[0].split('/')[-3:]
-        path = os.path.join(*p)
-        if not os.path.exists(path):
-            os.makedirs(path)
-        #xml = lxml.etree.fromstring(solrdoc)
-        path = os.path.join(path, '%schunk%d.xml' % (
-            os.path.split(self.filename)[1].strip('xml'),
-            idx)
-            )
+        return os.path.join(*(p + [solrdoc_name(self.filename, idx), ]))
+
+    def save_doc(self, solrdoc, idx):
+        ''' write the solr document to its file, or to the day's bundle. it
+        is known by the same path either way. '''
+        path = self.solrdoc_path(idx)
         print path
-        with open(path, 'w') as fh:
-            #fh.write(lxml.etree.tostring(xml, pretty_print=True))
-            fh.write(solrdoc.encode('utf-8'))
-
-    def post(self, payload):
-        """ Add a document to index """
-        con = HTTPConnection('ec2-184-72-184-231.compute-1.amazonaws.com:8983')
-        con.putrequest('POST', '/solr/update/')
-        con.putheader('content-length', str(len(payload)))
-        con.putheader('content-type', 'text/xml; charset=UTF-8')
-        con.endheaders()
-        con.send(payload)
-        r = con.getresponse()
-        if str(r.status) == '200':
-            self.status = 'OK'
-            #print r.read()
+        if self.bundles is not None:
+            saved = self.bundles.of(path).add(os.path.basename(path), solrdoc)
         else:
-            self.status = 'error'
-            self.error = '%d: %s' % (r.status, r.read())
-            #print r.status
-            #print r.read()
-
-    def commit(self):
-        """ commit changes """
-        DATA = '<commit/>'
-        con = HTTPConnection('ec2-184-72-184-231.compute-1.amazonaws.com:8983')
-        con.putrequest('POST', '/solr/update/')
-        con.putheader('content-length', str(len(DATA)))
-        con.putheader('content-type', 'text/xml; charset=UTF-8')
-        con.endheaders()
-        con.send(DATA)
-        r = con.getresponse()
-        if not str(r.status) == '200':
-            print ' ==> There was an error committing to solr'
-            print r.read()
-            print r.status
-
-    def validate(self):
-        ''' checks for extraneous tags and other things which would cause solr
-        to choke. needs to be run before the document is processed.'''
-
-        def check_kids(node):
-            kids = node.childNodes
-            for kid in kids:
-                if kid.nodeName not in valid_tags:
-                    print 'replacing invalid tag %s' % kid.nodeName
-                    # get it's inner contents and replace the invalid tag with
-                    # what's inside it.
-                    parent = kid.parentNode
-                    grandkids = kid.childNodes
-                    parent.removeChild(kid)
-                    for node in grandkids:
-                        parent.appendChild(node)
-                check_kids(kid)
-
-        valid_tags = [
-            u'doc', u'add', u'#text', u'volume', u'number', u'weekday', u'month', u'day',
-            u'year', u'chamber', u'pages', u'document_title', u'speaker', u'speaking',
-            u'quote', u'recorder', 'title', 'rollcall', 'congress', 'session', 'bullet', ]
-        root = self.dom.firstChild
-        check_kids(root)
-
-    def process(self):
-        self.validate()
+            dirname = os.path.dirname(path)
+            if not os.path.exists(dirname):
+                os.makedirs(dirname)
+            saved = to_add(solrdoc)
+            with open(path, 'w') as fh:
+                fh.write(saved)
+        self.solrdocs[path] = digest(saved)
+
+    def process(self, updater=None, bundles=None):
+        self.bundles = bundles
         self.set_metadata()
         self.build_document_bodies()
-        self.assemble_and_submit()
+        self.assemble_and_submit(updater)
+
+speakers = None
+
+def speaker_index():
+    ''' the legislators the speakers are found among, read on first use and
+    kept for the rest of the run. '''
+    global speakers
+    if speakers is None:
+        speakers = SpeakerIndex.load()
+    return speakers
 
 def initialize_logfile():
     ''' returns a filelike object'''
@@ -454,33 +392,121 @@ def initialize_logfile():
     logfile = open(os.path.join(CWOD_HOME, LOG_DIR, 'ingest.log'), 'a')
     return logfile
 
-def solr_ingest_file(filename):
+def solr_ingest_file(filename, document=None, updater=None, bundles=None):
     print '***   ' + filename + '   ***'
-    s = SolrDoc(filename)
-    s.process()
+    s = SolrDoc(filename, document)
+    s.process(updater, bundles)
     print 'STATUS: ', s.status
     if s.error:
         print 'Solr Ingest error: ', s.error
     if s.warning:
         print 'Solr Ingest warning: ', s.warning
     print '\n'
-
-def solr_ingest_dir(path):
+    return s
+
+def record_ingested(solrdocs):
+    ''' note what was ingested from each document in the manifest of its
+    day, so that it isn't ingested again until its xml or the ingest
+    changes. '''
+    manifests = Manifests()
+    for solrdoc in solrdocs:
+        manifests.of(solrdoc.filename).ingested(solrdoc.filename, solrdoc.digest, INGEST_VERSION,
+                                                solrdoc.solrdocs, solrdoc.posted)
+    manifests.save()
+
+def record_counts(count_files, solrdoc):
+    ''' put the ngram counts of what was ingested from a document in the
+    counts of its day, in place of any it had, and let them go. '''
+    count_files.of(solrdoc.filename).replace(solrdoc.filename, solrdoc.ngram_counts)
+    solrdoc.ngram_counts = []
+
+def record_date_counts(totals):
+    ''' put the totals of the days ingested, {date: {n: ngrams said}}, in
+    NgramDateCount, so that they needn't be counted again afterwards. if they
+    can't be saved, for whatever reason, that is logged and get_date_counts
+    can recount them; the ingest carries on. '''
+    if not totals:
+        return
+    try:
+        import MySQLdb
+        connection = MySQLdb.Connection(*DB_PARAMS)
+        save_date_counts(connection.cursor(), totals)
+        connection.commit()
+        connection.close()
+    except Exception, e:
+        logfile = initialize_logfile()
+        logfile.write('Could not save the ngram counts of %s: %s\n' % (', '.join(sorted(totals)), e))
+        logfile.flush()
+
+def bundling():
+    ''' the day bundles to write solr documents to, if SOLR_DOC_STORAGE is
+    'bundle', else None. '''
+    if SOLR_DOC_STORAGE == 'bundle':
+        return Bundles()
+    return None
+
+def posting():
+    ''' solr documents are posted unless --solrdocs-only is given, in which
+    case they are only written out. '''
+    return sys.argv[-1] != '--solrdocs-only'
+
+def solr_ingest_documents(documents, post=None):
+    ''' ingest (filename, document) pairs, as given by the parser. document
+    may be None to read it from filename. if post is True (by default, unless
+    --solrdocs-only was given), the solr documents are posted in batches
+    with one commit at the end. the solr documents are written to files or
+    day bundles, as SOLR_DOC_STORAGE says. what was ingested is recorded in
+    the manifests, the ngrams said are counted in the day's count file (see
+    ngramcounts.py) and its totals saved in NgramDateCount, and the SolrDocs
+    are returned; a document that failed isn't recorded, so it will be tried
+    again. '''
+    if post is None:
+        post = posting()
+    updater = post and SolrUpdater() or None
     logfile = initialize_logfile()
-    for filename in os.listdir(path):
-        full_path = os.path.join(path, filename)
+    if speakers is not None:
+        speakers.reset_counts()
+    ingested = []
+    count_files = CountFiles()
+    bundles = bundling()
+    for full_path, document in documents:
         try:
-            solr_ingest_file(full_path)
+            solrdoc = solr_ingest_file(full_path, document, updater, bundles)
+            record_counts(count_files, solrdoc)
+            ingested.append(solrdoc)
         except Exception, e:
             today = datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
             logfile.write('%s: Error processing file %s\n' % (today, full_path))
             logfile.write('\t%s' % e)
             logfile.flush()
+    if updater is not None and not updater.close():
+        logfile.write('Solr turned down %d documents: %s\n' % (updater.failed, updater.error))
+        logfile.flush()
+    if speakers is not None:
+        print speakers.summary()
+    if bundles is not None:
+        bundles.close()
+    count_files.save()
+    # the manifests first, so that a failure saving the totals doesn't leave
+    # the documents to be ingested again.
+    record_ingested(ingested)
+    record_date_counts(count_files.totals)
+    return ingested
+
+def solr_ingest_files(filenames, post=None):
+    return solr_ingest_documents([(filename, None) for filename in filenames], post)
+
+def solr_ingest_dir(path, post=None):
+    return solr_ingest_files([os.path.join(path, filename) for filename in os.listdir(path)], post)
 
 if __name__ == '__main__' :
 
-    filename = sys.argv[1]
-    print filename
-    solr_ingest_file(filename)
-
-
+    # the legislators are loaded once for the run, so give the files to
+    # ingest together: as arguments, or one to a line on stdin with '-'.
+    filenames = [arg for arg in sys.argv[1:] if arg != '--solrdocs-only']
+    if filenames == ['-', ]:
+        filenames = [line.strip() for line in sys.stdin if line.strip()]
+    elif not filenames or filenames[0].startswith('-'):
+        print __doc__
+        sys.exit()
+    solr_ingest_files(filenames)
@@ -2,10 +2,9 @@
 
 ''' useful supporting functions '''
 
-from settings import API_KEY, DB_PATH, BIOGUIDE_LOOKUP_PATH, DB_PARAMS
+from settings import *
 
-from BeautifulSoup import BeautifulSoup
-import urllib2, urllib, re
+import urllib2, urllib, re, datetime, unicodedata
 
 try:
     import json
@@ -178,7 +177,6 @@ def db_bioguide_lookup(lastname, congress, chamber, date, state=None):
         query += " AND state = %s"
         args.append(abbr(state).upper())
 
-    cursor.execute(query, args)
     fields = ['bioguide', 'firstname', 'middlename', 'lastname', 'party', 
                 'title', 'state', 'district', ]
     cursor.execute(query, args)
@@ -243,6 +241,136 @@ def fallback_bioguide_lookup(name, congress, position):
                 return [dict(zip(fields, x)) for x in cursor.fetchall()]
 
 
+def normalize_name(name):
+    ''' a name as mysql compares them: lowercased, without accents and
+    stripped. '''
+    if isinstance(name, str):
+        name = name.decode('utf-8')
+    name = unicodedata.normalize('NFKD', name)
+    return u''.join([c for c in name if not unicodedata.combining(c)]).lower().strip()
+
+
+class SpeakerIndex(object):
+    ''' the legislator roles in bioguide_legislatorrole and the names listed
+    in BIOGUIDE_LOOKUP_PATH, read once and held in memory, so that the ingest
+    can find each speaker without going back to the database. roles are
+    indexed by last name, congress and chamber, and narrowed by date and
+    state as db_bioguide_lookup() does, and by bioguide id for the speakers
+    mods.xml names; the listed names are looked up as
+    fallback_bioguide_lookup() does. by_id, hits, fallbacks and misses count
+    how the speakers looked up were found. '''
+
+    fields = ['bioguide', 'firstname', 'middlename', 'lastname', 'party',
+              'title', 'state', 'district', ]
+    legislator_fields = ['bioguide', 'party', 'state', 'firstname', 'lastname', ]
+
+    def __init__(self):
+        self.roles = {}
+        self.by_bioguide = {}
+        self.names = {}
+        self.legislators = {}
+        self.reset_counts()
+
+    @classmethod
+    def load(cls, path=None):
+        import csv
+        import MySQLdb
+        path = path or BIOGUIDE_LOOKUP_PATH
+        index = cls()
+        cursor = MySQLdb.Connection(*DB_PARAMS, use_unicode=True).cursor()
+        cursor.execute("""SELECT bioguide_id, first, middle, last, party, title,
+                                 state, district, congress, chamber, begin_date, end_date
+                            FROM bioguide_legislatorrole""")
+        for row in cursor.fetchall():
+            index.add_role(dict(zip(cls.fields + ['congress', 'chamber', 'begin_date', 'end_date'], row)))
+
+        with open(path, 'r') as fh:
+            for row in csv.reader(fh, delimiter='|'):
+                index.add_name(row)
+        bioguide_ids = sorted(set(index.names.values()))
+        if bioguide_ids:
+            cursor.execute("""SELECT bioguide_id, congress, party, state, first, last
+                                FROM bioguide_legislator
+                               WHERE bioguide_id IN (%s)""" % ', '.join(['%s'] * len(bioguide_ids)),
+                           bioguide_ids)
+            for row in cursor.fetchall():
+                index.add_legislator(row[1], dict(zip(cls.legislator_fields, row[:1] + row[2:])))
+        return index
+
+    def add_role(self, role):
+        ''' role has the fields of a lookup result, and the congress, chamber
+        and begin and end dates of the role. '''
+        key = (normalize_name(role['lastname']), int(role['congress']), role['chamber'].lower())
+        self.roles.setdefault(key, []).append(role)
+        self.by_bioguide.setdefault(role['bioguide'], []).append(role)
+
+    def add_name(self, row):
+        ''' a row of BIOGUIDE_LOOKUP_PATH. the first listing of a name wins. '''
+        self.names.setdefault('|'.join(row[1:]), row[0])
+
+    def add_legislator(self, congress, legislator):
+        self.legislators.setdefault((legislator['bioguide'], int(congress)), legislator)
+
+    def reset_counts(self):
+        self.by_id = self.hits = self.fallbacks = self.misses = 0
+
+    def result(self, role):
+        return dict([(field, role[field]) for field in self.fields])
+
+    def lookup(self, lastname, congress, chamber, date, state=None):
+        ''' the roles held in congress and chamber on date (yyyy-mm-dd) by
+        anyone of that last name, and from that state if it is given. '''
+        day = datetime.date(*[int(part) for part in date.split('-')])
+        roles = [role for role in self.roles.get((normalize_name(lastname), int(congress), chamber.lower()), [])
+                    if role['begin_date'] <= day <= role['end_date']]
+        if state and abbr(state.strip().lower()):
+            state = abbr(state.strip().lower()).upper()
+            roles = [role for role in roles if role['state'] == state]
+        return [self.result(role) for role in roles]
+
+    def role_of(self, bioguide, date):
+        ''' the role held on date (yyyy-mm-dd) by the legislator with that
+        bioguide id, or None. '''
+        day = datetime.date(*[int(part) for part in date.split('-')])
+        for role in self.by_bioguide.get(bioguide, []):
+            if role['begin_date'] <= day <= role['end_date']:
+                return self.result(role)
+        return None
+
+    def fallback_lookup(self, name, congress, position):
+        ''' the legislator listed under name in BIOGUIDE_LOOKUP_PATH. '''
+        bioguide_id = self.names.get('|'.join([name, congress, position, ]))
+        if bioguide_id is None:
+            return None
+        legislator = self.legislators.get((bioguide_id, int(congress)))
+        return legislator and [dict(legislator), ] or []
+
+    def find(self, speaker, lastname, congress, chamber, date, state, position, bioguide=None):
+        ''' the one legislator the speaker can be, or None. the speaker's
+        bioguide id is used if it is known and they held a role on date.
+        otherwise they are looked for by name, and then among the names listed
+        in BIOGUIDE_LOOKUP_PATH when that gives none or several. '''
+        if bioguide:
+            role = self.role_of(bioguide, date)
+            if role is not None:
+                self.by_id += 1
+                return role
+        data = self.lookup(lastname, congress, chamber, date, state)
+        if len(data) == 1:
+            self.hits += 1
+            return data[0]
+        data = self.fallback_lookup(speaker, congress, position)
+        if data:
+            self.fallbacks += 1
+            return data[0]
+        self.misses += 1
+        return None
+
+    def summary(self):
+        return '%d speakers found, %d of them by their mods.xml id and %d by the fallback list, %d not found' % (
+            self.by_id + self.hits + self.fallbacks, self.by_id, self.fallbacks, self.misses)
+
+
 def volume_lookup(congress, session=None):
     import sqlite3
     conn = sqlite3.Connection(DB_PATH)
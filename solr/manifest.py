@@ -0,0 +1 @@
+../manifest.py
\ No newline at end of file
@@ -0,0 +1 @@
+../ngramcounts.py
\ No newline at end of file
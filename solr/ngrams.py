@@ -0,0 +1,130 @@
+''' The ngrams of what is said in a solr document, the text of its speaking
+fields, for its unigrams through pentagrams fields. Each sentence is tokenized
+once, with patterns compiled once for the run, and its ngrams of every length
+are taken in one pass of a window along its words. solr/benchmark.py times
+this against the extractor it replaced, and checks that the fields are the
+same, but for the text it read wrongly (see make_ngrams).
+'''
+
+import re
+import nltk
+
+
+# the solr field for the ngrams of each length, from one word up.
+ngram_fields = ['unigrams', 'bigrams', 'trigrams', 'quadgrams', 'pentagrams', ]
+
+re_spaces = re.compile(r' +')
+re_tag = re.compile(r'<.*?>')
+
+# Identify bills at the end of sentences.
+# Should be able to train the sentence tokenizer
+# to know that bill names aren't sentence delimiters.
+re_bill_end = re.compile(r'(?:H|S)\. ?(?:(?:J|R)\. ?)?(?:Con\. ?)?(?:Res\. ?)?$')
+re_bill_number = re.compile(r'[0-9]+\.')
+
+# Adapted From Natural Language Processing with Python. a token is the whole
+# of a match, as nltk.regexp_tokenize has it, and is matched with its flags.
+re_token = re.compile(r'''(?x)
+            (?:H|S)\.\ ?(?:(?:J|R)\.\ )?(?:Con\.\ )?(?:Res\.\ )?\d+ # Bills
+          | ([A-Z]\.)+                                              # Abbreviations (U.S.A., etc.)
+          | ([A-Z]+\&[A-Z]+)                                        # Internal ampersands (AT&T, etc.)
+          | (Mr\.|Dr\.|Mrs\.|Ms\.)                                  # Mr., Mrs., etc.
+          | \d*\.\d+                                                # Numbers with decimal points.
+          | \d\d?:\d\d                                              # Times.
+          | \$?[,\.0-9]+\d                                          # Numbers with thousands separators, (incl currency).
+          | (((a|A)|(p|P))\.(m|M)\.)                                # a.m., p.m., A.M., P.M.
+          | \w+((-|')\w+)*                                          # Words with optional internal hyphens.
+          | \$?\d+(\.\d+)?%?                                        # Currency and percentages.
+          | (?<=\b)\.{3,4}(?=\b)                                     # Ellipses surrounded by word borders
+          | [][.,;"'?():-_`]
+            ''', re.UNICODE | re.MULTILINE | re.DOTALL)
+
+# tokens kept as words: those with a letter, number or sentence punctuation,
+# and not a run of five dots or more.
+re_wordlike = re.compile(r'[a-z0-9.?!]')
+
+# nltk.tokenize.sent_tokenize() looks its tokenizer up on every call; this
+# keeps it once it's loaded.
+sentence_tokenizer = None
+
+def split_sentences(text):
+    global sentence_tokenizer
+    if sentence_tokenizer is None:
+        sentence_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+    return sentence_tokenizer.tokenize(text)
+
+def sentences(grafs):
+    ''' the sentences said in grafs, the text of the speaking fields of a
+    solr document. '''
+    for graf in grafs:
+        graf = re_spaces.sub(' ', graf.replace('\n', ' '))
+        found = split_sentences(graf)
+        joined = False
+        for n, sentence in enumerate(found):
+            if joined:
+                joined = False
+                continue
+            sentence = re_tag.sub('', sentence)
+            # Handle problem of bill numbers being split into new sentences.
+            if (re_bill_end.search(sentence) and n + 1 < len(found)
+                and re_bill_number.search(found[n + 1])):
+                sentence = ' '.join([sentence, found[n + 1]])
+                joined = True
+            yield sentence
+
+def words(sentence):
+    ''' the words of a sentence, lowercased and cleaned up. '''
+    found = []
+    for match in re_token.finditer(sentence):
+        token = match.group().lower()
+        if re_wordlike.search(token) and '.....' not in token:
+            found.append(token.rstrip('-').strip("'").replace(',', ''))
+    return found
+
+def sentence_ngrams(words, longest=len(ngram_fields)):
+    ''' the ngrams of words, in a list for each length from one to longest
+    words long, in the order they come in. '''
+    found = [[] for n in xrange(longest)]
+    count = len(words)
+    for start in xrange(count):
+        ngram = words[start]
+        found[0].append(ngram)
+        for n in xrange(1, min(longest, count - start)):
+            ngram += ' ' + words[start + n]
+            found[n].append(ngram)
+    return found
+
+def ngrams(grafs):
+    ''' (n, ngram) for the ngrams of grafs: for each sentence in turn, all
+    its unigrams, then all its bigrams, and so on. '''
+    for sentence in sentences(grafs):
+        for n, found in enumerate(sentence_ngrams(words(sentence))):
+            for ngram in found:
+                yield n + 1, ngram
+
+def make_ngrams(grafs, filename=None, counts=None):
+    ''' the ngram fields of grafs, as a dict of field name to a list of the
+    ngrams of that length, in the order they come in. fields with no ngrams
+    are left out. if counts is given, the number of times each ngram is said
+    is added to counts[n, ngram].
+
+    grafs are text, not xml, and unicode once read from the parser's xml.
+    the extractor this replaced took the escaped xml of the speaking fields
+    as utf-8 bytes, and so differs from it in two ways: a double quote, which
+    it had as &quot;, no longer gives a word 'quot', and a word with a letter
+    outside ascii is one word, where the tokenizer split it after the first
+    byte of that letter (Vel\\xc3\\xa1zquez made 'vel\\xc3' and 'zquez'). '''
+    found = [[] for field in ngram_fields]
+    for sentence in sentences(grafs):
+        for n, ngrams in enumerate(sentence_ngrams(words(sentence))):
+            found[n].extend(ngrams)
+    fields = {}
+    for n, ngrams in enumerate(found):
+        if not ngrams:
+            continue
+        fields[ngram_fields[n]] = ngrams
+        if counts is not None:
+            for ngram in ngrams:
+                key = (n + 1, ngram)
+                counts[key] = counts.get(key, 0) + 1
+    return fields
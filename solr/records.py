@@ -0,0 +1 @@
+../records.py
\ No newline at end of file
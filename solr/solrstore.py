@@ -0,0 +1 @@
+../solrstore.py
\ No newline at end of file
@@ -0,0 +1,195 @@
+#!/usr/bin/python
+
+''' Posts solr documents to solr's update handler in batches, rather than one
+request and one commit per document. Documents are gathered into <add>
+requests of up to SOLR_BATCH_DOCUMENTS documents or SOLR_BATCH_BYTES bytes
+(see settings.py), sent over a kept-alive connection (see solrclient.py), and
+committed once, when the run is over. With SOLR_COMMIT_WITHIN set, each request also asks solr to
+commit it within that many milliseconds.
+
+The ingest posts through a SolrUpdater as it goes, handing it records (see
+records.py), which are posted in SOLR_UPDATE_FORMAT: as <add> requests, or in
+solr's json update format, which is about a third the size. Run as a script, this
+posts solr documents that have already been written, in either layout (see
+solrstore.py), eg. those that manifest.py lists as unposted, or every document
+of some days, streaming each day's bundle through in one pass:
+
+./update.py path/to/solrdocs/YYYY/MM/DD/CREC-...chunk0.xml [...]
+./manifest.py unposted path/to/raw/YYYY/MM/DD | ./update.py -
+./update.py path/to/solrdocs/YYYY/MM/DD [...]
+./update.py path/to/solrdocs/YYYY/MM/DD.bundle [...]
+
+The exit status is 1 if any of them could not be posted.
+'''
+
+import os, re, sys
+from itertools import groupby
+from settings import *
+from solrclient import SolrError, solr_at, solr_for
+from records import to_xml, to_json
+from solrstore import BUNDLE_EXT, bundle_path, day_solrdocs, solrdocs
+
+
+re_add = re.compile(r'^\s*<add[^>]*>(?P<docs>.*)</add>\s*$', re.S)
+
+class SolrUpdater(object):
+    ''' gathers solr documents into batches and posts them to the update
+    handler of the solr at url. documents may be given as records, which are
+    posted in format ('xml' or 'json'), or as <add> requests or bare <doc>
+    elements. '''
+
+    def __init__(self, url=None, documents=SOLR_BATCH_DOCUMENTS,
+                 size=SOLR_BATCH_BYTES, commit_within=SOLR_COMMIT_WITHIN,
+                 format=SOLR_UPDATE_FORMAT):
+        if url:
+            self.solr = solr_at(url)
+        else:
+            self.solr = solr_for()
+        self.documents = documents
+        self.size = size
+        self.commit_within = commit_within
+        self.format = format
+        # a batch is all xml or all json.
+        self.batch_format = None
+        self.batch = []
+        self.batch_size = 0
+        self.sources = []
+        # how the run went: documents posted and not, requests made,
+        # and the last error.
+        self.posted = 0
+        self.failed = 0
+        self.requests = 0
+        self.error = None
+
+    def add(self, solrdoc, source=None):
+        ''' queue a document, posting the batch if it is full. source is told
+        how the post went: its status is set to 'OK' or 'error', and if it
+        was turned down, its error and posted attributes are set too. '''
+        if isinstance(solrdoc, dict):
+            format = self.format
+            if format == 'json':
+                solrdoc = to_json(solrdoc)
+            else:
+                solrdoc = to_xml(solrdoc)
+        else:
+            format = 'xml'
+            if isinstance(solrdoc, unicode):
+                solrdoc = solrdoc.encode('utf-8')
+            add = re_add.match(solrdoc)
+            if add:
+                solrdoc = add.group('docs')
+        if self.batch and (self.batch_size + len(solrdoc) > self.size
+                           or format != self.batch_format):
+            self.flush()
+        self.batch_format = format
+        self.batch.append(solrdoc)
+        self.batch_size += len(solrdoc)
+        if source is not None and source not in self.sources:
+            self.sources.append(source)
+        if len(self.batch) >= self.documents:
+            self.flush()
+
+    def flush(self):
+        ''' post the documents queued. returns whether solr took them. '''
+        if not self.batch:
+            return True
+        if self.batch_format == 'json':
+            # a json update names each document it adds with a key of its
+            # own, "add", over and over.
+            if self.commit_within:
+                opening = '"add":{"commitWithin":%d,"doc":' % self.commit_within
+            else:
+                opening = '"add":{"doc":'
+            payload = '{' + ','.join([opening + doc + '}' for doc in self.batch]) + '}'
+            ok = self.send(payload, 'update/json', 'application/json')
+        else:
+            if self.commit_within:
+                payload = '<add commitWithin="%d">' % self.commit_within
+            else:
+                payload = '<add>'
+            payload += ''.join(self.batch) + '</add>'
+            ok = self.send(payload)
+        if ok:
+            self.posted += len(self.batch)
+        else:
+            self.failed += len(self.batch)
+        for source in self.sources:
+            if not ok:
+                source.status = 'error'
+                source.error = self.error
+                source.posted = False
+            elif source.status != 'error':
+                source.status = 'OK'
+        self.batch = []
+        self.batch_size = 0
+        self.sources = []
+        return ok
+
+    def commit(self):
+        ok = self.send('<commit/>')
+        if not ok:
+            print ' ==> There was an error committing to solr'
+            print self.error
+        return ok
+
+    def close(self, commit=True):
+        ''' post what is left and commit once. returns whether solr took every
+        document of the run. '''
+        self.flush()
+        if commit and self.posted:
+            self.commit()
+        return not self.failed
+
+    def send(self, payload, handler='update', content_type='text/xml; charset=UTF-8'):
+        ''' post to the update handler. the client keeps the connection open
+        between requests, and opens a new one if solr has dropped it. '''
+        try:
+            self.solr.request(handler, body=payload, content_type=content_type)
+        except SolrError, e:
+            self.error = '%s' % e
+            if e.status is not None:
+                self.requests += 1
+            return False
+        self.requests += 1
+        return True
+
+
+if __name__ == '__main__':
+
+    paths = sys.argv[1:]
+    if paths == ['-', ]:
+        paths = [line.strip() for line in sys.stdin if line.strip()]
+    elif not paths or paths[0].startswith('-'):
+        print __doc__
+        sys.exit()
+
+    def day(path):
+        ''' the solrdocs/YYYY/MM/DD directory path names, if it is a day
+        rather than a document. '''
+        if path.endswith(BUNDLE_EXT):
+            return path[:-len(BUNDLE_EXT)]
+        if os.path.isdir(path) or os.path.exists(bundle_path(path)):
+            return path
+        return None
+
+    def documents(paths):
+        ''' the documents of a day are read together, whether it is named or
+        its documents are. '''
+        for is_day, group in groupby(paths, lambda path: day(path) is not None):
+            if not is_day:
+                for document in solrdocs(group):
+                    yield document
+                continue
+            for path in group:
+                for document in day_solrdocs(day(path)):
+                    yield document
+
+    updater = SolrUpdater()
+    for path, solrdoc in documents(paths):
+        updater.add(solrdoc)
+    ok = updater.close()
+    print 'posted %d documents in %d requests, %d not posted' % (
+        updater.posted, updater.requests, updater.failed)
+    if not ok:
+        print updater.error
+        sys.exit(1)
@@ -0,0 +1,253 @@
+#!/usr/bin/python
+
+''' One client for every solr the project talks to: the ingest's poster, the
+solr api module, the django api handlers and the management commands.
+Connections are kept alive and pooled by host, each call has a timeout, a call
+that can't reach solr or that solr fails with a 5xx is retried with a backoff,
+and json responses are decoded.
+
+Which solr holds a congress is set by SOLR_SERVERS; congresses not listed, and
+calls that don't name one, go to the default solr: SOLR_SERVER and SOLR_PORT
+if they are set, or else SOLR_DOMAIN (see settings.py).
+
+    from solrclient import solr_for
+    data = solr_for(111).select({'q': 'speaking:budget', 'rows': 10})
+
+Functions given to add_timing_hook() are called after every call to solr with
+its url, how many seconds it took and the http status, eg. to log slow
+queries.
+
+Usage:
+
+./solrclient.py select 'q=speaking:budget&rows=1'     query the default solr
+./solrclient.py --congress=111 select 'q=...'         the solr holding the 111th
+'''
+
+import httplib, os, socket, sys, threading, time, urllib, urlparse
+from settings import *
+try:
+    import json
+except:
+    import simplejson as json
+
+
+class SolrError(Exception):
+    ''' solr answered a call with an error, or couldn't be reached. status is
+    the http status of the answer, or None if there was none. '''
+
+    def __init__(self, message, status=None):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class ConnectionPool(object):
+    ''' idle keep-alive connections, by host. '''
+
+    def __init__(self, size=SOLR_POOL_SIZE):
+        self.size = size
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def get(self, host, timeout):
+        ''' an idle connection to host, or a new one, and whether it was
+        idle. '''
+        self.lock.acquire()
+        try:
+            if self.pid != os.getpid():
+                # connections opened before a fork belong to the parent.
+                self.idle = {}
+                self.pid = os.getpid()
+            idle = self.idle.get(host)
+            connection = idle and idle.pop() or None
+        finally:
+            self.lock.release()
+        if connection is None:
+            return httplib.HTTPConnection(host, timeout=timeout), False
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection, True
+
+    def put(self, host, connection):
+        ''' keep a connection that has been read to the end, for the next
+        call to host. '''
+        self.lock.acquire()
+        try:
+            idle = self.idle.setdefault(host, [])
+            if len(idle) < self.size and self.pid == os.getpid():
+                idle.append(connection)
+                return
+        finally:
+            self.lock.release()
+        connection.close()
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            for idle in self.idle.values():
+                for connection in idle:
+                    connection.close()
+            self.idle = {}
+        finally:
+            self.lock.release()
+
+pool = ConnectionPool()
+
+
+timing_hooks = []
+
+def add_timing_hook(hook):
+    ''' have hook(url, seconds, status) called after each call to solr. status
+    is None if solr couldn't be reached. '''
+    timing_hooks.append(hook)
+
+def remove_timing_hook(hook):
+    timing_hooks.remove(hook)
+
+
+def encode_params(params):
+    ''' params, as a dict or a list of pairs whose values may be lists, as a
+    query string. unicode is sent as utf-8. '''
+    if hasattr(params, 'items'):
+        params = params.items()
+    pairs = []
+    for name, value in params:
+        if not isinstance(value, (list, tuple)):
+            value = [value, ]
+        for v in value:
+            if isinstance(v, unicode):
+                v = v.encode('utf-8')
+            pairs.append((name, v))
+    return urllib.urlencode(pairs)
+
+
+class SolrClient(object):
+    ''' calls the request handlers of the solr at url, eg.
+    localhost:8983/solr. '''
+
+    def __init__(self, url, timeout=SOLR_TIMEOUT, retries=SOLR_RETRIES,
+                 backoff=SOLR_BACKOFF):
+        if not url:
+            raise ValueError('no solr to call: set CAPWORDS_SOLR_URL')
+        # CAPWORDS_SOLR_URL is given without a scheme, eg. localhost:8983/solr
+        if '://' not in url:
+            url = 'http://' + url
+        parts = urlparse.urlsplit(url)
+        self.host = parts.netloc
+        self.path = parts.path.rstrip('/')
+        self.url = 'http://%s%s' % (self.host, self.path)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def __repr__(self):
+        return '<SolrClient %s>' % self.url
+
+    def request(self, handler, params=None, body=None,
+                content_type='text/xml; charset=UTF-8', timeout=None):
+        ''' call handler (eg. 'select'), with params in the query string and
+        body, if there is one, posted. returns the body of solr's answer, or
+        raises SolrError. '''
+        path = '%s/%s' % (self.path, handler)
+        if params:
+            path += '?' + encode_params(params)
+        if timeout is None:
+            timeout = self.timeout
+        attempt = 0
+        while True:
+            connection, reused = pool.get(self.host, timeout)
+            started = time.time()
+            status = None
+            stale = False
+            try:
+                if body is None:
+                    connection.request('GET', path)
+                else:
+                    connection.request('POST', path, body, {'Content-Type': content_type})
+                response = connection.getresponse()
+                data = response.read()
+            except (httplib.HTTPException, socket.error), e:
+                connection.close()
+                error = SolrError('%s' % (e or e.__class__.__name__))
+                # solr may have dropped a connection left idle.
+                stale = reused and not isinstance(e, socket.timeout)
+            else:
+                status = response.status
+                if response.will_close:
+                    connection.close()
+                else:
+                    pool.put(self.host, connection)
+                error = None
+                if status >= 400:
+                    error = SolrError('%d: %s' % (status, data), status)
+            for hook in timing_hooks:
+                hook('http://%s%s' % (self.host, path), time.time() - started, status)
+
+            if error is None:
+                return data
+            if stale:
+                continue
+            if status is not None and status < 500:
+                raise error
+            attempt += 1
+            if attempt > self.retries:
+                raise error
+            time.sleep(self.backoff * 2 ** (attempt - 1))
+
+    def query(self, handler, params=None, **kwargs):
+        ''' call handler and decode its json answer. '''
+        if hasattr(params, 'items'):
+            params = params.items()
+        params = [(name, value) for name, value in params or [] if name != 'wt']
+        params.append(('wt', 'json'))
+        return json.loads(self.request(handler, params, **kwargs))
+
+    def select(self, params, **kwargs):
+        return self.query('select', params, **kwargs)
+
+    def mlt(self, params, **kwargs):
+        return self.query('mlt', params, **kwargs)
+
+    def update(self, body, **kwargs):
+        ''' post body, an xml update request, to the update handler. '''
+        return self.request('update', body=body, **kwargs)
+
+
+clients = {}
+
+def solr_at(url):
+    ''' the client for the solr at url. clients are shared, as are their
+    connections. '''
+    if url not in clients:
+        clients[url] = SolrClient(url)
+    return clients[url]
+
+def solr_for(congress=None):
+    ''' the client for the solr holding congress, or for the default solr. '''
+    server = congress is not None and SOLR_SERVERS.get(str(congress))
+    if server:
+        return solr_at('%s:%s/solr' % tuple(server))
+    if SOLR_SERVER:
+        return solr_at('%s:%s/solr' % (SOLR_SERVER, SOLR_PORT))
+    return solr_at(SOLR_DOMAIN)
+
+def congress_solrs():
+    ''' (congress, client) for each congress in SOLR_SERVERS, in order. '''
+    return [(congress, solr_for(congress)) for congress in sorted(SOLR_SERVERS)]
+
+
+if __name__ == '__main__':
+
+    congress = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--congress='):
+            congress = arg.split('=', 1)[1]
+            sys.argv.remove(arg)
+
+    try:
+        handler, query = sys.argv[1:]
+    except ValueError:
+        print __doc__
+        sys.exit()
+    print json.dumps(solr_for(congress).query(handler, urlparse.parse_qsl(query)), indent=1)
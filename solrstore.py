@@ -0,0 +1,326 @@
+#!/usr/bin/python
+
+''' Storage for the solr documents of a day.
+
+By default the ingest writes each solr document it makes to a file of its own,
+solrdocs/YYYY/MM/DD/CREC-...chunkN.xml, as an <add> request. With
+SOLR_DOC_STORAGE = 'bundle' in settings.py it instead appends them to a single
+bundle per day, solrdocs/YYYY/MM/DD.bundle. A bundle is line-delimited json,
+one record (see records.py) to a line, in solr's json format. Each line is
+compressed as a gzip member of its own, so the whole bundle is still a gzip
+file:
+
+    zcat solrdocs/YYYY/MM/DD.bundle
+
+Beside it, solrdocs/YYYY/MM/DD.bundle.index is the offset index: the name of
+each document in the bundle, where its member starts and how long it is, in
+the order they were written. A document written again is appended and the
+index pointed at the new copy; the bundle is rewritten without the old copies
+once they take up more room than the current ones.
+
+Code that reads solr documents should go through read_solrdoc(), solrdocs()
+and day_solrdocs(), which take the same solrdocs/YYYY/MM/DD/name paths in
+either layout and prefer a real file when both exist. A day's bundle is read
+in one pass, in the order it was written.
+
+Usage:
+
+./solrstore.py bundle path/to/solrdocs/YYYY/MM/DD     bundle an existing day directory
+./solrstore.py list path/to/solrdocs/YYYY/MM/DD       list the documents for a day
+./solrstore.py cat path/to/solrdocs/YYYY/MM/DD/file   print one document, as json
+'''
+
+import os, sys, zlib
+from itertools import groupby
+from settings import *
+from records import from_xml, to_json
+try:
+    import json
+except:
+    import simplejson as json
+
+
+BUNDLE_EXT = '.bundle'
+INDEX_EXT = '.index'
+
+# bump this whenever the layout of the index changes.
+BUNDLE_VERSION = 1
+
+# zlib writes and reads a gzip header and trailer with these window bits.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+def bundle_path(day_dir):
+    ''' solrdocs/2010/07/12/ -> solrdocs/2010/07/12.bundle '''
+    return os.path.normpath(day_dir) + BUNDLE_EXT
+
+def index_path(bundle):
+    return bundle + INDEX_EXT
+
+def solrdoc_name(granule, idx):
+    ''' the name of the idx'th solr document made from granule, the path of
+    its xml. '''
+    return '%schunk%d.xml' % (os.path.split(granule)[1].strip('xml'), idx)
+
+def deflate(line):
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(line) + compressor.flush()
+
+def inflate(member):
+    return zlib.decompress(member, GZIP_WBITS)
+
+def as_record(document):
+    ''' a document as solrdocs() gives it, as a record. '''
+    if isinstance(document, dict):
+        return document
+    return from_xml(document)
+
+
+class DayBundle(object):
+    ''' read access to a day's bundle, through its index. '''
+
+    def __init__(self, path):
+        self.path = path
+        # (name, offset, length) for each document, in the order written,
+        # and how much of the bundle the index covers.
+        self.entries = []
+        self.size = 0
+        if os.path.exists(index_path(path)):
+            index = json.loads(open(index_path(path)).read())
+            self.entries = [tuple(entry) for entry in index['documents']]
+            self.size = index['size']
+        self.offsets = dict([(name, (offset, length)) for name, offset, length in self.entries])
+
+    def names(self):
+        return [name for name, offset, length in self.entries]
+
+    def __contains__(self, name):
+        return name in self.offsets
+
+    def __len__(self):
+        return len(self.entries)
+
+    def read(self, name):
+        offset, length = self.offsets[name]
+        fh = open(self.path, 'rb')
+        try:
+            fh.seek(offset)
+            return json.loads(inflate(fh.read(length)))
+        finally:
+            fh.close()
+
+    def records(self, names=None):
+        ''' (name, record) for each document, or each of names, in the
+        order they were written, reading the bundle front to back. '''
+        if names is not None:
+            names = set(names)
+        fh = open(self.path, 'rb')
+        try:
+            for name, offset, length in self.entries:
+                if names is not None and name not in names:
+                    continue
+                if fh.tell() != offset:
+                    fh.seek(offset)
+                yield name, json.loads(inflate(fh.read(length)))
+        finally:
+            fh.close()
+
+
+class BundleWriter(DayBundle):
+    ''' appends documents to a day's bundle. the index is only written by
+    close(); a bundle left longer than its index, by a run that never got
+    that far, is cut back to it when it is next opened. one writer at a time
+    per day. '''
+
+    def __init__(self, path):
+        DayBundle.__init__(self, path)
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        if os.path.exists(path):
+            self.fh = open(path, 'r+b')
+            self.fh.truncate(self.size)
+            self.fh.seek(self.size)
+        else:
+            self.fh = open(path, 'wb')
+            self.size = 0
+
+    def remove(self, names):
+        names = set(names)
+        self.entries = [entry for entry in self.entries if entry[0] not in names]
+        for name in names:
+            self.offsets.pop(name, None)
+
+    def drop(self, granule):
+        ''' forget the documents made from granule. '''
+        prefix = solrdoc_name(granule, 0)[:-len('0.xml')]
+        self.remove([name for name in self.offsets
+                     if name.startswith(prefix) and name[len(prefix):-len('.xml')].isdigit()])
+
+    def add(self, name, record):
+        ''' append record as the document name, in place of any copy of it
+        already in the bundle, and return the line written. '''
+        line = to_json(record) + '\n'
+        member = deflate(line)
+        self.fh.write(member)
+        if name in self.offsets:
+            self.remove([name, ])
+        self.entries.append((name, self.size, len(member)))
+        self.offsets[name] = (self.size, len(member))
+        self.size += len(member)
+        return line
+
+    def compact(self):
+        ''' rewrite the bundle with only the current copy of each document,
+        moving the compressed members across as they are. '''
+        source = open(self.path, 'rb')
+        fh = open(self.path + '.tmp', 'wb')
+        entries = []
+        for name, offset, length in self.entries:
+            source.seek(offset)
+            entries.append((name, fh.tell(), length))
+            fh.write(source.read(length))
+        self.entries = entries
+        self.offsets = dict([(name, (offset, length)) for name, offset, length in entries])
+        self.size = fh.tell()
+        fh.close()
+        source.close()
+        os.rename(self.path + '.tmp', self.path)
+
+    def close(self):
+        self.fh.close()
+        live = sum([length for name, offset, length in self.entries])
+        if self.size - live > live:
+            self.compact()
+        path = index_path(self.path)
+        fh = open(path + '.tmp', 'w')
+        fh.write(json.dumps({'version': BUNDLE_VERSION, 'size': self.size,
+                             'documents': self.entries, }))
+        fh.close()
+        os.rename(path + '.tmp', path)
+
+
+class Bundles(dict):
+    ''' the bundle writers of the days a run touches. a run goes through its
+    documents a day at a time, so only one is open at once: it is closed when
+    another is opened. '''
+
+    def of(self, path):
+        ''' the writer of the day path (a solr document or day directory)
+        belongs to. '''
+        key = bundle_path(os.path.dirname(path))
+        if key not in self:
+            self.close()
+            self[key] = BundleWriter(key)
+        return self[key]
+
+    def close(self):
+        for writer in self.values():
+            writer.close()
+        self.clear()
+
+
+def read_solrdoc(path):
+    ''' the solr document at solrdocs/YYYY/MM/DD/name: the <add> request in
+    the file if it is there, else the record in the day's bundle. raises
+    IOError if neither has it. '''
+    if os.path.exists(path):
+        return open(path).read()
+    day_dir, name = os.path.split(path)
+    bundle = DayBundle(bundle_path(day_dir))
+    if name not in bundle:
+        raise IOError('No such solr document: %s' % path)
+    return bundle.read(name)
+
+def solrdocs(paths):
+    ''' (path, document) for each of paths, as read_solrdoc() gives them.
+    the documents of a day's bundle are read together, in one pass over it,
+    after those of the day in files. '''
+    for day_dir, day_paths in groupby(paths, os.path.dirname):
+        bundled = {}
+        for path in day_paths:
+            if os.path.exists(path):
+                yield path, open(path).read()
+            else:
+                bundled[os.path.basename(path)] = path
+        if not bundled:
+            continue
+        bundle = DayBundle(bundle_path(day_dir))
+        for name in sorted(bundled):
+            if name not in bundle:
+                raise IOError('No such solr document: %s' % bundled[name])
+        for name, record in bundle.records(bundled):
+            yield bundled[name], record
+
+def list_solrdocs(day_dir):
+    ''' the names of the solr documents for a day, in either layout. '''
+    names = set()
+    if os.path.isdir(day_dir):
+        names.update([name for name in os.listdir(day_dir) if name.endswith('.xml')])
+    bundle = bundle_path(day_dir)
+    if os.path.exists(bundle):
+        names.update(DayBundle(bundle).names())
+    return sorted(names)
+
+def day_solrdocs(day_dir):
+    ''' (path, document) for every solr document of a day, as solrdocs()
+    gives them. '''
+    files = []
+    if os.path.isdir(day_dir):
+        files = sorted([name for name in os.listdir(day_dir) if name.endswith('.xml')])
+    for name in files:
+        path = os.path.join(day_dir, name)
+        yield path, open(path).read()
+    bundle = bundle_path(day_dir)
+    if os.path.exists(bundle):
+        bundle = DayBundle(bundle)
+        files = set(files)
+        for name, record in bundle.records([name for name in bundle.names() if name not in files]):
+            yield os.path.join(day_dir, name), record
+
+def solrdoc_days(root):
+    ''' the solrdocs/YYYY/MM/DD directories of the days under root (all of
+    solrdocs/, a year, a month or a day), in either layout, in order. '''
+    root = os.path.normpath(root)
+    days = set()
+    if os.path.exists(bundle_path(root)):
+        days.add(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith('.xml'):
+                days.add(dirpath)
+            elif filename.endswith(BUNDLE_EXT):
+                days.add(os.path.join(dirpath, filename[:-len(BUNDLE_EXT)]))
+    return sorted(days)
+
+def bundle_directory(day_dir):
+    ''' bundle the solr document files of a day, adding them to any bundle
+    the day has. the directory is left in place; remove it once the bundle
+    has been checked. '''
+    writer = BundleWriter(bundle_path(day_dir))
+    for name in sorted(os.listdir(day_dir)):
+        if name.endswith('.xml'):
+            writer.add(name, from_xml(open(os.path.join(day_dir, name)).read()))
+    writer.close()
+    return len(writer)
+
+
+def usage():
+    print __doc__
+    sys.exit()
+
+if __name__ == '__main__':
+
+    if len(sys.argv) != 3:
+        usage()
+
+    command, path = sys.argv[1:]
+    if command == 'bundle':
+        count = bundle_directory(path)
+        print 'bundled %d documents from %s into %s' % (count, path, bundle_path(path))
+    elif command == 'list':
+        for name in list_solrdocs(path):
+            print name
+    elif command == 'cat':
+        print to_json(as_record(read_solrdoc(path)))
+    else:
+        usage()
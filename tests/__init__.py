@@ -0,0 +1,83 @@
+''' What the tests share.
+
+Importing the tests package points CAPWORDS_HOME, CAPWORDS_TMP and
+CAPWORDS_LOGS at a temporary directory, TMP, unless they are set already, so
+that settings.py can be imported; each test module imports it from here
+before the code it tests. TMP is removed when the run is over.
+
+serve() runs a stand-in for a web server, such as StandInSolr, on a local
+port for a test to talk to.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import atexit
+import BaseHTTPServer
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+TMP = tempfile.mkdtemp()
+for var in ['CAPWORDS_HOME', 'CAPWORDS_TMP', 'CAPWORDS_LOGS']:
+    os.environ.setdefault(var, TMP)
+atexit.register(shutil.rmtree, TMP, True)
+
+
+class StandInSolr(BaseHTTPServer.BaseHTTPRequestHandler):
+    ''' answers selects with the path asked for, as json, and takes posts.
+    each request is recorded in server.requests as (path, body, client).
+    the status of each answer is the next of server.statuses, if there are
+    any left; else 400 for an <add> if server.refuse is set; else 200. '''
+
+    # keep connections open between requests, as solr does.
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def status(self, body):
+        if self.server.statuses:
+            return self.server.statuses.pop(0)
+        if self.server.refuse and body.startswith('<add'):
+            return 400
+        return 200
+
+    def answer(self, status, body=''):
+        self.send_response(status)
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append((self.path, '', self.client_address))
+        self.answer(self.status(''), json.dumps({'path': self.path}))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['content-length']))
+        self.server.requests.append((self.path, body, self.client_address))
+        self.answer(self.status(body))
+
+
+def serve(handler, **attributes):
+    ''' an HTTPServer running handler in a thread of its own, with
+    requests, statuses and refuse set for StandInSolr, and any other
+    attributes given. its address is host:port. '''
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), handler)
+    server.requests = []
+    server.statuses = []
+    server.refuse = False
+    for name, value in attributes.items():
+        setattr(server, name, value)
+    server.address = '127.0.0.1:%d' % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def stop(server):
+    ''' stop a server from serve(). a client keeping a connection open to it
+    must let go of it first. '''
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,84 @@
+''' Tests for the checkpointing of backfill.py. The days are worked on by a
+stand-in for parse_and_ingest_days, which notes each day it is given.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import os
+import shutil
+import sys
+import unittest
+from cStringIO import StringIO
+
+from tests import TMP
+
+import backfill
+
+DAYS = ['2011/03/01', '2011/03/02', '2011/03/03']
+
+WORKED = os.path.join(TMP, 'backfill-worked')
+FAILING = os.path.join(TMP, 'backfill-failing')
+
+def stand_in(paths, processes, everything=False):
+    ''' parse_and_ingest_days, in a worker. the days listed in FAILING fail. '''
+    day = backfill.day_name(paths[0])
+    open(WORKED, 'a').write(day + '\n')
+    if os.path.exists(FAILING) and day in open(FAILING).read().split():
+        raise IOError('%s failed' % day)
+    return {'parsed': ['a', 'b'], 'flagged': [], 'failed': [], 'unchanged': 1, }
+
+
+class BackfillTests(unittest.TestCase):
+
+    def setUp(self):
+        for day in DAYS:
+            os.makedirs(os.path.join(TMP, 'raw', day))
+        self.parse_and_ingest_days = backfill.parse_and_ingest_days
+        backfill.parse_and_ingest_days = stand_in
+
+    def tearDown(self):
+        backfill.parse_and_ingest_days = self.parse_and_ingest_days
+        shutil.rmtree(os.path.join(TMP, 'raw', '2011'))
+        for path in [WORKED, FAILING, backfill.BACKFILL_STATE]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run_backfill(self, failing=(), reset=False):
+        ''' backfill DAYS, returning the days worked on and the state. '''
+        open(FAILING, 'w').write('\n'.join(failing))
+        if os.path.exists(WORKED):
+            os.remove(WORKED)
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            state = backfill.backfill(DAYS[0], DAYS[-1], processes=2, reset=reset)
+        finally:
+            sys.stdout = stdout
+        worked = os.path.exists(WORKED) and sorted(open(WORKED).read().split()) or []
+        return worked, state
+
+    def test_days_done_are_skipped_on_a_rerun(self):
+        worked, state = self.run_backfill(failing=['2011/03/02'])
+        self.assertEqual(worked, DAYS)
+        self.assertEqual(sorted(state['done']), ['2011/03/01', '2011/03/03'])
+        self.assertEqual(backfill.load_state(), state)
+        self.assertEqual(state['done']['2011/03/01']['documents'], 2)
+
+        # the day that failed is tried again, and only it.
+        worked, state = self.run_backfill()
+        self.assertEqual(worked, ['2011/03/02'])
+        self.assertEqual(sorted(backfill.load_state()['done']), DAYS)
+
+        worked, state = self.run_backfill()
+        self.assertEqual(worked, [])
+
+    def test_reset_forgets_the_days_done(self):
+        self.run_backfill()
+        self.assertEqual(sorted(backfill.load_state()['done']), DAYS)
+        worked, state = self.run_backfill(failing=DAYS, reset=True)
+        self.assertEqual(worked, DAYS)
+        self.assertEqual(backfill.load_state(), {'done': {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
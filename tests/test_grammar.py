@@ -0,0 +1,108 @@
+''' Tests for the paragraph state machine of the parser, transition by
+transition. tests/test_parser.py checks what it makes of whole documents.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import unittest
+
+import tests
+
+from parser import grammar
+from parser.grammar import START, RAISES, LineClass
+
+
+def line(**answers):
+    ''' a LineClass answering answers, and no to everything else. '''
+    fields = dict.fromkeys(LineClass._fields, False)
+    fields.update(answers)
+    return LineClass(**fields)
+
+def tags(tags):
+    return [tag for regex, tag, group, named in tags]
+
+
+class TransitionTests(unittest.TestCase):
+
+    def test_a_named_speaker_starts_speaking(self):
+        found = grammar.follow_rules(START, line(new_paragraph=True, speaker=True, ends=True))
+        self.assertEqual(found.speaker, 'line')
+        self.assertEqual((found.state.speaker, found.state.new_paragraph), ('named', True))
+        self.assertEqual(tags(found.opentags), ['<speaking quote="true" speaker="%s">', '<speaker name="%s">',
+                                                '<speaking name="%s">'])
+        self.assertEqual(tags(found.closetags), ['</speaker>', '</speaking>'])
+        self.assertEqual(found.edge, ('speaking', 'newspeaker'))
+
+        # the next line carries on the paragraph.
+        following = grammar.follow_rules(found.state, line())
+        self.assertEqual((following.speaker, following.opentags, following.closetags), ('keep', (), ()))
+        self.assertEqual(following.edge, ('newspeaker', 'speaking'))
+
+    def test_a_document_without_a_speaker_starts_with_the_recorder(self):
+        found = grammar.follow_rules(START, line(new_paragraph=True, ends=True))
+        self.assertEqual(found.speaker, 'recorder')
+        self.assertEqual(tags(found.opentags), ['<speaking quote="true" speaker="%s">', '<recorder>',
+                                                '<speaker name="%s">'])
+        self.assertEqual(tags(found.closetags), ['</speaker>', '</recorder>'])
+        # the comment ends with its paragraph, and the recorder stays on.
+        self.assertEqual((found.state.recorder, found.state.speaker, found.state.first_line),
+                         (False, 'recorder', False))
+        # after which the fuzzy recorder terms start another.
+        fuzzy = grammar.follow_rules(found.state, line(new_paragraph=True, recorder_fuzzy=True))
+        self.assertEqual((fuzzy.speaker, fuzzy.state.recorder), ('recorder', True))
+
+    def test_a_long_quote_keeps_its_speaker(self):
+        speaking = grammar.follow_rules(START, line(new_paragraph=True, speaker=True)).state
+        quote = grammar.follow_rules(speaking, line(new_paragraph=True, longquote_start=True,
+                                                    ends_in_quote=True, longquote_ends=False))
+        self.assertEqual((quote.speaker, quote.state.inlongquote, quote.state.speaker), ('keep', True, 'named'))
+        self.assertEqual(tags(quote.closetags), ['</speaker>'])
+        self.assertEqual(quote.edge, ('newspeaker', 'quote'))
+        # a second paragraph of the quote doesn't open it again.
+        again = grammar.follow_rules(quote.state, line(new_paragraph=True, longquote_start=True,
+                                                       ends_in_quote=True, longquote_ends=True))
+        self.assertEqual(again.opentags, ())
+        self.assertEqual(tags(again.closetags), ['</speaking>'])
+
+    def test_titles_and_roll_calls(self):
+        speaking = grammar.follow_rules(START, line(new_paragraph=True, speaker=True)).state
+        title = grammar.follow_rules(speaking, line(title=True, ends=True))
+        self.assertEqual(tags(title.opentags), ['<title>'])
+        self.assertEqual(tags(title.closetags), ['</title>'])
+        # a title is over by the end of its line.
+        self.assertEqual(title.state.intitle, False)
+        vote = grammar.follow_rules(speaking, line(rollcall=True, ends_in_rollcall=True))
+        self.assertEqual(tags(vote.opentags), ['<recorder>'])
+        self.assertEqual(tags(vote.closetags), ['</recorder>'])
+        self.assertEqual(vote.state.inrollcall, False)
+
+    def test_a_line_with_no_speaker_is_unrecognized(self):
+        lost = START._replace(first_line=False)
+        self.assertEqual(grammar.follow_rules(lost, line(new_paragraph=True)).error, 'unrecognized')
+        self.assertEqual(grammar.follow_rules(lost, line(title=True)).error, None)
+
+    def test_an_answer_that_raised_only_matters_if_it_is_asked(self):
+        speaking = grammar.follow_rules(START, line(new_paragraph=True, speaker=True)).state
+        self.assertEqual(grammar.compile_transition(speaking, line(title=RAISES)).error, ('raise', 'title'))
+        # in a long quote, a line isn't asked whether it is a title.
+        quoting = speaking._replace(inlongquote=True)
+        self.assertEqual(grammar.compile_transition(quoting, line(title=RAISES)).error, None)
+
+    def test_transitions_are_kept(self):
+        answers = tuple(line(new_paragraph=True, speaker=True))
+        found = grammar.transition(START, answers)
+        self.assertTrue(grammar.transition(START, answers) is found)
+        self.assertEqual(found, grammar.follow_rules(START, LineClass._make(answers)))
+
+
+class GrammarTests(unittest.TestCase):
+
+    def test_chamber_grammars(self):
+        senate = grammar.chamber_grammar('CREC-2010-07-12-pt1-PgS5744.txt')
+        self.assertTrue(senate is grammar.load_grammar('senate'))
+        self.assertTrue(('newspeaker', 'recognized') in senate)
+        self.assertEqual(grammar.chamber_grammar('mods.xml'), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
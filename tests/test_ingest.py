@@ -0,0 +1,153 @@
+''' Tests for the solr ingest of the parser's xml.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import datetime
+import os
+import re
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from cStringIO import StringIO
+
+import nltk
+
+from tests import TMP, StandInSolr, serve, stop
+
+from solr import ingest, lib, solrclient
+# the ingest imports these through its own symlinks to them.
+from solr import manifest, ngramcounts
+from parser.parser import PARSER_VERSION
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def have_punkt():
+    ''' whether the sentence tokenizer's data has been downloaded. '''
+    try:
+        nltk.data.find('tokenizers/punkt/english.pickle')
+    except LookupError:
+        return False
+    return True
+
+
+class DateCountTests(unittest.TestCase):
+
+    def setUp(self):
+        self.mysqldb = sys.modules.get('MySQLdb')
+        # as if MySQLdb weren't installed.
+        sys.modules['MySQLdb'] = None
+
+    def tearDown(self):
+        if self.mysqldb is None:
+            del sys.modules['MySQLdb']
+        else:
+            sys.modules['MySQLdb'] = self.mysqldb
+
+    def test_the_totals_are_left_to_be_recounted(self):
+        ingest.record_date_counts({'2010-07-12': {1: 12, 2: 11}, '2010-07-13': {1: 3}})
+        log = open(os.path.join(TMP, 'ingest.log')).read().splitlines()
+        self.assertTrue(log[-1].startswith('Could not save the ngram counts of 2010-07-12, 2010-07-13: '))
+
+    def test_nor_are_they_lost_for_want_of_settings(self):
+        mysqldb = types.ModuleType('MySQLdb')
+        mysqldb.Error = type('Error', (StandardError, ), {})
+        mysqldb.Connection = lambda *params: self.fail('connected')
+        sys.modules['MySQLdb'] = mysqldb
+        params = ingest.__dict__.pop('DB_PARAMS', None)
+        try:
+            ingest.record_date_counts({'2010-07-12': {1: 12}})
+        finally:
+            if params is not None:
+                ingest.DB_PARAMS = params
+        log = open(os.path.join(TMP, 'ingest.log')).read().splitlines()
+        self.assertEqual(log[-1], "Could not save the ngram counts of 2010-07-12: "
+                                  "global name 'DB_PARAMS' is not defined")
+
+
+@unittest.skipUnless(have_punkt(), 'needs the nltk punkt data')
+class IngestDayTests(unittest.TestCase):
+
+    def setUp(self):
+        home = tempfile.mkdtemp(dir=TMP)
+        for kind in ['raw', 'xml']:
+            shutil.copytree(os.path.join(FIXTURES, kind), os.path.join(home, kind))
+        self.day = os.path.join(home, 'xml', '2010', '07', '12')
+        self.files = sorted([os.path.join(self.day, name) for name in os.listdir(self.day)])
+        self.saved = (manifest.MANIFEST_DIR, ngramcounts.NGRAM_COUNT_DIR, ingest.SOLR_DOC_PATH,
+                      ingest.speakers, solrclient.SOLR_SERVER, solrclient.SOLR_DOMAIN)
+        manifest.MANIFEST_DIR = os.path.join(home, 'manifests')
+        ngramcounts.NGRAM_COUNT_DIR = os.path.join(home, 'ngramcounts')
+        ingest.SOLR_DOC_PATH = os.path.join(home, 'solrdocs')
+        ingest.speakers = lib.SpeakerIndex()
+        for bioguide, lastname, state in [('R000146', 'Reid', 'NV'), ('D000563', 'Durbin', 'IL')]:
+            ingest.speakers.add_role({'bioguide': bioguide, 'firstname': '', 'middlename': '',
+                                      'lastname': lastname, 'party': 'D', 'title': 'Sen', 'state': state,
+                                      'district': None, 'congress': 111, 'chamber': 'Senate',
+                                      'begin_date': datetime.date(2009, 1, 6),
+                                      'end_date': datetime.date(2011, 1, 3), })
+        self.server = serve(StandInSolr)
+        solrclient.SOLR_SERVER = None
+        solrclient.SOLR_DOMAIN = self.server.address + '/solr'
+        # as the parser leaves them.
+        manifests = manifest.Manifests()
+        for path in self.files:
+            raw = os.path.join(home, 'raw', '2010', '07', '12', os.path.basename(path)[:-len('.xml')] + '.txt')
+            manifests.of(path).parsed(path, manifest.file_digest(raw), PARSER_VERSION, 'parsed',
+                                      manifest.file_digest(path))
+        manifests.save()
+
+    def tearDown(self):
+        solrclient.pool.clear()
+        stop(self.server)
+        (manifest.MANIFEST_DIR, ngramcounts.NGRAM_COUNT_DIR, ingest.SOLR_DOC_PATH,
+         ingest.speakers, solrclient.SOLR_SERVER, solrclient.SOLR_DOMAIN) = self.saved
+
+    def ingest(self):
+        ''' ingest the day, returning the ids of the solr documents posted
+        and the day's manifest. '''
+        self.server.requests = []
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            ingest.solr_ingest_files(self.files, post=True)
+        finally:
+            sys.stdout = stdout
+        posted = []
+        for path, body, client in self.server.requests:
+            if body.startswith('<add') and not self.server.refuse:
+                posted.extend(re.findall(r'<field name="id">([^<]+)</field>', body))
+        return posted, manifest.DayManifest(self.day)
+
+    def solrdoc_ids(self, paths):
+        return sorted([os.path.basename(path)[:-len('.xml')] for path in paths])
+
+    def test_a_day_is_recorded_as_ingested_and_posted(self):
+        # solr turns the documents down, so they are all left to post.
+        self.server.refuse = True
+        posted, day = self.ingest()
+        self.assertEqual(posted, [])
+        for path in self.files:
+            self.assertFalse(day.needs_ingest(path, ingest.INGEST_VERSION))
+        written = []
+        for path in self.files:
+            written.extend(day.entry(path)['solrdocs'])
+        self.assertTrue(written)
+        self.assertEqual(day.unposted(), sorted(written))
+        self.assertEqual(day.pending(ingest.INGEST_VERSION), [])
+
+        # then takes them.
+        self.server.refuse = False
+        posted, day = self.ingest()
+        self.assertEqual(sorted(posted), self.solrdoc_ids(written))
+        self.assertEqual(day.unposted(), [])
+        self.assertEqual([body for path, body, client in self.server.requests][-1], '<commit/>')
+        # Mr. REID's two speeches and Mr. DURBIN's three are found by their
+        # mods.xml ids.
+        self.assertEqual(ingest.speakers.by_id, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
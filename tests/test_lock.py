@@ -0,0 +1,34 @@
+''' Tests for the update lock that poll_update.py, daily_update.sh and
+backfill.py take before writing.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import os
+import subprocess
+import unittest
+
+from tests import TMP
+
+import updatelock
+
+LOCK = os.path.join(TMP, 'test.lock')
+
+
+class LockTests(unittest.TestCase):
+
+    def test_only_one_holds_the_lock(self):
+        held = updatelock.take_lock(LOCK)
+        self.assertTrue(held is not None)
+        self.assertEqual(updatelock.take_lock(LOCK), None)
+        # nor can the shell scripts take it.
+        self.assertEqual(subprocess.call(['flock', '-n', LOCK, 'true']), 1)
+        held.close()
+        again = updatelock.take_lock(LOCK)
+        self.assertTrue(again is not None)
+        again.close()
+        self.assertEqual(subprocess.call(['flock', '-n', LOCK, 'true']), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
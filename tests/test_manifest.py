@@ -0,0 +1,115 @@
+''' Tests for the day manifests, and for the parser leaving alone the granules
+they say haven't changed.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+from tests import TMP
+
+import manifest
+from parser import parser
+# the parser imports the manifest through its own symlink to it.
+from parser import manifest as parser_manifest
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def fresh_manifests():
+    ''' keep each test's manifests apart. '''
+    manifest.MANIFEST_DIR = parser_manifest.MANIFEST_DIR = tempfile.mkdtemp(dir=TMP)
+
+
+class DayManifestTests(unittest.TestCase):
+
+    def setUp(self):
+        fresh_manifests()
+        self.day = os.path.join(tempfile.mkdtemp(dir=TMP), 'raw', '2010', '07', '12')
+        self.granule = os.path.join(self.day, 'CREC-2010-07-12-pt1-PgS5744.txt')
+
+    def parsed(self, raw='raw', xml='xml', version=1):
+        day = manifest.DayManifest(self.day)
+        day.parsed(self.granule, raw, version, 'parsed', xml)
+        day.save()
+
+    def test_days_are_found_from_any_of_their_directories(self):
+        xml = self.granule.replace('raw', 'xml').replace('.txt', '.xml')
+        self.assertEqual(manifest.manifest_path(xml), manifest.manifest_path(self.day))
+        self.assertEqual(manifest.granule_name(xml), os.path.basename(self.granule))
+
+    def test_unchanged_granules_need_no_parse(self):
+        self.parsed()
+        day = manifest.DayManifest(self.day)
+        self.assertFalse(day.needs_parse(self.granule, 'raw', 1))
+        self.assertTrue(day.needs_parse(self.granule, 'changed', 1))
+        self.assertTrue(day.needs_parse(self.granule, 'raw', 2))
+        self.assertTrue(day.needs_parse(self.granule.replace('5744', '5745'), 'raw', 1))
+
+    def test_missing_xml_needs_a_parse(self):
+        self.parsed(xml=manifest.digest('<CRDoc></CRDoc>'))
+        xml = os.path.join(TMP, 'CREC-2010-07-12-pt1-PgS5744.xml')
+        day = manifest.DayManifest(self.day)
+        self.assertTrue(day.needs_parse(self.granule, 'raw', 1, xml))
+        open(xml, 'w').write('<CRDoc></CRDoc>')
+        self.assertFalse(day.needs_parse(self.granule, 'raw', 1, xml))
+
+    def test_ingest_follows_the_xml_and_version(self):
+        self.parsed()
+        day = manifest.DayManifest(self.day)
+        self.assertTrue(day.needs_ingest(self.granule, 1))
+        day.ingested(self.granule, 'xml', 1, {'chunk0.xml': 'sha1'}, False)
+        self.assertFalse(day.needs_ingest(self.granule, 1))
+        self.assertTrue(day.needs_ingest(self.granule, 2))
+        day.parsed(self.granule, 'changed', 1, 'parsed', 'new xml')
+        self.assertTrue(day.needs_ingest(self.granule, 1))
+        day.parsed(self.granule, 'flagged', 1, 'flagged')
+        self.assertFalse(day.needs_ingest(self.granule, 1))
+
+    def test_posting(self):
+        self.parsed()
+        day = manifest.DayManifest(self.day)
+        day.ingested(self.granule, 'xml', 1, {'chunk1.xml': 'a', 'chunk0.xml': 'b'}, False)
+        day.save()
+        day = manifest.DayManifest(self.day)
+        self.assertEqual(day.unposted(), ['chunk0.xml', 'chunk1.xml'])
+        day.mark_posted()
+        self.assertEqual(day.unposted(), [])
+
+
+class ParseDaysTests(unittest.TestCase):
+
+    def setUp(self):
+        fresh_manifests()
+        self.home = tempfile.mkdtemp(dir=TMP)
+        self.day = os.path.join(self.home, 'raw', '2010', '07', '12')
+        shutil.copytree(os.path.join(FIXTURES, 'raw', '2010', '07', '12'), self.day)
+
+    def parse_days(self, everything=False):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            return parser.parse_days([self.day], 1, everything)
+        finally:
+            sys.stdout = stdout
+
+    def test_unchanged_granules_are_skipped(self):
+        first = self.parse_days()
+        self.assertEqual(first['unchanged'], 0)
+        self.assertEqual(self.parse_days()['unchanged'], len(first['parsed']))
+
+        granule = os.path.join(self.day, 'CREC-2010-07-12-pt1-PgS5744.txt')
+        open(granule, 'a').write('\n')
+        os.remove(parser.xml_path(os.path.join(self.day, 'CREC-2010-07-12-pt1-PgE1301.txt')))
+        again = self.parse_days()
+        self.assertEqual(sorted([os.path.basename(result['file']) for result in again['parsed']]),
+                         ['CREC-2010-07-12-pt1-PgE1301.txt', 'CREC-2010-07-12-pt1-PgS5744.txt'])
+        self.assertEqual(len(self.parse_days(everything=True)['parsed']), len(first['parsed']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+''' Tests for the day files of ngram counts the ingest writes.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import os
+import tempfile
+import unittest
+import zipfile
+
+from tests import TMP
+
+import ngramcounts
+
+
+class DayCountsTests(unittest.TestCase):
+
+    def setUp(self):
+        ngramcounts.NGRAM_COUNT_DIR = tempfile.mkdtemp(dir=TMP)
+        self.day = os.path.join(TMP, 'xml', '2010', '07', '12')
+        self.granule = os.path.join(self.day, 'CREC-2010-07-12-pt1-PgS5744.xml')
+        self.other = os.path.join(self.day, 'CREC-2010-07-12-pt1-PgS5745.xml')
+        self.speaker = {'bioguide': 'S000148', 'state': 'NY', 'party': 'D', 'lastname': 'Schumer', }
+
+    def write(self):
+        day = ngramcounts.DayCounts(self.day)
+        day.replace(self.granule, [
+            ('CREC-2010-07-12-pt1-PgS5744.chunk0', 'senate', self.speaker,
+             {(1, 'budget'): 2, (1, 'the'): 3, (2, 'the budget'): 2, }),
+            ('CREC-2010-07-12-pt1-PgS5744.chunk1', 'senate', None, {(1, 'the'): 1, (1, 'at&t'): 1, }), ])
+        day.replace(self.other, [
+            ('CREC-2010-07-12-pt1-PgS5745.chunk0', 'senate', None, {(1, u'caf\xe9'): 1, }), ])
+        day.save()
+        return ngramcounts.DayCounts(self.granule)
+
+    def test_counts_are_kept_by_day(self):
+        day = self.write()
+        self.assertEqual(day.path, os.path.join(ngramcounts.NGRAM_COUNT_DIR, '2010', '07', '12.counts'))
+        self.assertEqual(len(day), 6)
+        self.assertEqual(day.totals(), {1: 8, 2: 2})
+        self.assertEqual(day.said(1), {'budget': 2, 'the': 4, 'at&t': 1, 'caf\xc3\xa9': 1})
+        self.assertEqual(day.said(by='bioguide')[('S000148', 'the budget')], 2)
+        self.assertEqual(day.said(by='bioguide')[('', 'the')], 1)
+        self.assertEqual(day.chunks['granule'], ['CREC-2010-07-12-pt1-PgS5744.txt'] * 2 +
+                                                ['CREC-2010-07-12-pt1-PgS5745.txt'])
+        self.assertEqual(day.column('state')[:4], ['NY', 'NY', 'NY', ''])
+
+    def test_columns_are_little_endian_arrays(self):
+        self.write()
+        pack = zipfile.ZipFile(ngramcounts.counts_path(self.day))
+        self.assertEqual(len(pack.read('count.u4')), 6 * 4)
+        self.assertEqual(pack.read('n.u1'), '\x01\x01\x02\x01\x01\x01')
+        self.assertEqual(pack.read('count.u4')[:8], '\x02\x00\x00\x00\x03\x00\x00\x00')
+
+    def test_a_granule_ingested_again_replaces_its_rows(self):
+        day = self.write()
+        day.replace(self.granule, [
+            ('CREC-2010-07-12-pt1-PgS5744.chunk0', 'senate', None, {(1, 'the'): 5, }), ])
+        day.save()
+        day = ngramcounts.DayCounts(self.day)
+        self.assertEqual(day.said(), {'the': 5, 'caf\xc3\xa9': 1})
+        self.assertEqual(sorted(day.vocabulary), ['caf\xc3\xa9', 'the'])
+        self.assertEqual(day.chunks['id'], ['CREC-2010-07-12-pt1-PgS5745.chunk0',
+                                            'CREC-2010-07-12-pt1-PgS5744.chunk0'])
+
+    def test_totals_are_kept_for_the_days_saved(self):
+        self.assertEqual(ngramcounts.day_totals(self.day), None)
+        files = ngramcounts.CountFiles()
+        files.of(self.granule).replace(self.granule, [
+            ('CREC-2010-07-12-pt1-PgS5744.chunk0', 'senate', None, {(1, 'the'): 3, (2, 'the budget'): 1, }), ])
+        files.of(os.path.join(TMP, 'xml', '2010', '07', '13'))
+        self.assertEqual(files.totals, {'2010-07-12': {1: 3, 2: 1}})
+        self.assertEqual(ngramcounts.day_totals(self.day), {1: 3, 2: 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+''' Tests for the ngram extractor's tokenizer and window. solr/benchmark.py
+checks the whole extractor against the one it replaced.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import re
+import unittest
+
+from solr import ngrams
+
+
+class StandInTokenizer(object):
+    ''' splits sentences at their stops, so the punkt data isn't needed. '''
+
+    def tokenize(self, text):
+        return [sentence for sentence in re.split(r'(?<=[.?!])\s+', text) if sentence]
+
+
+class NgramTests(unittest.TestCase):
+
+    def test_words(self):
+        self.assertEqual(ngrams.words("Mr. SMITH said H. Res. 1440 passed at 10:30 a.m., "
+                                      "on the U.S.A.'s AT&T line -- costing $1,000.50."),
+                         ['mr.', 'smith', 'said', 'h. res. 1440', 'passed', 'at', '10:30',
+                          'a.m.', 'on', 'the', 'u.s.a.', 's', 'at&t', 'line', 'costing',
+                          '$1000.50', '.'])
+
+    def test_window(self):
+        self.assertEqual(ngrams.sentence_ngrams(['a', 'b', 'c', 'd', 'e', 'f']),
+                         [['a', 'b', 'c', 'd', 'e', 'f'],
+                          ['a b', 'b c', 'c d', 'd e', 'e f'],
+                          ['a b c', 'b c d', 'c d e', 'd e f'],
+                          ['a b c d', 'b c d e', 'c d e f'],
+                          ['a b c d e', 'b c d e f']])
+        self.assertEqual(ngrams.sentence_ngrams(['a', 'b']), [['a', 'b'], ['a b'], [], [], []])
+
+
+class ChangedTextTests(unittest.TestCase):
+    ''' the text that make_ngrams reads differently from the extractor it
+    replaced. '''
+
+    def setUp(self):
+        self.sentence_tokenizer = ngrams.sentence_tokenizer
+        ngrams.sentence_tokenizer = StandInTokenizer()
+
+    def tearDown(self):
+        ngrams.sentence_tokenizer = self.sentence_tokenizer
+
+    def test_a_quote_is_not_a_word(self):
+        # the old extractor made 'quot' of the &quot; it was given.
+        fields = ngrams.make_ngrams([u'He said "no" to it.'])
+        self.assertEqual(fields['unigrams'], [u'he', u'said', u'no', u'to', u'it', u'.'])
+        self.assertEqual(fields['bigrams'][1:3], [u'said no', u'no to'])
+
+    def test_an_accented_word_is_one_word(self):
+        # the old extractor made 'vel\xc3' and 'zquez' of its utf-8.
+        fields = ngrams.make_ngrams([u'I yield to VEL\xc1ZQUEZ now.'])
+        self.assertEqual(fields['unigrams'], [u'i', u'yield', u'to', u'vel\xe1zquez', u'now', u'.'])
+        self.assertEqual(fields['bigrams'][2:4], [u'to vel\xe1zquez', u'vel\xe1zquez now'])
+
+
+if __name__ == '__main__':
+    unittest.main()
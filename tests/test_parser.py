@@ -0,0 +1,126 @@
+''' Tests for the parser: its tag balancing, and its output for the granules
+under fixtures/raw, which must match the golden xml under fixtures/xml. if the
+output is meant to change, rewrite the golden xml with parser/benchmark.py
+--update and check the diff.
+
+the granules of 2010/07/12 and their mods.xml are written by hand, in GPO's
+layout, not downloaded. to put real ones in their place, fetch the day with
+scraper/scraper.py backto 12/07/2010, copy a few House, Senate and Extensions
+granules and the day's mods.xml into fixtures/raw/2010/07/12, and make the
+golden xml with parser/parser.py as of e3c480e, before it was reworked, so
+that the golden xml holds the reworked parser to the old one's output. only
+the <member> lines of each document's header, with the bioguide ids from
+mods.xml, are newer; add them with benchmark.py --update and check that they
+are all the diff shows. the golden xml checked in was made that way.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import os
+import sys
+import unittest
+from cStringIO import StringIO
+
+import tests
+
+from parser import parser
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def balanced(lines):
+    ''' the document made of lines once its tags have been balanced, and the
+    tags that were removed. '''
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        xml = parser.MarkupLines(lines)
+        orphans = xml.balance()
+    finally:
+        sys.stdout = stdout
+    return ''.join(xml), [orphan[0] for orphan in orphans]
+
+
+class BalanceTests(unittest.TestCase):
+
+    def test_matched_tags_are_kept(self):
+        lines = ['<CRDoc>', '<speaking name="Mr. REID">Mr. President, \n',
+                 'I suggest the absence of a quorum.</speaking>\n', '</CRDoc>']
+        self.assertEqual(balanced(lines), (''.join(lines), []))
+
+    def test_orphans_are_removed(self):
+        lines = ['<CRDoc>', '<recorder>The clerk read as follows:</speaking>\n',
+                 '<title>A TITLE</title>\n', '</CRDoc>']
+        document, orphans = balanced(lines)
+        self.assertEqual(document, '<CRDoc>The clerk read as follows:\n'
+                                   '<title>A TITLE</title>\n</CRDoc>')
+        self.assertEqual(orphans, ['</speaking>', '<recorder>'])
+
+    def test_several_orphans_on_a_line(self):
+        lines = ['<CRDoc>', '<speaking name="x">a</recorder>b</title>\n', '</CRDoc>']
+        self.assertEqual(balanced(lines)[0], '<CRDoc>ab\n</CRDoc>')
+
+    def test_crdoc_tags_are_kept(self):
+        self.assertEqual(balanced(['<CRDoc>', 'text\n'])[0], '<CRDoc>text\n')
+
+    def test_validate_finds_nothing_left(self):
+        document = parser.CRParser.__new__(parser.CRParser)
+        document.xml = parser.MarkupLines(['<CRDoc>', '<recorder>x</speaking>\n', '</CRDoc>'])
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            document.balance()
+            balanced_document = ''.join(document.xml)
+            document.validate()
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(''.join(document.xml), balanced_document)
+
+
+class MemberTests(unittest.TestCase):
+
+    def test_member_ids(self):
+        document = parser.CRParser.__new__(parser.CRParser)
+        document.members = [{'name': 'Mr. REID', 'bioGuideId': 'R000146'},
+                            {'name': 'Mr. JOHNSON', 'bioGuideId': 'J000288'},
+                            {'name': 'Mr. DURBIN', 'bioGuideId': 'D000563'},
+                            {'name': 'Mr. REID', 'bioGuideId': 'R000146'},
+                            {'name': 'Mr. JOHNSON', 'bioGuideId': 'J000174'},
+                            {'name': 'Mr. KYL', 'bioGuideId': None},
+                            {'name': None, 'bioGuideId': 'K000352'}, ]
+        # a name given to two ids can't say which is speaking, so is left out.
+        self.assertEqual(document.member_ids(), [('Mr. REID', 'R000146'), ('Mr. DURBIN', 'D000563')])
+
+
+class GoldenTests(unittest.TestCase):
+
+    def granules(self):
+        granules = []
+        for dirpath, dirnames, filenames in os.walk(os.path.join(FIXTURES, 'raw')):
+            granules.extend([os.path.join(dirpath, name) for name in filenames
+                             if parser.should_parse(name)])
+        return sorted(granules)
+
+    def parsed(self, granule):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            document = parser.CRParser(granule)
+            document.parse()
+            document.balance()
+        finally:
+            sys.stdout = stdout
+        self.assertFalse(document.error_flag)
+        return document.document()
+
+    def test_corpus(self):
+        granules = self.granules()
+        self.assertTrue(granules)
+        for granule in granules:
+            golden = granule.replace(os.path.join(FIXTURES, 'raw'), os.path.join(FIXTURES, 'xml'))
+            golden = open(golden.replace('.txt', '.xml')).read()
+            self.assertEqual(self.parsed(granule), golden,
+                             '%s differs from the golden xml' % os.path.basename(granule))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+''' Tests for the storage of raw documents, in day directories or packs.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import os
+import tempfile
+import threading
+import unittest
+import zipfile
+
+from tests import TMP
+
+import rawstore
+
+
+class RawStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.day = os.path.join(tempfile.mkdtemp(dir=TMP), 'raw', '2010', '07', '12')
+        self.storage = rawstore.RAW_STORAGE
+        self.docs = {'CREC-2010-07-12-pt1-PgS5744.txt': 'Mr. REID. Mr. President,',
+                     'mods.xml': '<mods></mods>\n', }
+
+    def tearDown(self):
+        rawstore.RAW_STORAGE = self.storage
+        rawstore.forget(rawstore.pack_path(self.day))
+
+    def path(self, name):
+        return os.path.join(self.day, name)
+
+    def test_a_pack_round_trip(self):
+        rawstore.RAW_STORAGE = 'pack'
+        rawstore.write_raw(self.day, self.docs)
+        self.assertFalse(os.path.exists(self.day))
+        self.assertTrue(rawstore.raw_exists(self.day))
+        self.assertEqual(sorted(zipfile.ZipFile(rawstore.pack_path(self.day)).namelist()), sorted(self.docs))
+        self.assertEqual(rawstore.list_raw(self.day), sorted(self.docs))
+        for name, data in self.docs.items():
+            self.assertEqual(rawstore.read_raw(self.path(name)), data)
+        self.assertRaises(IOError, rawstore.read_raw, self.path('CREC-2010-07-12-pt1-PgS1.txt'))
+        self.assertEqual(rawstore.raw_mtime(self.path('mods.xml')),
+                         os.path.getmtime(rawstore.pack_path(self.day)))
+
+    def test_replacing_documents_in_a_pack(self):
+        rawstore.RAW_STORAGE = 'pack'
+        rawstore.write_raw(self.day, self.docs)
+        self.assertEqual(rawstore.read_raw(self.path('mods.xml')), '<mods></mods>\n')
+        rawstore.write_raw(self.day, {'mods.xml': '<mods>new</mods>\n',
+                                      'CREC-2010-07-12-pt1-PgS5745.txt': 'Mr. McCONNELL.', })
+        self.assertEqual(rawstore.list_raw(self.day), ['CREC-2010-07-12-pt1-PgS5744.txt',
+                                                       'CREC-2010-07-12-pt1-PgS5745.txt', 'mods.xml'])
+        self.assertEqual(rawstore.read_raw(self.path('mods.xml')), '<mods>new</mods>\n')
+        self.assertEqual(rawstore.read_raw(self.path('CREC-2010-07-12-pt1-PgS5744.txt')),
+                         'Mr. REID. Mr. President,')
+        self.assertFalse(os.path.exists(rawstore.pack_path(self.day) + '.tmp'))
+
+    def test_a_directory_is_read_first(self):
+        rawstore.RAW_STORAGE = 'directory'
+        rawstore.write_raw(self.day, self.docs)
+        self.assertEqual(sorted(os.listdir(self.day)), sorted(self.docs))
+        self.assertFalse(os.path.exists(rawstore.pack_path(self.day)))
+
+        rawstore.pack_directory(self.day)
+        self.assertEqual(sorted(rawstore.DayPack(rawstore.pack_path(self.day)).names()), sorted(self.docs))
+        # with both, a file in the directory is read in place of the pack's.
+        open(self.path('mods.xml'), 'w').write('<mods>edited</mods>\n')
+        self.assertEqual(rawstore.read_raw(self.path('mods.xml')), '<mods>edited</mods>\n')
+        os.remove(self.path('mods.xml'))
+        self.assertEqual(rawstore.read_raw(self.path('mods.xml')), '<mods></mods>\n')
+        # a day with a directory keeps writing to it, whatever RAW_STORAGE says.
+        rawstore.RAW_STORAGE = 'pack'
+        rawstore.write_raw(self.day, {'mods.xml': '<mods>again</mods>\n'})
+        self.assertEqual(open(self.path('mods.xml')).read(), '<mods>again</mods>\n')
+
+    def test_threads_keep_packs_of_their_own(self):
+        rawstore.RAW_STORAGE = 'pack'
+        rawstore.write_raw(self.day, self.docs)
+        mine = rawstore.open_pack(rawstore.pack_path(self.day))
+        read = []
+        def rewrite():
+            rawstore.write_raw(self.day, {'mods.xml': '<mods>from a thread</mods>\n'})
+            read.append(rawstore.read_raw(self.path('mods.xml')))
+        thread = threading.Thread(target=rewrite)
+        thread.start()
+        thread.join()
+        self.assertEqual(read, ['<mods>from a thread</mods>\n'])
+        # the pack this thread had open is still usable, and it sees the new
+        # one once it asks again.
+        self.assertEqual(mine.read('mods.xml'), '<mods></mods>\n')
+        self.assertEqual(rawstore.read_raw(self.path('mods.xml')), '<mods>from a thread</mods>\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+''' Tests for the writers of solr document records.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import json
+import unittest
+
+import tests
+
+from solr import records
+
+
+class RecordTests(unittest.TestCase):
+
+    record = {
+        'speaking': [u'Caf\xe9 "AT&T" <b>', 'I yield back.'],
+        'unigrams': ['at&t', 'i'],
+        'id': 'CREC-2010-07-12-pt1-PgS5744.chunk0',
+        'speaker_district': None,
+        'volume': 156,
+    }
+
+    def test_xml(self):
+        self.assertEqual(records.to_add(self.record),
+                         '<add><doc>\n'
+                         '<field name="id">CREC-2010-07-12-pt1-PgS5744.chunk0</field>\n'
+                         '<field name="volume">156</field>\n'
+                         '<field name="unigrams">at&amp;t</field>\n'
+                         '<field name="unigrams">i</field>\n'
+                         '<field name="speaking">Caf\xc3\xa9 &quot;AT&amp;T&quot; &lt;b&gt;</field>\n'
+                         '<field name="speaking">I yield back.</field>\n'
+                         '</doc></add>')
+
+    def test_json(self):
+        record = json.loads(records.to_json(self.record))
+        self.assertEqual(record['speaking'], [u'Caf\xe9 "AT&T" <b>', u'I yield back.'])
+        self.assertEqual(record['id'], ['CREC-2010-07-12-pt1-PgS5744.chunk0'])
+        self.assertFalse('speaker_district' in record)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,369 @@
+''' Tests for the scraper, run against a local stand-in for the GPO server.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import BaseHTTPServer
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import urllib2
+import zipfile
+from cStringIO import StringIO
+
+from tests import serve, stop
+
+from scraper import ledger, scraper
+
+
+GRANULE = '''
+[Congressional Record Volume 156, Number 101 (Monday, July 12, 2010)]
+[Senate]
+[Page S5744]
+From the Congressional Record Online through the Government Printing Office [www.gpo.gov]
+
+  Mr. REID. Mr. President, I suggest the absence of a quorum.
+'''
+
+def make_crec_zip(granules=3, padding=0, day='2010-07-12'):
+    ''' build an in-memory CREC zip laid out the way GPO packages them. '''
+    buf = StringIO()
+    zf = zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED)
+    for i in xrange(granules):
+        name = 'CREC-%s/html/CREC-%s-pt1-PgS57%02d.htm' % (day, day, i)
+        body = GRANULE + ('x' * padding)
+        zf.writestr(name, '<html>\n<head>\n<title>%s</title>\n</head>\n'
+                          '<body><pre>%s</pre></body>\n</html>\n' % (name, body))
+    if day == '2010-07-12':
+        zf.writestr('CREC-%s/mods.xml' % day, '<mods></mods>\n')
+    else:
+        zf.writestr('CREC-%s/mods.xml' % day, '<mods><!-- %s --></mods>\n' % day)
+    zf.writestr('CREC-%s/pdf/CREC-%s.pdf' % (day, day), '%PDF')
+    zf.close()
+    return buf.getvalue()
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        if self.path not in self.server.files:
+            self.send_response(404)
+            self.send_header('content-type', 'text/html')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('content-type', 'application/zip')
+        self.send_header('content-length', str(len(self.server.files[self.path])))
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('Range')))
+        if self.path not in self.server.files:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = self.server.files[self.path]
+        etag = '"%d"' % hash(data)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get('Range'):
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('content-range', 'bytes */%d' % len(data))
+                self.send_header('content-length', '0')
+                self.end_headers()
+                return
+            if self.server.range_start is not None:
+                # a server that doesn't send the range asked for.
+                start = self.server.range_start
+            self.send_response(206)
+            self.send_header('content-range', 'bytes %d-%d/%d' % (start, len(data)-1, len(data)))
+        else:
+            self.send_response(200)
+        self.send_header('content-type', 'application/zip')
+        self.send_header('content-length', str(len(data) - start))
+        self.send_header('etag', etag)
+        self.end_headers()
+        body = data[start:]
+        if self.server.drop_after:
+            # simulate a connection that dies part way through the body.
+            body = body[:self.server.drop_after]
+            self.server.drop_after = None
+            self.wfile.write(body)
+            self.wfile.flush()
+            self.connection.close()
+            return
+        self.wfile.write(body)
+
+
+class ScraperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        scraper.CWOD_HOME = self.home
+        scraper.TMP_DIR = self.home
+        self.ledger = ledger.ScraperLedger(os.path.join(self.home, 'scraper.db'))
+
+        self.server = serve(StandInHandler, drop_after=None, range_start=None,
+                            files={'/fdsys/pkg/CREC-2010-07-12.zip': make_crec_zip(padding=20000)})
+        self.domain = self.server.address
+
+    def tearDown(self):
+        stop(self.server)
+        shutil.rmtree(self.home)
+
+    def make_scraper(self):
+        throttle = scraper.HostThrottle(rate=0, connections=2)
+        return scraper.CRScraper(throttle=throttle, domain=self.domain, secure=False,
+                                 ledger=self.ledger)
+
+    def test_retrieve_extracts_granules(self):
+        crs = self.make_scraper()
+        path = crs.retrieve_by_date(datetime.datetime(2010, 7, 12))
+        self.assertEqual(crs.status, 'success')
+        self.assertEqual(sorted(os.listdir(path)),
+                         ['CREC-2010-07-12-pt1-PgS5700.txt',
+                          'CREC-2010-07-12-pt1-PgS5701.txt',
+                          'CREC-2010-07-12-pt1-PgS5702.txt',
+                          'mods.json',
+                          'mods.xml', ])
+        raw = open(os.path.join(path, 'CREC-2010-07-12-pt1-PgS5700.txt')).read()
+        self.assertEqual(raw, GRANULE + 'x' * 20000)
+        self.assertFalse(os.path.exists(os.path.join(self.home, 'CREC-2010-07-12.zip')))
+        self.assertEqual(self.ledger.get_status(datetime.date(2010, 7, 12)), 'success')
+
+        # a finished date is not fetched again.
+        self.server.requests = []
+        self.assertEqual(crs.retrieve_by_date(datetime.datetime(2010, 7, 12)), None)
+        self.assertEqual(self.server.requests, [])
+
+    def test_interrupted_download_resumes(self):
+        self.server.drop_after = 5000
+        crs = self.make_scraper()
+        crs.retrieve_by_date(datetime.datetime(2010, 7, 12))
+        self.assertEqual(crs.status, 'success')
+        self.assertEqual(self.server.requests,
+                         [('/fdsys/pkg/CREC-2010-07-12.zip', None),
+                          ('/fdsys/pkg/CREC-2010-07-12.zip', 'bytes=5000-'), ])
+        size = len(self.server.files['/fdsys/pkg/CREC-2010-07-12.zip'])
+        self.assertEqual(crs.bytes_downloaded, size)
+
+    def check_started_over(self, part):
+        ''' retrieve 2010-07-12 with part left over in its .part file, which
+        doesn't line up with the zip file on the server. '''
+        open(os.path.join(self.home, 'CREC-2010-07-12.zip.part'), 'wb').write(part)
+        crs = self.make_scraper()
+        path = crs.retrieve_by_date(datetime.datetime(2010, 7, 12))
+        self.assertEqual(crs.status, 'success')
+        self.assertEqual(self.server.requests,
+                         [('/fdsys/pkg/CREC-2010-07-12.zip', 'bytes=%d-' % len(part)),
+                          ('/fdsys/pkg/CREC-2010-07-12.zip', None), ])
+        self.assertEqual(open(os.path.join(path, 'CREC-2010-07-12-pt1-PgS5700.txt')).read(),
+                         GRANULE + 'x' * 20000)
+
+    def test_a_part_file_longer_than_the_zip_is_started_over(self):
+        size = len(self.server.files['/fdsys/pkg/CREC-2010-07-12.zip'])
+        # the server answers 416, as there is nothing past the end.
+        self.check_started_over('x' * (size + 10))
+
+    def test_a_range_from_elsewhere_is_started_over(self):
+        self.server.range_start = 0
+        self.check_started_over('x' * 5000)
+
+    def test_days_packed_at_once_keep_their_own_files(self):
+        days = [datetime.datetime(2010, 7, 12), datetime.datetime(2010, 7, 13)]
+        self.server.files['/fdsys/pkg/CREC-2010-07-13.zip'] = make_crec_zip(padding=20000, day='2010-07-13')
+        storage = scraper.RAW_STORAGE
+        scraper.RAW_STORAGE = 'pack'
+        # the temporary file each member went through on its way into a pack.
+        add_file = scraper.rawstore.PackWriter.add_file
+        through = []
+        def record(writer, name, path):
+            through.append(path)
+            add_file(writer, name, path)
+        scraper.rawstore.PackWriter.add_file = record
+        try:
+            threads = [threading.Thread(target=self.make_scraper().retrieve_by_date, args=(day, ))
+                       for day in days]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            scraper.RAW_STORAGE = storage
+            scraper.rawstore.PackWriter.add_file = add_file
+        self.assertEqual(len(through), 8)
+        self.assertEqual(len(set(through)), 8)
+        for day in days:
+            self.assertEqual(self.ledger.get_status(day.date()), 'success')
+        mods = [zipfile.ZipFile(os.path.join(self.home, 'raw', '2010', '07', '%s.pack' % day)).read('mods.xml')
+                for day in ['12', '13']]
+        self.assertEqual(mods, ['<mods></mods>\n', '<mods><!-- 2010-07-13 --></mods>\n'])
+        self.assertEqual([name for name in os.listdir(self.home) if name.endswith('.tmp')], [])
+
+    def test_not_in_session(self):
+        crs = self.make_scraper()
+        self.assertEqual(crs.retrieve_by_date(datetime.datetime(2010, 7, 11)), None)
+        self.assertEqual(crs.status, 'nosession')
+        self.assertTrue(self.ledger.is_finished(datetime.date(2010, 7, 11)))
+
+    def test_ledger_retry_list(self):
+        self.ledger.set_status(datetime.date(2010, 7, 14), 'errors')
+        self.ledger.set_status(datetime.date(2010, 7, 13), 'GPO connection error')
+        self.ledger.set_status(datetime.date(2010, 7, 12), 'success')
+        self.ledger.record_granule_error(datetime.date(2010, 7, 14), 'mods.xml', 'bad zip')
+        self.assertEqual(self.ledger.needs_retry(), [datetime.datetime(2010, 7, 13),
+                                                     datetime.datetime(2010, 7, 14), ])
+        self.assertEqual(self.ledger.granule_errors(datetime.date(2010, 7, 14)),
+                         [('mods.xml', 'bad zip'), ])
+        self.ledger.set_status(datetime.date(2010, 7, 14), 'success')
+        self.assertEqual(self.ledger.granule_errors(datetime.date(2010, 7, 14)), [])
+
+    def publish_granules(self, texts):
+        ''' put the separate granule and mods.xml files for 2010-07-12 on the
+        stand-in server, the way GPO publishes them during the day. '''
+        package = '/fdsys/pkg/CREC-2010-07-12/'
+        entries = []
+        for granule, text in texts:
+            self.server.files[package + 'html/%s.htm' % granule] = \
+                '<html><body><pre>%s</pre></body></html>' % text
+            entries.append('<relatedItem type="constituent" ID="id-%s"><titleInfo>'
+                           '<title>%s</title></titleInfo></relatedItem>' % (granule, granule))
+        self.server.files[package + 'mods.xml'] = '<mods>%s</mods>' % ''.join(entries)
+
+    def test_poll_fetches_only_changes(self):
+        granules = ['CREC-2010-07-12-pt1-PgS57%02d' % i for i in xrange(3)]
+        self.publish_granules([(granule, GRANULE) for granule in granules])
+        date = datetime.datetime(2010, 7, 12)
+        crs = self.make_scraper()
+        changed = crs.poll(date)
+        self.assertEqual(crs.status, 'success')
+        path = crs.save_path()
+        self.assertEqual(changed, [os.path.join(path, granule + '.txt') for granule in granules])
+        self.assertEqual(open(changed[0]).read(), GRANULE)
+
+        # nothing has changed, so a poll costs one request.
+        self.server.requests = []
+        self.assertEqual(crs.poll(date), [])
+        self.assertEqual(len(self.server.requests), 1)
+
+        # a corrected granule and a late one.
+        self.publish_granules([(granules[0], GRANULE), (granules[1], GRANULE + 'corrected'),
+                               (granules[2], GRANULE),
+                               ('CREC-2010-07-12-pt1-PgS5710', GRANULE), ])
+        changed = crs.poll(date)
+        self.assertEqual(changed, [os.path.join(path, granules[1] + '.txt'),
+                                   os.path.join(path, 'CREC-2010-07-12-pt1-PgS5710.txt'), ])
+        self.assertEqual(open(changed[0]).read(), GRANULE + 'corrected')
+
+    def test_poll_after_zip_retrieval(self):
+        # granules already held from the zip file aren't reported as changed.
+        date = datetime.datetime(2010, 7, 12)
+        crs = self.make_scraper()
+        crs.retrieve_by_date(date)
+        self.publish_granules([('CREC-2010-07-12-pt1-PgS57%02d' % i, GRANULE + 'x' * 20000)
+                               for i in xrange(3)])
+        mods = self.server.files['/fdsys/pkg/CREC-2010-07-12/mods.xml']
+        open(os.path.join(crs.save_path(), 'mods.xml'), 'w').write(mods)
+        self.assertEqual(crs.poll(date), [])
+
+    def test_scrape_dates_finishes_every_date(self):
+        days = [datetime.datetime(2010, 7, day) for day in [10, 11, 12, 13, 14, 15]]
+        for day in ['13', '15']:
+            self.server.files['/fdsys/pkg/CREC-2010-07-%s.zip' % day] = make_crec_zip(day='2010-07-%s' % day)
+        throttle = scraper.HostThrottle(rate=0, connections=2)
+        CRScraper = scraper.CRScraper
+        scraper.CRScraper = lambda: CRScraper(throttle=throttle, domain=self.domain, secure=False,
+                                              ledger=self.ledger)
+        try:
+            results = scraper.scrape_dates(days, workers=3)
+        finally:
+            scraper.CRScraper = CRScraper
+        self.assertEqual([result['date'] for result in results], days)
+        self.assertEqual([result['status'] for result in results],
+                         ['nosession', 'nosession', 'success', 'success', 'nosession', 'success'])
+        for day in days:
+            self.assertTrue(self.ledger.is_finished(day.date()))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.home, 'raw', '2010', '07'))), ['12', '13', '15'])
+
+    def test_extract_pre_spans_chunks(self):
+        # markers split across chunk boundaries, and a stray closing marker
+        # in the middle of the text, which the greedy regex would keep.
+        html = '<html><body><pre>one</pre></body>two</pre></body>\n</html>'
+        for chunk_size in [1, 3, 7, 64]:
+            out = StringIO()
+            self.assertTrue(scraper.extract_pre(StringIO(html), out, chunk_size))
+            self.assertEqual(out.getvalue(), 'one</pre></body>two')
+        self.assertFalse(scraper.extract_pre(StringIO('<html>no pre</html>'), StringIO(), 4))
+
+
+class ThrottleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = serve(StandInHandler, drop_after=None, range_start=None,
+                            files={'/fdsys/pkg/CREC-2010-07-12.zip': make_crec_zip()})
+        self.url = 'http://%s/fdsys/pkg/CREC-2010-07-12.zip' % self.server.address
+
+    def tearDown(self):
+        stop(self.server)
+
+    def fetch(self, throttle, requests, threads):
+        ''' make requests through throttle from threads at once. returns when
+        each request was let through, and the most that were ever open at
+        once. '''
+        lock = threading.Lock()
+        started = []
+        open_now = [0]
+        most_open = [0]
+        def work(count):
+            for i in xrange(count):
+                with throttle:
+                    lock.acquire()
+                    started.append(time.time())
+                    open_now[0] += 1
+                    most_open[0] = max(most_open[0], open_now[0])
+                    lock.release()
+                    urllib2.urlopen(self.url).read()
+                    # hold the connection long enough for the others to try.
+                    time.sleep(0.02)
+                    lock.acquire()
+                    open_now[0] -= 1
+                    lock.release()
+        workers = [threading.Thread(target=work, args=(requests / threads, )) for i in xrange(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(self.server.requests), requests)
+        return sorted(started), most_open[0]
+
+    def test_connections_are_capped(self):
+        started, most_open = self.fetch(scraper.HostThrottle(rate=0, connections=2), 12, 6)
+        self.assertEqual(most_open, 2)
+
+    def test_requests_are_spaced(self):
+        started, most_open = self.fetch(scraper.HostThrottle(rate=20, connections=4), 8, 4)
+        gaps = [later - earlier for earlier, later in zip(started, started[1:])]
+        # allow for the clock's resolution.
+        self.assertTrue(min(gaps) > 0.045, gaps)
+
+    def test_each_host_has_a_throttle(self):
+        throttle = scraper.get_throttle(self.server.address)
+        self.assertTrue(scraper.get_throttle(self.server.address) is throttle)
+        self.assertFalse(scraper.get_throttle('www.gpo.gov') is throttle)
+        self.assertEqual(throttle.interval, 1.0 / scraper.SCRAPER_REQUESTS_PER_SECOND)
+
+
+if __name__ == '__main__':
+    unittest.main()
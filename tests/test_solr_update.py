@@ -0,0 +1,102 @@
+''' Tests for the batched solr update poster, run against a local stand-in for
+solr that records the requests made of it.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import unittest
+
+from tests import StandInSolr, serve, stop
+
+from solr import solrclient, update
+
+
+def solrdoc(i, padding=0):
+    return '<add><doc>\n<field name="id">doc%d</field>%s\n</doc></add>' % (i, 'x' * padding)
+
+
+class Source(object):
+    status = None
+    error = None
+    posted = True
+
+
+class SolrUpdaterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = serve(StandInSolr)
+        self.url = self.server.address + '/solr'
+
+    def tearDown(self):
+        # let go of the kept-alive connection, so the server can stop.
+        solrclient.pool.clear()
+        stop(self.server)
+
+    def updater(self, **kwargs):
+        settings = {'documents': 2, 'size': 1024 * 1024, 'commit_within': None}
+        settings.update(kwargs)
+        return update.SolrUpdater(self.url, **settings)
+
+    def test_batches_and_a_single_commit(self):
+        updater = self.updater()
+        for i in xrange(5):
+            updater.add(solrdoc(i))
+        self.assertTrue(updater.close())
+
+        bodies = [body for path, body, client in self.server.requests]
+        self.assertEqual(bodies[-1], '<commit/>')
+        adds = bodies[:-1]
+        self.assertEqual(len(adds), 3)
+        self.assertTrue(adds[0].startswith('<add><doc>'))
+        self.assertEqual(adds[0].count('<doc>'), 2)
+        self.assertEqual(adds[2].count('<doc>'), 1)
+        self.assertEqual([path for path, body, client in self.server.requests],
+                         ['/solr/update'] * 4)
+        # all over the one connection.
+        self.assertEqual(len(set([client for path, body, client in self.server.requests])), 1)
+        self.assertEqual((updater.posted, updater.failed, updater.requests), (5, 0, 4))
+
+    def test_byte_limit(self):
+        updater = self.updater(documents=100, size=2500)
+        for i in xrange(4):
+            updater.add(solrdoc(i, padding=1000))
+        updater.close()
+        adds = [body for path, body, client in self.server.requests if body.startswith('<add')]
+        self.assertEqual([body.count('<doc>') for body in adds], [2, 2])
+
+    def test_commit_within(self):
+        updater = self.updater(commit_within=10000)
+        updater.add(solrdoc(0))
+        updater.close()
+        self.assertTrue(self.server.requests[0][1].startswith('<add commitWithin="10000"><doc>'))
+
+    def test_records_as_json(self):
+        updater = self.updater(format='json', commit_within=10000)
+        updater.add({'id': 'doc0', 'unigrams': ['budget', 'deficit']})
+        updater.add({'id': 'doc1'})
+        updater.add(solrdoc(2))
+        updater.close()
+        paths = [path for path, body, client in self.server.requests]
+        self.assertEqual(paths, ['/solr/update/json', '/solr/update', '/solr/update'])
+        self.assertEqual(self.server.requests[0][1],
+                         '{"add":{"commitWithin":10000,"doc":{"id":["doc0"],"unigrams":["budget","deficit"]}},'
+                         '"add":{"commitWithin":10000,"doc":{"id":["doc1"]}}}')
+        self.assertEqual(updater.posted, 3)
+
+    def test_nothing_to_post(self):
+        self.assertTrue(self.updater().close())
+        self.assertEqual(self.server.requests, [])
+
+    def test_refused_documents(self):
+        self.server.refuse = True
+        updater = self.updater()
+        source = Source()
+        updater.add(solrdoc(0), source)
+        self.assertFalse(updater.close())
+        self.assertEqual((source.status, source.posted), ('error', False))
+        self.assertTrue(source.error.startswith('400'))
+        self.assertEqual(updater.failed, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
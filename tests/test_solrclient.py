@@ -0,0 +1,83 @@
+''' Tests for the shared solr client, run against a local stand-in for solr.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import json
+import unittest
+
+from tests import StandInSolr, serve, stop
+
+import solrclient
+
+
+class SolrClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = serve(StandInSolr)
+        self.url = self.server.address + '/solr'
+        self.solr = solrclient.SolrClient(self.url, backoff=0)
+
+    def tearDown(self):
+        solrclient.pool.clear()
+        stop(self.server)
+
+    def test_select_decodes_json_over_one_connection(self):
+        for i in xrange(3):
+            data = self.solr.select({'q': u'speaking:caf\xe9', 'rows': i})
+        self.assertTrue(data['path'].startswith('/solr/select?'))
+        self.assertTrue('q=speaking%3Acaf%C3%A9' in data['path'])
+        self.assertTrue('wt=json' in data['path'])
+        self.assertEqual(len(set([client for path, body, client in self.server.requests])), 1)
+
+    def test_server_errors_are_retried(self):
+        self.server.statuses = [503, 500]
+        self.assertEqual(self.solr.mlt({'q': 'id:1'})['path'][:10], '/solr/mlt?')
+        self.assertEqual(len(self.server.requests), 3)
+
+        self.server.statuses = [503] * 10
+        self.assertRaises(solrclient.SolrError, self.solr.select, {'q': '*:*'})
+        self.assertEqual(len(self.server.requests), 3 + 1 + self.solr.retries)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.statuses = [400]
+        try:
+            self.solr.select({'q': 'id:'})
+        except solrclient.SolrError, e:
+            self.assertEqual(e.status, 400)
+        else:
+            self.fail('no error')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_unreachable(self):
+        solr = solrclient.SolrClient('127.0.0.1:1/solr', retries=1, backoff=0)
+        self.assertRaises(solrclient.SolrError, solr.select, {'q': '*:*'})
+
+    def test_timing_hooks(self):
+        timings = []
+        hook = lambda url, seconds, status: timings.append((url, status))
+        solrclient.add_timing_hook(hook)
+        try:
+            self.server.statuses = [503]
+            self.solr.select({'q': '*:*'})
+        finally:
+            solrclient.remove_timing_hook(hook)
+        self.assertEqual([status for url, status in timings], [503, 200])
+        self.assertTrue(timings[0][0].startswith('http://%s/select?' % self.url))
+
+    def test_congresses_are_routed_to_their_solr(self):
+        servers, server = solrclient.SOLR_SERVERS, solrclient.SOLR_SERVER
+        solrclient.SOLR_SERVERS = {'111': ('solr111', 8983)}
+        solrclient.SOLR_SERVER = 'solr'
+        try:
+            self.assertEqual(solrclient.solr_for(111).url, 'http://solr111:8983/solr')
+            self.assertEqual(solrclient.solr_for('110').url, 'http://solr:8983/solr')
+            self.assertEqual(solrclient.solr_for().url, 'http://solr:8983/solr')
+            self.assertTrue(solrclient.solr_for(111) is solrclient.solr_for('111'))
+            self.assertEqual([congress for congress, solr in solrclient.congress_solrs()], ['111'])
+        finally:
+            solrclient.SOLR_SERVERS, solrclient.SOLR_SERVER = servers, server
+
+
+if __name__ == '__main__':
+    unittest.main()
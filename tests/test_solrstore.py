@@ -0,0 +1,103 @@
+''' Tests for the day bundles of solr documents.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import gzip
+import os
+import tempfile
+import unittest
+
+from tests import TMP
+
+import solrstore
+from records import to_add
+
+
+class BundleTests(unittest.TestCase):
+
+    def setUp(self):
+        self.day = os.path.join(tempfile.mkdtemp(dir=TMP), 'solrdocs', '2010', '07', '12')
+        self.granule = os.path.join(TMP, 'xml', '2010', '07', '12', 'CREC-2010-07-12-pt1-PgS5744.xml')
+        self.other = os.path.join(TMP, 'xml', '2010', '07', '12', 'CREC-2010-07-12-pt1-PgS57440.xml')
+
+    def record(self, name, said):
+        return {'id': name[:-len('.xml')], 'volume': 156, 'speaking': [said, ], 'unigrams': said.lower().split(), }
+
+    def write(self):
+        writer = solrstore.BundleWriter(solrstore.bundle_path(self.day))
+        for granule in [self.granule, self.other]:
+            for idx, said in enumerate(['I yield back.', u'Caf\xe9 "AT&T"']):
+                name = solrstore.solrdoc_name(granule, idx)
+                writer.add(name, self.record(name, said))
+        writer.close()
+        return solrstore.DayBundle(solrstore.bundle_path(self.day))
+
+    def test_a_bundle_is_json_lines_in_gzip(self):
+        bundle = self.write()
+        self.assertEqual(bundle.names(), ['CREC-2010-07-12-pt1-PgS5744.chunk0.xml',
+                                          'CREC-2010-07-12-pt1-PgS5744.chunk1.xml',
+                                          'CREC-2010-07-12-pt1-PgS57440.chunk0.xml',
+                                          'CREC-2010-07-12-pt1-PgS57440.chunk1.xml'])
+        lines = gzip.open(bundle.path).read().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[1], '{"id":["CREC-2010-07-12-pt1-PgS5744.chunk1"],"volume":[156],'
+                                   '"unigrams":["caf\\u00e9","\\"at&t\\""],"speaking":["Caf\\u00e9 \\"AT&T\\""]}')
+        self.assertEqual(bundle.read('CREC-2010-07-12-pt1-PgS57440.chunk1.xml')['speaking'], [u'Caf\xe9 "AT&T"'])
+
+    def test_documents_written_again_replace_theirs(self):
+        self.write()
+        writer = solrstore.BundleWriter(solrstore.bundle_path(self.day))
+        writer.drop(self.granule)
+        name = solrstore.solrdoc_name(self.granule, 0)
+        writer.add(name, self.record(name, 'Mr. President.'))
+        writer.close()
+        bundle = solrstore.DayBundle(writer.path)
+        self.assertEqual(bundle.names(), ['CREC-2010-07-12-pt1-PgS57440.chunk0.xml',
+                                          'CREC-2010-07-12-pt1-PgS57440.chunk1.xml',
+                                          'CREC-2010-07-12-pt1-PgS5744.chunk0.xml'])
+        self.assertEqual([record['speaking'] for name, record in bundle.records()],
+                         [[u'I yield back.'], [u'Caf\xe9 "AT&T"'], [u'Mr. President.']])
+
+    def test_old_copies_are_dropped_once_they_outweigh_the_rest(self):
+        self.write()
+        writer = solrstore.BundleWriter(solrstore.bundle_path(self.day))
+        writer.drop(self.granule)
+        writer.drop(self.other)
+        name = solrstore.solrdoc_name(self.granule, 0)
+        writer.add(name, self.record(name, 'Mr. President.'))
+        writer.close()
+        bundle = solrstore.DayBundle(writer.path)
+        self.assertEqual(bundle.names(), ['CREC-2010-07-12-pt1-PgS5744.chunk0.xml'])
+        self.assertEqual(bundle.entries[0][1:], (0, os.path.getsize(bundle.path)))
+        self.assertEqual(bundle.read(name)['speaking'], [u'Mr. President.'])
+
+    def test_a_bundle_is_cut_back_to_its_index(self):
+        size = self.write().size
+        writer = solrstore.BundleWriter(solrstore.bundle_path(self.day))
+        writer.add('CREC-2010-07-12-pt1-PgS5745.chunk0.xml', {'id': 'lost'})
+        writer.fh.close()
+        writer = solrstore.BundleWriter(solrstore.bundle_path(self.day))
+        writer.close()
+        self.assertEqual(os.path.getsize(writer.path), size)
+        self.assertEqual(len(gzip.open(writer.path).read().splitlines()), 4)
+
+    def test_either_layout_is_read_by_path(self):
+        bundle = self.write()
+        os.makedirs(self.day)
+        name = solrstore.solrdoc_name(self.granule, 1)
+        record = self.record(name, 'From a file.')
+        open(os.path.join(self.day, name), 'w').write(to_add(record))
+        paths = [os.path.join(self.day, name) for name in bundle.names()]
+        documents = list(solrstore.solrdocs(paths))
+        self.assertEqual([path for path, document in documents], [paths[1], paths[0], paths[2], paths[3]])
+        self.assertEqual(documents[0][1], to_add(record))
+        self.assertEqual(solrstore.as_record(documents[0][1])['speaking'], [u'From a file.'])
+        self.assertEqual([path for path, document in solrstore.day_solrdocs(self.day)],
+                         [paths[1], paths[0], paths[2], paths[3]])
+        self.assertEqual(solrstore.solrdoc_days(os.path.dirname(os.path.dirname(self.day))), [self.day])
+        self.assertRaises(IOError, solrstore.read_solrdoc, os.path.join(self.day, 'CREC-2010-07-12-pt1-PgS1.chunk0.xml'))
+
+
+if __name__ == '__main__':
+    unittest.main()
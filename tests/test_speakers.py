@@ -0,0 +1,149 @@
+''' Tests for the index the ingest finds speakers in. Each lookup is checked
+against what the queries it replaced, db_bioguide_lookup() and
+fallback_bioguide_lookup(), return for the same rows.
+
+    python -m unittest discover -s tests -t .
+'''
+
+import datetime
+import os
+import unittest
+
+import tests
+
+from solr import ingest, lib
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def role(bioguide, lastname, state, chamber='House', congress=111, party='D',
+         begin=datetime.date(2009, 1, 6), end=datetime.date(2011, 1, 3), firstname='F'):
+    return {'bioguide': bioguide, 'firstname': firstname, 'middlename': '', 'lastname': lastname,
+            'party': party, 'title': chamber == 'Senate' and 'Sen' or 'Rep', 'state': state,
+            'district': chamber == 'House' and '1' or None, 'congress': congress,
+            'chamber': chamber, 'begin_date': begin, 'end_date': end, }
+
+def result(role):
+    ''' a role as db_bioguide_lookup() selects it. '''
+    return dict([(field, role[field]) for field in lib.SpeakerIndex.fields])
+
+
+class SpeakerIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.velazquez = role('V000081', u'Vel\xe1zquez', 'NY')
+        self.johnson_tx = role('J000126', 'Johnson', 'TX', firstname='Eddie Bernice')
+        self.johnson_ga = role('J000288', 'Johnson', 'GA', firstname='Henry')
+        self.reid = role('R000146', 'Reid', 'NV', chamber='Senate')
+        # a role that ends part way through the congress, and its successor's.
+        self.early = role('K000001', 'Kirk', 'MA', chamber='Senate', end=datetime.date(2010, 2, 4))
+        self.late = role('B000001', 'Kirk', 'MA', chamber='Senate', party='R', begin=datetime.date(2010, 2, 5))
+        self.index = lib.SpeakerIndex()
+        for each in [self.velazquez, self.johnson_tx, self.johnson_ga, self.reid, self.early, self.late]:
+            self.index.add_role(each)
+        self.index.add_name(['J000126', 'ms. eddie bernice johnson of texas', '111', 'representative'])
+        self.index.add_name(['J000288', 'ms. eddie bernice johnson of texas', '111', 'representative'])
+        self.index.add_name(['D000299', 'mr. diaz-balart', '111', 'representative'])
+        self.index.add_legislator('111', {'bioguide': 'J000126', 'party': 'D', 'state': 'TX',
+                                          'firstname': 'Eddie Bernice', 'lastname': 'Johnson', })
+
+    def test_lookup_folds_case_and_accents(self):
+        # LOWER(last) = %s, compared as mysql's collation compares.
+        for lastname in ['velazquez', 'VELAZQUEZ', u'vel\xe1zquez', 'Vel\xc3\xa1zquez ']:
+            self.assertEqual(self.index.lookup(lastname, '111', 'house', '2010-07-12'), [result(self.velazquez)])
+        # LOWER(chamber) = %s
+        self.assertEqual(self.index.lookup('reid', 111, 'SENATE', '2010-07-12'), [result(self.reid)])
+        self.assertEqual(self.index.lookup('reid', '111', 'house', '2010-07-12'), [])
+        self.assertEqual(self.index.lookup('reid', '112', 'senate', '2010-07-12'), [])
+
+    def test_lookup_holds_to_the_dates_of_a_role(self):
+        # begin_date <= %s AND end_date >= %s
+        self.assertEqual(self.index.lookup('kirk', '111', 'senate', '2010-02-04'), [result(self.early)])
+        self.assertEqual(self.index.lookup('kirk', '111', 'senate', '2010-02-05'), [result(self.late)])
+        self.assertEqual(self.index.lookup('reid', '111', 'senate', '2009-01-06'), [result(self.reid)])
+        self.assertEqual(self.index.lookup('reid', '111', 'senate', '2011-01-04'), [])
+
+    def test_lookup_narrows_by_state(self):
+        both = self.index.lookup('johnson', '111', 'house', '2010-07-12')
+        self.assertEqual(sorted([each['bioguide'] for each in both]), ['J000126', 'J000288'])
+        # state = abbr(state).upper()
+        for state in ['texas', 'Texas', ' TEXAS ']:
+            self.assertEqual(self.index.lookup('johnson', '111', 'house', '2010-07-12', state),
+                             [result(self.johnson_tx)])
+        self.assertEqual(self.index.lookup('johnson', '111', 'house', '2010-07-12', 'nevada'), [])
+
+    def test_fallback_lookup(self):
+        # the first row of BIOGUIDE_LOOKUP_PATH for the name, congress and
+        # position, and its legislator in that congress.
+        self.assertEqual(self.index.fallback_lookup('ms. eddie bernice johnson of texas', '111', 'representative'),
+                         [{'bioguide': 'J000126', 'party': 'D', 'state': 'TX',
+                           'firstname': 'Eddie Bernice', 'lastname': 'Johnson', }])
+        # listed, but not a legislator in that congress.
+        self.assertEqual(self.index.fallback_lookup('mr. diaz-balart', '111', 'representative'), [])
+        # not listed for that name, congress or position.
+        self.assertEqual(self.index.fallback_lookup('mr. diaz-balart', '110', 'representative'), None)
+        self.assertEqual(self.index.fallback_lookup('mr. diaz-balart', '111', 'senator'), None)
+
+    def test_find_counts_how_speakers_were_found(self):
+        find = self.index.find
+        self.assertEqual(find('mr. reid', 'reid', '111', 'senate', '2010-07-12', None, 'senator'),
+                         result(self.reid))
+        # two legislators of the name, so the fallback list settles it.
+        self.assertEqual(find('ms. eddie bernice johnson of texas', 'eddie bernice johnson', '111', 'house',
+                              '2010-07-12', None, 'representative')['bioguide'], 'J000126')
+        self.assertEqual(find('mr. johnson', 'johnson', '111', 'house', '2010-07-12', None, 'representative'),
+                         None)
+        self.assertEqual(find('mr. smith', 'smith', '111', 'house', '2010-07-12', None, 'representative'), None)
+        self.assertEqual((self.index.by_id, self.index.hits, self.index.fallbacks, self.index.misses),
+                         (0, 1, 1, 2))
+        self.assertEqual(self.index.summary(), '2 speakers found, 0 of them by their mods.xml id '
+                                               'and 1 by the fallback list, 2 not found')
+        self.index.reset_counts()
+        self.assertEqual(self.index.misses, 0)
+
+    def test_role_of(self):
+        self.assertEqual(self.index.role_of('K000001', '2010-02-04'), result(self.early))
+        self.assertEqual(self.index.role_of('K000001', '2010-02-05'), None)
+        self.assertEqual(self.index.role_of('X000001', '2010-02-04'), None)
+
+    def test_find_tries_the_id_first(self):
+        find = self.index.find
+        # the id settles which of two legislators of the name is meant.
+        self.assertEqual(find('mr. johnson', 'johnson', '111', 'house', '2010-07-12', None, 'representative',
+                              'J000288'), result(self.johnson_ga))
+        # an id with no role on the day is passed over for the name.
+        self.assertEqual(find('mr. kirk', 'kirk', '111', 'senate', '2010-07-12', None, 'senator', 'K000001'),
+                         result(self.late))
+        self.assertEqual(find('mr. reid', 'reid', '111', 'senate', '2010-07-12', None, 'senator', 'X000001'),
+                         result(self.reid))
+        self.assertEqual((self.index.by_id, self.index.hits, self.index.fallbacks, self.index.misses),
+                         (1, 2, 0, 0))
+
+
+class SolrDocSpeakerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.speakers = ingest.speakers
+        ingest.speakers = lib.SpeakerIndex()
+        # two Reids, so only the id mods.xml gives tells them apart.
+        ingest.speakers.add_role(role('R000146', 'Reid', 'NV', chamber='Senate'))
+        ingest.speakers.add_role(role('R000001', 'Reid', 'NV', chamber='Senate'))
+        self.document = ingest.SolrDoc(os.path.join(FIXTURES, 'xml', '2010', '07', '12',
+                                                    'CREC-2010-07-12-pt1-PgS5744.xml'))
+        self.document.chamber = 'senate'
+        self.document.date = self.document.year = '2010-07-12'
+
+    def tearDown(self):
+        ingest.speakers = self.speakers
+
+    def test_members_are_keyed_as_speakers_are(self):
+        self.assertEqual(self.document.members, {'mr. reid': 'R000146', 'mr. durbin': 'D000563'})
+        speakers = [section['speaker'] for section in self.document.sections]
+        self.assertEqual([speaker for speaker in speakers if speaker in self.document.members],
+                         ['mr. reid', 'mr. reid', 'mr. durbin'])
+        self.assertEqual(self.document.find_speaker('mr. reid')['bioguide'], 'R000146')
+        self.assertEqual(ingest.speakers.by_id, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
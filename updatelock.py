@@ -0,0 +1,28 @@
+#!/usr/bin/python
+
+''' The lock that keeps the jobs which write a day's raw pack, manifest and
+solr document bundle from running at once: poll_update.py, daily_update.sh
+and backfill.py. Each of those reads a file, changes it and writes it back
+whole, so two at once would lose one's changes.
+
+The lock is an flock on UPDATE_LOCK (see settings.py), so the shell scripts
+take the same one with flock(1). It is let go of when the file holding it is
+closed, or when the process exits, however it exits.
+'''
+
+import errno, fcntl
+from settings import *
+
+
+def take_lock(path=UPDATE_LOCK):
+    ''' take the update lock without waiting for it. returns the open file
+    that holds it, or None if another job has it. '''
+    fh = open(path, 'a')
+    try:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError, e:
+        fh.close()
+        if e.errno in (errno.EAGAIN, errno.EACCES):
+            return None
+        raise
+    return fh